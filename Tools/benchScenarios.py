@@ -0,0 +1,178 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Run TestMgr scenarios headless and time them
+
+    python Tools/benchScenarios.py --out results.json
+    python Tools/benchScenarios.py --tests 5,6,8 --seconds 120 --baseline baseline.json
+    python Tools/benchScenarios.py --out baseline.json            # make a new baseline
+
+Each scenario (gameOptions.testToRun) runs in its own process, one at a
+time so they do not compete, in deterministic mode with a fixed seed. After
+--warmup seconds every mainStep is timed; the results file gets ms/tick
+(mean, p50, p95, p99, max), ent and ship counts, EngineObjects allocated
+(MemoryMgr counts), python objects alive and peak RSS for each scenario.
+
+With --baseline, mean / p95 ms per tick and peak memory are compared against
+the baseline's; anything more than --threshold (a fraction) worse is
+printed as a REGRESSION and the exit code is 1.
+'''
+
+import os
+import sys
+import gc
+import json
+import timeit
+import multiprocessing
+from optparse import OptionParser
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+
+SCENARIOS = range(12) # TestMgr.loadLevel
+COMPARED = [('ms_mean', 'threshold'), ('ms_p95', 'threshold'), ('peak_rss_kb', 'memoryThreshold')]
+
+def peakRss():
+    '''Peak resident set size of this process in KB, None where we cannot tell
+    '''
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss /= 1024
+    return rss
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+def runScenario(task):
+    test, seconds, warmup, seed = task
+    os.chdir(root)
+    import main
+    from engine.headless import startEngine
+
+    options = main.LocalOptions()
+    options.gameOptions.deterministic = True
+    options.gameOptions.seed = seed
+    options.gameOptions.testToRun = test
+    options.gameOptions.journal = False
+    options.gameOptions.keyframeInterval = 0.0
+
+    clock = timeit.default_timer
+    start = clock()
+    e = startEngine(options)
+    loadTime = clock() - start
+
+    e.stepFor(warmup)
+    gc.collect()
+    objectsStart = len(gc.get_objects())
+    engineObjectsStart = sum(e.memoryMgr.counts.values())
+
+    step = e.kTimeStepSize
+    times = []
+    for i in xrange(int(round(seconds / step))):
+        start = clock()
+        e.mainStep(step)
+        times.append(clock() - start)
+        e.gameTime += step
+    total = sum(times)
+    times.sort()
+
+    gc.collect()
+    ents = e.entMgr.ents
+    return test, {
+        'ticks'              : len(times),
+        'ms_mean'            : total / len(times) * 1000.0,
+        'ms_p50'             : percentile(times, 0.50) * 1000.0,
+        'ms_p95'             : percentile(times, 0.95) * 1000.0,
+        'ms_p99'             : percentile(times, 0.99) * 1000.0,
+        'ms_max'             : times[-1] * 1000.0,
+        'load_ms'            : loadTime * 1000.0,
+        'ents'               : len(ents),
+        'ships'              : len([ent for ent in ents if ent.hasSquad]),
+        'engine_objects'     : sum(e.memoryMgr.counts.values()),
+        'engine_objects_new' : sum(e.memoryMgr.counts.values()) - engineObjectsStart,
+        'python_objects'     : len(gc.get_objects()),
+        'python_objects_new' : len(gc.get_objects()) - objectsStart,
+        'peak_rss_kb'        : peakRss(),
+    }
+
+def compare(results, baseline, options):
+    '''Regressions as printable lines
+    '''
+    regressions = []
+    for test, result in sorted(results.items()):
+        old = baseline.get('scenarios', {}).get(test)
+        if not old:
+            continue
+        for key, thresholdName in COMPARED:
+            limit = getattr(options, thresholdName)
+            if result.get(key) is None or not old.get(key):
+                continue
+            change = result[key] / float(old[key]) - 1.0
+            if change > limit:
+                regressions.append('REGRESSION test %s %s: %.3f -> %.3f (+%.0f%%, limit %.0f%%)' % (test, key, old[key], result[key], change * 100.0, limit * 100.0))
+    return regressions
+
+def main():
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('--tests', default=','.join([str(test) for test in SCENARIOS]), help='comma separated testToRun ids')
+    parser.add_option('--seconds', type='float', default=60.0, help='game seconds timed per scenario')
+    parser.add_option('--warmup', type='float', default=2.0, help='game seconds run before timing starts')
+    parser.add_option('--seed', type='int', default=1)
+    parser.add_option('--out', default='benchResults.json')
+    parser.add_option('--baseline', default='', help='results file to compare against')
+    parser.add_option('--threshold', type='float', default=0.2, help='allowed slowdown in ms per tick, as a fraction')
+    parser.add_option('--memory-threshold', dest='memoryThreshold', type='float', default=0.2, help='allowed growth in peak memory, as a fraction')
+    options, args = parser.parse_args()
+
+    tests = [int(test) for test in options.tests.split(',')]
+    pool = multiprocessing.Pool(1, maxtasksperchild=1)
+    results = {}
+    for test, result in pool.imap(runScenario, [(test, options.seconds, options.warmup, options.seed) for test in tests]):
+        results[str(test)] = result
+        print 'test %2i: %6.3f ms/tick mean  %6.3f p95  %6.3f p99  %4i ents  %7s KB peak' % (test,
+            result['ms_mean'], result['ms_p95'], result['ms_p99'], result['ents'], result['peak_rss_kb'])
+    pool.close()
+    pool.join()
+
+    f = open(options.out, 'w')
+    json.dump({'seconds': options.seconds, 'warmup': options.warmup, 'seed': options.seed, 'scenarios': results}, f, indent=2, sort_keys=True)
+    f.close()
+    print 'wrote', options.out
+
+    if options.baseline:
+        f = open(options.baseline, 'r')
+        baseline = json.load(f)
+        f.close()
+        regressions = compare(results, baseline, options)
+        for line in regressions:
+            print line
+        if regressions:
+            sys.exit(1)
+        print 'no regressions against', options.baseline
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+How the sim scales with fleet size - TestMgr.setupFleetScaling at log spaced sizes
+
+    python Tools/fleetScaling.py --out scaling.csv
+    python Tools/fleetScaling.py --sizes 100,1000,10000 --aspects --plot scaling.png
+
+Each size runs headless in its own process, one at a time. The fleet is
+spawned into an empty ocean (timed, and RSS before / after gives KB per
+ent), run for --warmup game seconds, then every Engine.mainStep subsystem
+is timed for --seconds game seconds (or until --budget real seconds have
+gone by, whichever is first - the big fleets are slow). --aspects also
+splits EntMgr's time by aspect class, at the cost of a timer call around
+every aspect tick.
+
+The CSV has one row per size. Afterwards the slope of log(ms) against
+log(size) over sizes >= --fit-from is printed for each column: about 1 is
+linear in the fleet, about 2 is quadratic.
+'''
+
+import os
+import sys
+import gc
+import math
+import timeit
+import multiprocessing
+from optparse import OptionParser
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+
+SIZES = [10, 32, 100, 316, 1000, 3162, 10000, 20000]
+SUBSYSTEMS = ['inputSystem', 'selectionSystem', 'widgetMgr', 'memoryMgr', 'actionMgr', 'pathPlanner', 'aspectMgr', 'entMgr',
+              'gfxSystem', 'cameraSystem', 'debugDrawSystem', 'testMgr', 'netMgr'] # Engine.mainStep order
+
+clock = timeit.default_timer
+
+def currentRss():
+    '''Resident set size of this process in KB - peak RSS where /proc is missing
+    '''
+    try:
+        f = open('/proc/self/statm', 'r')
+        pages = int(f.read().split()[1])
+        f.close()
+        return pages * os.sysconf('SC_PAGE_SIZE') / 1024
+    except (IOError, OSError, ValueError):
+        pass
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss /= 1024
+    return rss
+
+def timeSubsystems(e, totals):
+    '''Wrap each system's tick so its time adds up in totals[name]
+    '''
+    def timed(name, tick):
+        def wrapper(dtime):
+            start = clock()
+            tick(dtime)
+            totals[name] += clock() - start
+        return wrapper
+    for name in SUBSYSTEMS:
+        totals[name] = 0.0
+        system = getattr(e, name)
+        system.tick = timed(name, system.tick)
+
+def timeAspects(totals):
+    '''Replace Ent.tick with one that adds each aspect's preTick + tick to totals[aspect class name]
+    '''
+    from engine import ent
+    def tick(self, dtime):
+        for aspect in self.aspects:
+            start = clock()
+            aspect.preTick(dtime)
+            name = aspect.__class__.__name__
+            totals[name] = totals.get(name, 0.0) + clock() - start
+        for aspect in self.aspects:
+            start = clock()
+            aspect.tick(dtime)
+            name = aspect.__class__.__name__
+            totals[name] = totals.get(name, 0.0) + clock() - start
+        self.tickCount += 1
+    ent.Ent.tick = tick
+
+def runSize(task):
+    size, seconds, warmup, budget, seed, aspects = task
+    os.chdir(root)
+    import main
+    from engine.headless import startEngine
+
+    options = main.LocalOptions()
+    options.gameOptions.deterministic = True
+    options.gameOptions.seed = seed
+    options.gameOptions.testToRun = 0 # empty ocean, the fleet is spawned below
+    options.gameOptions.journal = False
+    options.gameOptions.keyframeInterval = 0.0
+    e = startEngine(options)
+
+    gc.collect()
+    rssStart = currentRss()
+    e.testMgr.setupFleetScaling(size)
+    gc.collect()
+    rssSpawned = currentRss()
+
+    e.stepFor(warmup)
+
+    subsystems = {}
+    timeSubsystems(e, subsystems)
+    aspectTotals = {}
+    if aspects:
+        timeAspects(aspectTotals)
+
+    step = e.kTimeStepSize
+    ticks = 0
+    start = clock()
+    while ticks < int(round(seconds / step)):
+        e.mainStep(step)
+        e.gameTime += step
+        ticks += 1
+        if clock() - start > budget:
+            break
+    total = clock() - start
+
+    row = {
+        'size'      : size,
+        'ents'      : len(e.entMgr.ents),
+        'ticks'     : ticks,
+        'spawn_ms'  : e.testMgr.spawnTime * 1000.0,
+        'kb_per_ent': (rssSpawned - rssStart) / float(size),
+        'tick_ms'   : total / ticks * 1000.0,
+    }
+    for name, elapsed in subsystems.items() + aspectTotals.items():
+        row[name] = elapsed / ticks * 1000.0
+    return row
+
+def slope(points):
+    '''Least squares slope of log(y) against log(x)
+    '''
+    points = [(math.log(x), math.log(y)) for x, y in points if x > 0 and y > 0]
+    if len(points) < 2:
+        return None
+    n = float(len(points))
+    mx = sum([x for x, y in points]) / n
+    my = sum([y for x, y in points]) / n
+    sxx = sum([(x - mx) ** 2 for x, y in points])
+    if sxx == 0.0:
+        return None
+    return sum([(x - mx) * (y - my) for x, y in points]) / sxx
+
+def plot(rows, columns, filename):
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as pyplot
+    except ImportError:
+        print 'no matplotlib, skipping', filename
+        return
+    sizes = [row['size'] for row in rows]
+    for column in columns:
+        values = [row.get(column, 0.0) for row in rows]
+        if max(values) > 0.0:
+            pyplot.loglog(sizes, values, marker='o', label=column)
+    pyplot.xlabel('ships')
+    pyplot.ylabel('ms')
+    pyplot.legend(loc='upper left', fontsize='small')
+    pyplot.grid(True, which='both')
+    pyplot.savefig(filename)
+    print 'wrote', filename
+
+def main():
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('--sizes', default=','.join([str(size) for size in SIZES]), help='comma separated fleet sizes')
+    parser.add_option('--seconds', type='float', default=5.0, help='game seconds timed per size')
+    parser.add_option('--warmup', type='float', default=1.0, help='game seconds run before timing starts')
+    parser.add_option('--budget', type='float', default=60.0, help='real seconds of timed ticks per size at most')
+    parser.add_option('--seed', type='int', default=1)
+    parser.add_option('--aspects', action='store_true', default=False, help='time EntMgr by aspect class too')
+    parser.add_option('--fit-from', dest='fitFrom', type='int', default=100, help='smallest size used for the slopes')
+    parser.add_option('--out', default='fleetScaling.csv')
+    parser.add_option('--plot', default='', help='image file for a log-log plot, needs matplotlib')
+    options, args = parser.parse_args()
+
+    sizes = [int(size) for size in options.sizes.split(',')]
+    pool = multiprocessing.Pool(1, maxtasksperchild=1)
+    rows = []
+    for row in pool.imap(runSize, [(size, options.seconds, options.warmup, options.budget, options.seed, options.aspects) for size in sizes]):
+        rows.append(row)
+        print '%6i ships: %9.3f ms/tick  %9.1f ms spawn  %6.1f KB/ent  (%i ticks)' % (row['size'],
+            row['tick_ms'], row['spawn_ms'], row['kb_per_ent'], row['ticks'])
+    pool.close()
+    pool.join()
+
+    fixed = ['size', 'ents', 'ticks', 'spawn_ms', 'kb_per_ent', 'tick_ms']
+    extra = []
+    for row in rows:
+        for name in row:
+            if name not in fixed and name not in extra:
+                extra.append(name)
+    columns = fixed + SUBSYSTEMS + sorted([name for name in extra if name not in SUBSYSTEMS])
+    f = open(options.out, 'w')
+    f.write(','.join(columns) + '\n')
+    for row in rows:
+        f.write(','.join([str(row.get(column, '')) for column in columns]) + '\n')
+    f.close()
+    print 'wrote', options.out
+
+    print 'log-log slope over sizes >= %i (1 linear, 2 quadratic):' % options.fitFrom
+    for column in columns[3:]:
+        k = slope([(row['size'], row.get(column, 0.0)) for row in rows if row['size'] >= options.fitFrom])
+        if k is not None:
+            print '    %-24s %5.2f' % (column, k)
+
+    if options.plot:
+        plot(rows, columns[3:4] + columns[5:], options.plot)
+
+if __name__ == '__main__':
+    main()
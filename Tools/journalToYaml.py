@@ -0,0 +1,63 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Turn an ActionMgr journal into an actionHistory.yaml that gameOptions.toLoad can replay
+
+    python Tools/journalToYaml.py ActionHistory/journal-20111231-235959
+    python Tools/journalToYaml.py ActionHistory/journal-20111231-235959.0003.ajl -o ActionHistory/crash.yaml
+
+Takes one .ajl file or the session prefix; either way the whole session is
+converted. The output is the same ActionHistory document ActionMgr always
+wrote with yaml.dump, so existing tooling reads it, and ActionMgr loads it
+back through its HistoryLoader. Building the actions needs the same
+environment (ogre, yaml) as the game itself.
+'''
+
+import os
+import sys
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import yaml
+import engine.actionMgr
+from engine import actionJournal
+
+def main():
+    parser = OptionParser(usage='%prog [options] journal')
+    parser.add_option('-o', '--output', default='ActionHistory/actionHistory.yaml', help='yaml file to write')
+    options, args = parser.parse_args()
+    if len(args) != 1:
+        parser.error('need one journal file or session prefix')
+    if not actionJournal.journalFiles(args[0]):
+        parser.error('no journal files for %s' % args[0])
+
+    history = engine.actionMgr.ActionHistory()
+    history.actions = [engine.actionMgr.actionFromRecord(record) for record in actionJournal.toHistory(args[0])]
+    f = open(options.output, 'w')
+    f.write(yaml.dump(history))
+    f.close()
+    print 'actions: %i' % len(history.actions)
+    print 'output: %s' % options.output
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Run the carrier approach many times with different seeds - see engine/batch.py
+
+    python Tools/monteCarlo.py --runs 200 --boats 20 --out approach.csv
+    python Tools/monteCarlo.py --runs 1000 --first-seed 5000 --processes 8 --seconds 600
+
+Prints each run as it finishes and the summary (mean, std, percentiles) of
+every metric at the end, and writes one CSV row per run.
+'''
+
+import os
+import sys
+import timeit
+from optparse import OptionParser
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+
+def main():
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('--runs', type='int', default=100)
+    parser.add_option('--first-seed', dest='firstSeed', type='int', default=1, help='runs use seeds first-seed, first-seed + 1, ...')
+    parser.add_option('--boats', type='int', default=20, help='speed boats approaching the carrier')
+    parser.add_option('--seconds', type='float', default=300.0, help='game seconds per run')
+    parser.add_option('--sample', type='float', default=0.5, help='game seconds between metric samples')
+    parser.add_option('--station-tolerance', dest='stationTolerance', type='float', default=50.0, help='meters from its station that count as on station')
+    parser.add_option('--processes', type='int', default=None, help='worker processes, one per cpu by default')
+    parser.add_option('--out', default='monteCarlo.csv')
+    options, args = parser.parse_args()
+
+    os.chdir(root)
+    import main
+    from engine.batch import runBatch, CarrierApproach, ResultTable
+
+    scenario = CarrierApproach(options.boats, options.seconds, options.sample, options.stationTolerance)
+    seeds = range(options.firstSeed, options.firstSeed + options.runs)
+    table = ResultTable()
+    start = timeit.default_timer()
+    for seed, metrics in runBatch(scenario, seeds, main.LocalOptions(), options.processes):
+        table.add(seed, metrics)
+        print '%4i/%i seed %6i: %s' % (len(table.rows), options.runs, seed,
+            '  '.join(['%s=%s' % (name, metrics[name] is None and '-' or '%.4g' % metrics[name]) for name in sorted(metrics)]))
+    print '%i runs in %.1f s' % (len(table.rows), timeit.default_timer() - start)
+    print table.format()
+    table.write(options.out)
+    print 'wrote', options.out
+
+if __name__ == '__main__':
+    main()
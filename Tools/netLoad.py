@@ -0,0 +1,342 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Loopback stand-in for a NetMgr session - one server, M clients, N ships
+
+    python Tools/netLoad.py --ships 500 --clients 4 --duration 10 --loss 0.02 --latency 0.03
+
+Everything runs in this one process on 127.0.0.1 and speaks the real wire
+format (netPacket's header, status, info, command and squelch structs, with
+fragmentation). The server moves its ships and serves status at --rate. Each
+client asks for info once, decodes every status message, and sends helm
+commands at --commands per second. Command latency is measured end to end:
+from the client sending a command until a status message shows the ship
+doing it.
+
+Loss, latency and jitter are applied on the sending side from one seeded
+random stream, so two runs with the same options see the same drops. Results
+are printed as "key: value" lines, so they can be diffed, grepped, or read as
+yaml.
+'''
+
+import os
+import sys
+import math
+import heapq
+import random
+import select
+import socket
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'engine'))
+import netPacket
+from netClock import monotonic
+
+InfoMessage        = 0 # keep synced with NetMgr
+StatusMessage      = 1
+RequestInfoMessage = 2
+CommandMessage     = 4
+SquelchCommand     = 7
+
+STATUS_STRIDE = 12
+DS_FIELD      = 9  # offset of ds within a decoded status record
+
+
+class Stats(object):
+    def __init__(self):
+        self.packetsSent = 0
+        self.bytesSent = 0
+        self.packetsDropped = 0
+        self.packetsReceived = 0
+        self.bytesReceived = 0
+        self.decodeTime = 0.0
+        self.decoded = 0
+        self.commandLatencies = []
+        self.commandsSent = 0
+
+
+class Link(object):
+    '''A socket plus the simulated network in front of it - datagrams wait in
+    a heap until their delivery time, or never leave if the dice say so
+    '''
+    def __init__(self, rng, options, stats):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.setblocking(0)
+        self.address = self.sock.getsockname()
+        self.rng = rng
+        self.options = options
+        self.stats = stats
+        self.delayed = [] # heap of (due, order, datagram, address)
+        self.order = 0
+        self.reassembler = netPacket.Reassembler()
+        self.fragmentSequence = 0
+
+    def send(self, msg, address, now):
+        datagrams = netPacket.fragmentPacket(msg, self.fragmentSequence)
+        if len(datagrams) > 1:
+            self.fragmentSequence = (self.fragmentSequence + 1) % netPacket.MaxSequence
+        for datagram in datagrams:
+            if self.rng.random() < self.options.loss:
+                self.stats.packetsDropped += 1
+                continue
+            delay = self.options.latency + self.rng.uniform(0.0, self.options.jitter)
+            heapq.heappush(self.delayed, (now + delay, self.order, datagram, address))
+            self.order += 1
+
+    def flush(self, now):
+        while self.delayed and self.delayed[0][0] <= now:
+            due, order, datagram, address = heapq.heappop(self.delayed)
+            try:
+                self.sock.sendto(datagram, address)
+            except socket.error:
+                self.stats.packetsDropped += 1 # loopback buffer full - counts as loss
+                continue
+            self.stats.packetsSent += 1
+            self.stats.bytesSent += len(datagram)
+
+    def nextDue(self):
+        if self.delayed:
+            return self.delayed[0][0]
+        return None
+
+    def receive(self, now):
+        '''Whole messages that arrived, fragments reassembled
+        '''
+        messages = []
+        while True:
+            try:
+                datagram, address = self.sock.recvfrom(65536)
+            except socket.error:
+                break
+            self.stats.packetsReceived += 1
+            self.stats.bytesReceived += len(datagram)
+            if netPacket.isFragment(datagram):
+                datagram = self.reassembler.add(datagram, address, now)
+                if datagram is None:
+                    continue
+            messages.append((datagram, address))
+        messages.extend([(msg, None) for msg in self.reassembler.expire(now)])
+        return messages
+
+
+class Ship(object):
+    def __init__(self, id, rng):
+        self.id = id
+        self.x = rng.uniform(-20000.0, 20000.0)
+        self.z = rng.uniform(-20000.0, 20000.0)
+        self.yaw = rng.uniform(-math.pi, math.pi)
+        self.speed = rng.uniform(0.0, 15.0)
+        self.ds = self.speed
+        self.dh = self.yaw
+
+    def tick(self, dtime):
+        self.speed += (self.ds - self.speed) * min(1.0, dtime)
+        self.yaw = self.dh
+        self.x += math.cos(self.yaw) * self.speed * dtime
+        self.z += math.sin(self.yaw) * self.speed * dtime
+
+
+class Server(object):
+    def __init__(self, rng, options):
+        self.stats = Stats()
+        self.link = Link(rng, options, self.stats)
+        self.ships = [Ship(i, rng) for i in xrange(options.ships)]
+        self.shipMap = dict([(ship.id, ship) for ship in self.ships])
+        self.clients = set()
+        self.period = 1.0 / options.rate
+        self.nextServe = 0.0
+        self.start = monotonic()
+
+    def millis(self, now):
+        return int((now - self.start) * 1000.0)
+
+    def tick(self, now, dtime):
+        for msg, address in self.link.receive(now):
+            msgType, time, count, size = netPacket.header.unpack_from(msg)
+            if address is not None:
+                self.clients.add(address)
+            if msgType == CommandMessage:
+                records = netPacket.unpackRecords(netPacket.command, msg, count)
+                for i in xrange(0, len(records), 3):
+                    ship = self.shipMap.get(records[i])
+                    if ship:
+                        ship.dh, ship.ds = records[i + 1], records[i + 2]
+                squelches = [(records[i],) for i in xrange(0, len(records), 3)]
+                for client in self.clients:
+                    if client != address:
+                        self.link.send(netPacket.buildPacket(SquelchCommand, self.millis(now), netPacket.squelch, squelches), client, now)
+            elif msgType == RequestInfoMessage and address is not None:
+                infos = [(ship.id, 'ship%i' % ship.id, 'DDG51', 15.0, 1.5, 150.0, 20.0, 9.0, -1, 0) for ship in self.ships]
+                self.link.send(netPacket.buildPacket(InfoMessage, self.millis(now), netPacket.info, infos), address, now)
+
+        for ship in self.ships:
+            ship.tick(dtime)
+
+        if now >= self.nextServe:
+            self.nextServe = now + self.period
+            packet = netPacket.header.pack(StatusMessage, self.millis(now), len(self.ships), netPacket.status.size)
+            for ship in self.ships:
+                packet += netPacket.status.pack(ship.id, ship.x, 0.0, ship.z, math.cos(ship.yaw) * ship.speed, 0.0, math.sin(ship.yaw) * ship.speed, ship.yaw, 0.0, ship.ds, ship.dh, 0)
+            for client in self.clients:
+                self.link.send(packet, client, now)
+        self.link.flush(now)
+
+
+class Client(object):
+    def __init__(self, index, rng, options, serverAddress):
+        self.index = index
+        self.stats = Stats()
+        self.link = Link(rng, options, self.stats)
+        self.rng = rng
+        self.options = options
+        self.serverAddress = serverAddress
+        self.haveInfo = False
+        self.nextRequest = 0.0
+        self.nextCommand = 0.0
+        self.commandPeriod = options.commands > 0 and 1.0 / options.commands or None
+        self.pending = {} # ship id -> (ds, sent)
+        self.counter = 0
+
+    def tick(self, now):
+        for msg, address in self.link.receive(now):
+            msgType, time, count, size = netPacket.header.unpack_from(msg)
+            if msgType == StatusMessage:
+                start = monotonic()
+                records = netPacket.unpackRecords(netPacket.status, msg, count)
+                self.stats.decodeTime += monotonic() - start
+                self.stats.decoded += 1
+                self.checkCommands(records, now)
+            elif msgType == InfoMessage:
+                self.haveInfo = True
+
+        if not self.haveInfo and now >= self.nextRequest: # rate limited, like NetMgr
+            self.nextRequest = now + 0.5
+            self.link.send(netPacket.buildPacket(RequestInfoMessage, 0, netPacket.int32, [(-1,)]), self.serverAddress, now)
+
+        if self.haveInfo and self.commandPeriod and now >= self.nextCommand:
+            self.nextCommand = now + self.commandPeriod
+            id = self.rng.randrange(self.options.ships)
+            self.counter += 1
+            ds = 1.0 + (self.index * 1000 + self.counter % 1000) * 0.001 # unique, so we know when we see it served
+            self.pending[id] = (ds, now)
+            self.link.send(netPacket.buildPacket(CommandMessage, 0, netPacket.command, [(id, 0.0, ds)]), self.serverAddress, now)
+            self.stats.commandsSent += 1
+        self.link.flush(now)
+
+    def checkCommands(self, records, now):
+        if not self.pending:
+            return
+        for base in xrange(0, len(records), STATUS_STRIDE):
+            id = records[base]
+            pending = self.pending.get(id)
+            if pending and abs(records[base + DS_FIELD] - pending[0]) < 1e-4:
+                self.stats.commandLatencies.append(now - pending[1])
+                del self.pending[id]
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def run(options):
+    rng = random.Random(options.seed)
+    server = Server(rng, options)
+    clients = [Client(i, rng, options, server.link.address) for i in xrange(options.clients)]
+    links = [server.link] + [client.link for client in clients]
+    socks = [link.sock for link in links]
+
+    start = last = monotonic()
+    end = start + options.duration
+    while True:
+        now = monotonic()
+        if now >= end:
+            break
+        wait = server.nextServe - now
+        for link in links:
+            due = link.nextDue()
+            if due is not None:
+                wait = min(wait, due - now)
+        select.select(socks, [], [], max(0.0, min(wait, 0.01)))
+        now = monotonic()
+        server.tick(now, now - last)
+        for client in clients:
+            client.tick(now)
+        last = now
+    elapsed = monotonic() - start
+
+    received = Stats()
+    latencies = []
+    decoded = 0
+    decodeTime = 0.0
+    commands = 0
+    for client in clients:
+        received.packetsReceived += client.stats.packetsReceived
+        received.bytesReceived += client.stats.bytesReceived
+        latencies.extend(client.stats.commandLatencies)
+        decoded += client.stats.decoded
+        decodeTime += client.stats.decodeTime
+        commands += client.stats.commandsSent
+    lost = commands - len(latencies) - sum([len(client.pending) for client in clients])
+
+    print 'ships: %i' % options.ships
+    print 'clients: %i' % options.clients
+    print 'duration: %.2f' % elapsed
+    print 'loss: %.3f' % options.loss
+    print 'latency_ms: %.1f' % (options.latency * 1000.0)
+    print 'jitter_ms: %.1f' % (options.jitter * 1000.0)
+    print 'server_packets_per_sec: %.1f' % (server.stats.packetsSent / elapsed)
+    print 'server_bytes_per_sec: %.0f' % (server.stats.bytesSent / elapsed)
+    print 'server_packets_dropped: %i' % server.stats.packetsDropped
+    print 'client_packets_per_sec: %.1f' % (received.packetsReceived / elapsed)
+    print 'client_bytes_per_sec: %.0f' % (received.bytesReceived / elapsed)
+    print 'status_messages_decoded: %i' % decoded
+    print 'decode_us_per_message: %.1f' % (decoded and decodeTime / decoded * 1e6 or 0.0)
+    print 'decode_us_per_ship: %.3f' % (decoded and decodeTime / decoded / max(1, options.ships) * 1e6 or 0.0)
+    print 'commands_sent: %i' % commands
+    print 'commands_seen: %i' % len(latencies)
+    print 'commands_overwritten: %i' % lost # a newer command for the same ship replaced it before it showed up
+    print 'command_latency_ms_mean: %.1f' % (latencies and sum(latencies) / len(latencies) * 1000.0 or 0.0)
+    print 'command_latency_ms_p50: %.1f' % (percentile(latencies, 0.5) * 1000.0)
+    print 'command_latency_ms_p95: %.1f' % (percentile(latencies, 0.95) * 1000.0)
+    print 'command_latency_ms_max: %.1f' % (latencies and max(latencies) * 1000.0 or 0.0)
+
+def main():
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('--ships', type='int', default=200)
+    parser.add_option('--clients', type='int', default=2)
+    parser.add_option('--duration', type='float', default=5.0, help='seconds')
+    parser.add_option('--rate', type='float', default=10.0, help='status messages per second')
+    parser.add_option('--commands', type='float', default=5.0, help='commands per second per client')
+    parser.add_option('--loss', type='float', default=0.0, help='datagram loss probability')
+    parser.add_option('--latency', type='float', default=0.0, help='one way delay, seconds')
+    parser.add_option('--jitter', type='float', default=0.0, help='extra uniform random delay, seconds')
+    parser.add_option('--seed', type='int', default=12345)
+    options, args = parser.parse_args()
+    run(options)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Replay a NetMgr capture offline and time the client side work
+
+    python Tools/netReplay.py session.cap
+    python Tools/netReplay.py session.cap --speed 1 --profile
+
+Runs the received datagrams of a capture (see networkingOptions.capture)
+through the same fragment reassembly, status decode and NetStateTable
+update that NetMgr.handleServerMessages/updateStatus do, without ogre. By
+default it replays as fast as it can; --speed 1 keeps the recorded pacing.
+To replay into a running engine instead, set networkingOptions.replay.
+'''
+
+import os
+import sys
+import time
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'engine'))
+import netPacket
+import netCapture
+from netState import NetStateTable, STATUS_STRIDE, POS_X, POS_Y, POS_Z, VEL_X, VEL_Y, VEL_Z, YAW, ROT_SPEED, DS, DH
+from netClock import monotonic
+
+StatusMessage = 1 # keep synced with NetMgr
+
+
+class SeedStatus(object):
+    '''Just enough of netMgr.VStatus to give a new id a table slot
+    '''
+    def __init__(self, time, d):
+        self.time = time
+        self.pos = (d[POS_X], d[POS_Y], d[POS_Z])
+        self.vel = (d[VEL_X], d[VEL_Y], d[VEL_Z])
+        self.yaw = d[YAW]
+        self.rSpeed = d[ROT_SPEED]
+        self.ds = d[DS]
+        self.dh = d[DH]
+
+
+def replay(path, speed):
+    reader = netCapture.CaptureReader(path)
+    reassembler = netPacket.Reassembler()
+    table = NetStateTable()
+    counts = {}
+    nDatagrams = 0
+    nBytes = 0
+    decodeTime = 0.0
+    applyTime = 0.0
+    nStatus = 0
+    lastTime = 0.0
+
+    def handle(msg):
+        msgType, msgTime, count, size = netPacket.header.unpack_from(msg)
+        counts[msgType] = counts.get(msgType, 0) + 1
+        if msgType != StatusMessage:
+            return 0.0, 0.0
+        start = monotonic()
+        records = netPacket.unpackRecords(netPacket.status, msg, count)
+        decoded = monotonic()
+        for base in table.applyStatus(msgTime, records):
+            d = records[base:base + STATUS_STRIDE]
+            table.addEnt(d[0], None, SeedStatus(msgTime, d))
+        return decoded - start, monotonic() - decoded
+
+    wallStart = monotonic()
+    for t, direction, address, datagram in reader:
+        if direction != netCapture.Received:
+            continue
+        if speed > 0.0:
+            wait = t / speed - (monotonic() - wallStart)
+            if wait > 0.0:
+                time.sleep(wait)
+        nDatagrams += 1
+        nBytes += len(datagram)
+        lastTime = t
+        msgs = []
+        if netPacket.isFragment(datagram):
+            msg = reassembler.add(datagram, address, t)
+            if msg is not None:
+                msgs.append(msg)
+        else:
+            msgs.append(datagram)
+        msgs.extend(reassembler.expire(t))
+        for msg in msgs:
+            d, a = handle(msg)
+            if d:
+                nStatus += 1
+                decodeTime += d
+                applyTime += a
+    for msg in reassembler.expire(lastTime + reassembler.timeout + 1.0):
+        handle(msg)
+    elapsed = monotonic() - wallStart
+    reader.close()
+
+    print 'capture: %s' % path
+    print 'recorded_seconds: %.2f' % lastTime
+    print 'replay_seconds: %.2f' % elapsed
+    print 'datagrams: %i' % nDatagrams
+    print 'bytes: %i' % nBytes
+    print 'ents: %i' % len(table)
+    for msgType in sorted(counts):
+        print 'messages_type_%i: %i' % (msgType, counts[msgType])
+    print 'fragments_complete: %i' % reassembler.nComplete
+    print 'fragments_partial: %i' % reassembler.nPartial
+    print 'status_decode_us_per_message: %.1f' % (nStatus and decodeTime / nStatus * 1e6 or 0.0)
+    print 'status_apply_us_per_message: %.1f' % (nStatus and applyTime / nStatus * 1e6 or 0.0)
+
+def main():
+    parser = OptionParser(usage='%prog [options] capture')
+    parser.add_option('--speed', type='float', default=0.0, help='1.0 is as recorded, 0 as fast as possible')
+    parser.add_option('--profile', action='store_true', default=False, help='run under cProfile and print the top 25')
+    options, args = parser.parse_args()
+    if len(args) != 1:
+        parser.error('need one capture file')
+    if options.profile:
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        profiler.runcall(replay, args[0], options.speed)
+        pstats.Stats(profiler).sort_stats('time').print_stats(25)
+    else:
+        replay(args[0], options.speed)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Replay recorded histories headlessly and check the sim comes out the same
+
+    python Tools/replayCheck.py journal-20111231-235959 --seconds 300
+    python Tools/replayCheck.py a.yaml b.yaml --jobs 4 --save-reference refs
+    python Tools/replayCheck.py a.yaml b.yaml --jobs 4 --reference refs
+
+Each history (a name in ActionHistory/, as for load=) runs in its own
+process with gfxOptions.headless and gameOptions.deterministic, and the
+per tick state hashes (engine/stateHash.py) are compared - between two runs
+of the same history, or against a reference saved earlier. For the first
+divergent tick the CEnt kinematics of both sides are compared to name the
+ent and field. Saved references keep a kinematics frame every --frames
+ticks, so against a reference the ent and field come from the first frame
+at or after the divergent tick. A reference is the run's plain result
+dict marshalled like a journal record (actionJournal.dumps), and is read
+back with actionJournal.loads, which builds nothing but plain data.
+
+A journal session is replayed on the testToRun scenario and seed its
+SESSION record names; --test and --seed override that, and are what a yaml
+history (or an older journal) runs with - GameOptions' defaults if not given.
+Against a reference, the seed and scenario it was saved with are used.
+
+Exits 1 if anything diverged. Needs python-ogre for the math types, but
+never opens a window.
+'''
+
+import os
+import sys
+import multiprocessing
+from optparse import OptionParser
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+
+def runHistory(task):
+    '''One headless run - in a fresh pool process, the CEnt table is global
+    '''
+    history, seconds, seed, test, frameInterval, captureTick = task
+    os.chdir(root)
+    import main
+    import cent
+    from engine import snapshot
+    from engine.headless import startEngine
+
+    options = main.LocalOptions()
+    options.gameOptions.deterministic = True
+    options.gameOptions.seed = seed
+    options.gameOptions.testToRun = test
+    options.gameOptions.toLoad = [history]
+    options.gameOptions.journal = False
+    options.gameOptions.keyframeInterval = 0.0
+
+    e = startEngine(options)
+
+    frames = {}
+    ticks = int(round(seconds / e.kTimeStepSize))
+    for tick in xrange(ticks):
+        e.stepFor(e.kTimeStepSize)
+        if tick == captureTick or (frameInterval and tick % frameInterval == 0):
+            frames[tick] = cent.getKinematics()
+        if captureTick is not None and tick >= captureTick:
+            break
+
+    return {
+        'history'       : history,
+        'hashes'        : e.stateHasher.hashes.tostring(),
+        'frames'        : frames,
+        'handles'       : [ent.handle for ent in snapshot.ships(e)],
+        'frameInterval' : frameInterval,
+        'seconds'       : seconds,
+        'seed'          : seed,
+        'test'          : test,
+    }
+
+def hashesOf(result):
+    import array
+    hashes = array.array('I')
+    hashes.fromstring(result['hashes'])
+    return hashes
+
+def diffFrames(a, b, handles):
+    '''(handle, field, a value, b value) of the first difference between two kinematics frames
+    '''
+    from engine.snapshot import kinematics, kinematicsFields
+    n = min(len(a), len(b)) / kinematics.size
+    for i in xrange(n):
+        ka = kinematics.unpack_from(a, i * kinematics.size)
+        kb = kinematics.unpack_from(b, i * kinematics.size)
+        if ka != kb:
+            for field, va, vb in zip(kinematicsFields, ka, kb):
+                if va != vb:
+                    return handles[i] if i < len(handles) else i, field, va, vb
+    if len(a) != len(b):
+        return None, 'ent count', len(a) / kinematics.size, len(b) / kinematics.size
+    return None
+
+def report(history, tick, diff, stepSize, frameTick=None):
+    where = 'tick %i (%.2fs)' % (tick, tick * stepSize)
+    if diff is None:
+        print '%s: DIVERGED at %s' % (history, where)
+        return
+    handle, field, va, vb = diff
+    at = ''
+    if frameTick is not None and frameTick != tick:
+        at = ' - first saved frame after it, tick %i:' % frameTick
+    print '%s: DIVERGED at %s%s ent %s %s %r != %r' % (history, where, at, handle, field, va, vb)
+
+def sessionOptions(history, options):
+    '''(seed, testToRun) to replay history with - the command line's, else what its journal recorded, else GameOptions' defaults
+    '''
+    import main as game
+    from engine import actionJournal
+    info = {}
+    if not history.endswith('.yaml'):
+        info = actionJournal.sessionInfo(os.path.join(root, 'ActionHistory', history)) or {}
+    defaults = game.GameOptions()
+    seed = options.seed
+    if seed is None:
+        seed = info.get('seed', defaults.seed)
+    test = options.test
+    if test is None:
+        test = info.get('testToRun', defaults.testToRun)
+    return seed, test
+
+def referencePath(directory, history):
+    return os.path.join(directory, os.path.basename(history) + '.ref')
+
+def main():
+    parser = OptionParser(usage='%prog [options] history [history ...]')
+    parser.add_option('--seconds', type='float', default=300.0, help='game seconds to replay')
+    parser.add_option('--seed', type='int', default=None, help='gameOptions.seed, instead of the recorded one')
+    parser.add_option('--test', type='int', default=None, help='gameOptions.testToRun scenario, instead of the recorded one')
+    parser.add_option('--jobs', type='int', default=multiprocessing.cpu_count())
+    parser.add_option('--frames', type='int', default=30, help='ticks between kinematics frames kept in a saved reference')
+    parser.add_option('--save-reference', dest='saveReference', default='', help='directory to save references to')
+    parser.add_option('--reference', default='', help='directory of references to check against')
+    options, histories = parser.parse_args()
+    if not histories:
+        parser.error('need at least one history')
+
+    from engine import actionJournal
+    from engine.engine import Engine
+    from engine.stateHash import firstDivergence
+    stepSize = Engine.kTimeStepSize
+    pool = multiprocessing.Pool(options.jobs, maxtasksperchild=1)
+    diverged = 0
+    sessions = dict([(history, sessionOptions(history, options)) for history in histories])
+
+    if options.saveReference or options.reference:
+        frames = options.frames
+        if options.reference:
+            references = {}
+            for history in histories:
+                f = open(referencePath(options.reference, history), 'rb')
+                references[history] = actionJournal.loads(f.read())
+                f.close()
+                sessions[history] = (references[history]['seed'], references[history]['test']) # what it was saved with
+            frames = references[histories[0]]['frameInterval']
+        results = pool.map(runHistory, [(history, options.seconds) + sessions[history] + (frames, None) for history in histories])
+        for result in results:
+            history = result['history']
+            if options.saveReference:
+                if not os.path.isdir(options.saveReference):
+                    os.makedirs(options.saveReference)
+                f = open(referencePath(options.saveReference, history), 'wb')
+                f.write(actionJournal.dumps(result))
+                f.close()
+                print '%s: saved %i ticks' % (history, len(hashesOf(result)))
+                continue
+            reference = references[history]
+            tick = firstDivergence(hashesOf(reference), hashesOf(result))
+            if tick is None:
+                print '%s: ok, %i ticks' % (history, len(hashesOf(result)))
+                continue
+            diverged += 1
+            later = [t for t in sorted(result['frames']) if t >= tick and t in reference['frames']]
+            if later:
+                diff = diffFrames(reference['frames'][later[0]], result['frames'][later[0]], reference['handles'])
+                report(history, tick, diff, stepSize, later[0])
+            else:
+                report(history, tick, None, stepSize)
+    else:
+        tasks = []
+        for history in histories:
+            task = (history, options.seconds) + sessions[history] + (0, None)
+            tasks += [task, task]
+        results = pool.map(runHistory, tasks)
+        captures = []
+        for a, b in zip(results[0::2], results[1::2]):
+            tick = firstDivergence(hashesOf(a), hashesOf(b))
+            if tick is None:
+                print '%s: ok, %i ticks' % (a['history'], len(hashesOf(a)))
+            else:
+                task = (a['history'], options.seconds) + sessions[a['history']] + (0, tick)
+                captures += [task, task]
+        results = pool.map(runHistory, captures) # both sides again, stopping at the divergent tick
+        for a, b in zip(results[0::2], results[1::2]):
+            diverged += 1
+            tick = max(a['frames'])
+            report(a['history'], tick, diffFrames(a['frames'][tick], b['frames'][tick], a['handles']), stepSize)
+
+    pool.close()
+    pool.join()
+    if diverged:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -45,6 +45,7 @@ PyMODINIT_FUNC initcent(void)
     if (PyType_Ready(&CEnt_Type) < 0)       return;
 	Py_INCREF(&CEnt_Type);
     PyModule_AddObject(m, "CEnt",       (PyObject *)&CEnt_Type);
+    PyModule_AddIntConstant(m, "kMaxWaypoints", kMaxWaypoints);
 
     if (PyType_Ready(&CDebugLine_Type) < 0)       return;
 	Py_INCREF(&CDebugLine_Type);
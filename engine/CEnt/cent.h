@@ -57,6 +57,12 @@ typedef struct {
     float2 offset;
 } AngleVote;
 
+//a point on a route - in the world, or held relative to another CEnt (station keeping)
+typedef struct {
+    float2 pos;   //world position, or offset in the target's frame
+    int targetID; //CEnt id the offset is from, -1 for a world position
+} CWaypoint;
+
 typedef struct {
     PyObject_HEAD
     int id;
@@ -95,6 +101,12 @@ typedef struct {
     bool stopAtDestination;
     bool inRamMode;
 
+    //navigator route - destination is waypoints[waypointIndex], stop at the last one
+    CWaypoint waypoints[kMaxWaypoints];
+    int numWaypoints;
+    int waypointIndex;
+    float moveToReachedTolerance;
+
     CDebugLine debugLines[kMaxDebugLines];
     int numDebugLines;
 
@@ -119,16 +131,116 @@ CEnt_getInvalidFloat(PyObject* _self, PyObject* args)
     return result;
 }
 
+//global table of ALL registered cents - grows as ents register, CEnt ids index it
+CEnt** gCEnts = NULL;
+int gCEntCounter = 0;
+int gCEntCapacity = 0;
+
+/////////////////////////////////////////////////////////////////////////
+/// Kinematic state of every registered CEnt, in id order, as one flat
+/// buffer - engine/snapshot.py saves and restores the world through it
+/// IMPORTANT: keep synced with snapshot.kinematics
+/////////////////////////////////////////////////////////////////////////
+enum KinematicsFlags
+{
+    KINEMATICS_STOP_AT_DESTINATION = 1,
+    KINEMATICS_IN_RAM_MODE         = 2,
+};
+
+typedef struct {
+    float posX;
+    float posY;
+    float yaw;
+    float speed;
+    float velX;
+    float velY;
+    float helmDesiredSpeed;
+    float helmDesiredHeading;
+    float navDesiredSpeed;
+    float navDesiredHeading;
+    float destinationX;
+    float destinationY;
+    int flags;
+} CEntKinematics;
+
+static PyObject*
+CEnt_getKinematics(PyObject* _self, PyObject* args)
+{
+    PyObject* result = PyString_FromStringAndSize(NULL, gCEntCounter * sizeof(CEntKinematics));
+    if (result == NULL)
+        return NULL;
+
+    char* out = PyString_AS_STRING(result);
+    for(int i = 0; i < gCEntCounter; ++i)
+    {
+        CEnt* ent = gCEnts[i];
+        CEntKinematics k;
+        k.posX               = ent->pos.x;
+        k.posY               = ent->pos.y;
+        k.yaw                = ent->yaw;
+        k.speed              = ent->speed;
+        k.velX               = ent->vel.x;
+        k.velY               = ent->vel.y;
+        k.helmDesiredSpeed   = ent->helmDesiredSpeed;
+        k.helmDesiredHeading = ent->helmDesiredHeading;
+        k.navDesiredSpeed    = ent->navDesiredSpeed;
+        k.navDesiredHeading  = ent->navDesiredHeading;
+        k.destinationX       = ent->destination.x;
+        k.destinationY       = ent->destination.y;
+        k.flags              = (ent->stopAtDestination ? KINEMATICS_STOP_AT_DESTINATION : 0) |
+                               (ent->inRamMode ? KINEMATICS_IN_RAM_MODE : 0);
+        memcpy(out + i * sizeof(CEntKinematics), &k, sizeof(CEntKinematics));
+    }
+    return result;
+}
+
+static PyObject*
+CEnt_setKinematics(PyObject* _self, PyObject* args)
+{
+    const char* in = NULL;
+    int length = 0;
+    if (!PyArg_ParseTuple(args, "s#", &in, &length))
+        return NULL;
+    if (length % sizeof(CEntKinematics) != 0)
+    {
+        PyErr_SetString(PyExc_ValueError, "setKinematics: buffer is not a whole number of records");
+        return NULL;
+    }
+
+    int n = length / sizeof(CEntKinematics);
+    if (n > gCEntCounter)
+        n = gCEntCounter;
+    for(int i = 0; i < n; ++i)
+    {
+        CEntKinematics k;
+        memcpy(&k, in + i * sizeof(CEntKinematics), sizeof(CEntKinematics));
+        CEnt* ent = gCEnts[i];
+        ent->pos.x              = k.posX;
+        ent->pos.y              = k.posY;
+        ent->yaw                = k.yaw;
+        ent->speed              = k.speed;
+        ent->vel.x              = k.velX;
+        ent->vel.y              = k.velY;
+        ent->helmDesiredSpeed   = k.helmDesiredSpeed;
+        ent->helmDesiredHeading = k.helmDesiredHeading;
+        ent->navDesiredSpeed    = k.navDesiredSpeed;
+        ent->navDesiredHeading  = k.navDesiredHeading;
+        ent->destination.x      = k.destinationX;
+        ent->destination.y      = k.destinationY;
+        ent->stopAtDestination  = (k.flags & KINEMATICS_STOP_AT_DESTINATION) != 0;
+        ent->inRamMode          = (k.flags & KINEMATICS_IN_RAM_MODE) != 0;
+    }
+    return PyInt_FromLong(n);
+}
+
 static PyMethodDef cent_methods[] = {
     {"runUnitTests", RunUnitTests, METH_VARARGS, "Run My Internal Unit Tests to verify assumptions"},
     {"getInvalidFloat",  CEnt_getInvalidFloat, METH_VARARGS, "Get our invalid float sentinel"},
+    {"getKinematics",  CEnt_getKinematics, METH_VARARGS, "Kinematic state of every registered CEnt as one packed string"},
+    {"setKinematics",  CEnt_setKinematics, METH_VARARGS, "Restore what getKinematics returned - returns the number of CEnts set"},
     {NULL, NULL, 0, NULL},   /* Sentinel */
 };
 
-//global table of ALL registered cents 
-CEnt* gCEnts[1024];
-int gCEntCounter = 0;
-
 //standard alloc
 static PyObject *
 CEnt_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
@@ -169,6 +281,10 @@ CEnt_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
         self->stopAtDestination = true;
         self->inRamMode = false;
 
+        self->numWaypoints = 0;
+        self->waypointIndex = 0;
+        self->moveToReachedTolerance = 150.0f;
+
         self->numDebugLines = 0;
         self->updateCounter = 0;
     }
@@ -296,6 +412,80 @@ void DoHelmsman(CEnt* self, float dtime)
 #endif
 }
 
+//the CEnt a waypoint is held relative to, NULL for a world position
+inline CEnt* WaypointTarget(const CWaypoint& waypoint)
+{
+    if(waypoint.targetID < 0 || waypoint.targetID >= gCEntCounter)
+        return NULL;
+    return gCEnts[waypoint.targetID];
+}
+
+//where a waypoint is this tick - relative ones follow their target's position and heading
+//same as python MaintainingRelativeToEnt.calcWorldPos
+float2 WaypointPos(const CWaypoint& waypoint)
+{
+    CEnt* target = WaypointTarget(waypoint);
+    if(target == NULL)
+        return waypoint.pos;
+    return add(target->pos, yawVector(waypoint.pos, target->yaw));
+}
+
+void DoNavigator(CEnt* self)
+{
+    ////////////////////////////////////////////////////////////////////////
+    // NAVIGATOR ///////////////////////////////////////////////////////////
+    ////////////////////////////////////////////////////////////////////////
+    //head for the current waypoint, move on to the next within moveToReachedTolerance
+    //and slow down for the last one between minDistanceForFullStop and maxDistanceForFullStop
+    //a last waypoint held relative to another CEnt is a station - keep it at the target's speed and heading
+    if(self->numWaypoints == 0)
+        return;
+
+    float2 destination = WaypointPos(self->waypoints[self->waypointIndex]);
+    float2 toDest = sub(destination, self->pos);
+    float reached = self->moveToReachedTolerance * self->moveToReachedTolerance;
+    while(self->waypointIndex < self->numWaypoints - 1 && lengthSquared(toDest) < reached)
+    {
+        self->waypointIndex++;
+        destination = WaypointPos(self->waypoints[self->waypointIndex]);
+        toDest = sub(destination, self->pos);
+    }
+    self->destination = destination;
+    self->stopAtDestination = self->waypointIndex == self->numWaypoints - 1;
+
+    float speed = self->maxSpeed;
+    if(kInvalidFloat != self->navDesiredSpeed)
+        speed = clamp(self->navDesiredSpeed, self->maxSpeedAstern, self->maxSpeed);
+
+    float heading = atan2f(-toDest.y, toDest.x); //same as python mathlib.vectorToYaw
+    if(self->stopAtDestination)
+    {
+        float distance = length(toDest);
+        float slowingDistance = self->minDistanceForFullStop - self->maxDistanceForFullStop;
+        if(distance <= self->maxDistanceForFullStop)
+            speed = 0.0f;
+        else if(distance < self->minDistanceForFullStop && slowingDistance > 0.0f)
+            speed *= sqrtf((distance - self->maxDistanceForFullStop) / slowingDistance); //constant deceleration
+
+        CEnt* target = WaypointTarget(self->waypoints[self->waypointIndex]);
+        if(target != NULL)
+        {
+            if(distance <= self->maxDistanceForFullStop)
+            {
+                speed = target->speed;
+                heading = target->yaw;
+            }
+            else //close at our own pace on top of however fast the station is running away
+                speed += dotProduct(target->vel, mul(toDest, 1.0f / distance));
+            speed = clamp(speed, self->maxSpeedAstern, self->maxSpeed);
+        }
+    }
+
+    self->navDesiredHeading = heading;
+    self->helmDesiredHeading = self->navDesiredHeading;
+    self->helmDesiredSpeed = speed;
+}
+
 static PyObject*
 CEnt_tick(PyObject* _self, PyObject* args)
 {
@@ -305,6 +495,7 @@ CEnt_tick(PyObject* _self, PyObject* args)
     if (!PyArg_ParseTuple(args, "f", &dtime))
         return NULL;
     
+    DoNavigator(self);
     //need to have desired speed and heading for this to work
     DoHelmsman(self, dtime);
 
@@ -325,11 +516,109 @@ CEnt_helmTick(PyObject* _self, PyObject *args)
     return Py_None;
 }
 
+static PyObject*
+CEnt_navTick(PyObject* _self, PyObject *args)
+{
+    CEnt* self = (CEnt*) _self;
+
+    DoNavigator(self);
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+static PyObject*
+CEnt_setWaypoints(PyObject* _self, PyObject* args)
+{
+    CEnt* self = (CEnt*) _self;
+    PyObject* route;
+    int index = 0;
+    if (!PyArg_ParseTuple(args, "O|i", &route, &index))
+        return NULL;
+
+    PyObject* seq = PySequence_Fast(route, "setWaypoints expects a sequence of desired states or (x, y[, targetID])");
+    if (seq == NULL)
+        return NULL;
+
+    Py_ssize_t n = PySequence_Fast_GET_SIZE(seq);
+    if (n > kMaxWaypoints)
+    {
+        Py_DECREF(seq);
+        PyErr_Format(PyExc_ValueError, "at most %i waypoints", kMaxWaypoints);
+        return NULL;
+    }
+    if (index < 0 || (n && index >= n))
+    {
+        Py_DECREF(seq);
+        PyErr_SetString(PyExc_IndexError, "waypoint index out of range");
+        return NULL;
+    }
+
+    CWaypoint waypoints[kMaxWaypoints];
+    for(Py_ssize_t i = 0; i < n; ++i)
+    {
+        PyObject* item = PySequence_Fast_GET_ITEM(seq, i);
+        CWaypoint& waypoint = waypoints[i];
+        waypoint.targetID = -1;
+        if (PyObject_TypeCheck(item, &CDesiredState_Type))
+        {
+            CDesiredState* desiredState = (CDesiredState*) item;
+            waypoint.pos = desiredState->pos;
+            if (desiredState->type == DESIRED_STATE_TYPE_MAINTAINING_RELATIVE_TO_ENT)
+                waypoint.targetID = desiredState->targetID;
+        }
+        else if (!PyArg_ParseTuple(item, "ff|i", &waypoint.pos.x, &waypoint.pos.y, &waypoint.targetID))
+        {
+            Py_DECREF(seq);
+            return NULL;
+        }
+    }
+    Py_DECREF(seq);
+
+    for(Py_ssize_t i = 0; i < n; ++i)
+        self->waypoints[i] = waypoints[i];
+    self->numWaypoints = (int) n;
+    self->waypointIndex = n ? index : 0;
+    if (n)
+    {
+        self->destination = WaypointPos(waypoints[self->waypointIndex]);
+        self->stopAtDestination = self->waypointIndex == n - 1;
+    }
+    else
+    {
+        self->destination.x = kInvalidFloat;
+        self->destination.y = kInvalidFloat;
+    }
+
+    Py_INCREF(Py_None); 
+    return Py_None;
+}
+
+static PyObject*
+CEnt_getWaypoints(PyObject* _self, PyObject* args)
+{
+    CEnt* self = (CEnt*) _self;
+    PyObject* list = PyList_New(self->numWaypoints);
+    if (list == NULL)
+        return NULL;
+    for(int i = 0; i < self->numWaypoints; ++i)
+        PyList_SET_ITEM(list, i, Py_BuildValue("(f,f,i)", self->waypoints[i].pos.x, self->waypoints[i].pos.y, self->waypoints[i].targetID));
+    return list;
+}
+
 static PyObject*
 CEnt_register(PyObject* _self, PyObject* args)
 {
     CEnt* self = (CEnt*) _self;
     //printf("CEnt_register(%i, %p)\n", gCEntCounter, self);
+    if (gCEntCounter == gCEntCapacity)
+    {
+        int capacity = gCEntCapacity ? gCEntCapacity * 2 : 1024;
+        CEnt** grown = (CEnt**) realloc(gCEnts, capacity * sizeof(CEnt*));
+        if (grown == NULL)
+            return PyErr_NoMemory();
+        gCEnts = grown;
+        gCEntCapacity = capacity;
+    }
     self->id = gCEntCounter;
     gCEnts[gCEntCounter++] = self;
     for(int i = 0; i < kMaxDebugLines; ++i)
@@ -382,8 +671,11 @@ CEnt_getDebugLines(PyObject* _self, PyObject* args)
 static PyMethodDef CEnt_methods[] = {
     {"tick",        CEnt_tick, METH_VARARGS, "Update a CEnt's state by one frame"},
     {"helmTick",    CEnt_helmTick, METH_VARARGS, "Update a CEnt's helm by one frame - no AI"},
+    {"navTick",     CEnt_navTick, METH_VARARGS, "Run the navigator only - sets the helm's desired speed and heading, no physics"},
     {"register",    CEnt_register, METH_VARARGS, "Add the CEnt to our global pool of CEnts"},
     {"getDebugLines",    CEnt_getDebugLines, METH_VARARGS, "Get the list of debug lines I want to draw to the screen"},
+    {"setWaypoints", CEnt_setWaypoints, METH_VARARGS, "Route for the navigator - a sequence of CDesiredStates or (x, y[, targetID]), empty for none, and optionally the waypoint to start at"},
+    {"getWaypoints", CEnt_getWaypoints, METH_VARARGS, "The navigator's route as a list of (x, y, targetID), targetID -1 for world positions"},
     {NULL, NULL, 0, NULL},   /* Sentinel */
 };
 
@@ -412,6 +704,9 @@ static PyMemberDef CEnt_members[] = {
     {"destinationY",       T_FLOAT, offsetof(CEnt, destination) + offsetof(float2, y),     0,"destinationY"},
     {"stopAtDestination",  T_BOOL,  offsetof(CEnt, stopAtDestination),                     0,"stopAtDestination"},
     {"inRamMode",          T_BOOL,  offsetof(CEnt, inRamMode),                             0,"inRamMode"},
+    {"numWaypoints",       T_INT,   offsetof(CEnt, numWaypoints),                          READONLY,"numWaypoints"},
+    {"waypointIndex",      T_INT,   offsetof(CEnt, waypointIndex),                         READONLY,"waypointIndex"},
+    {"moveToReachedTolerance", T_FLOAT, offsetof(CEnt, moveToReachedTolerance),            0,"moveToReachedTolerance"},
 
     {"updateCounter",      T_INT,   offsetof(CEnt, updateCounter),                         0,"updateCounter"},
 
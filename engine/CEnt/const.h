@@ -33,5 +33,6 @@ const float kInvalidFloat = (float)(~0u);
 
 typedef unsigned int CEntHandle;
 const int kMaxDebugLines = 1024;
+const int kMaxWaypoints = 32;
 
 #endif
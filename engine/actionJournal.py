@@ -0,0 +1,407 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Append only journal of every action the ActionMgr queues
+
+Each action is turned into a plain record (ActionMgr's toRecord - tuples
+of numbers and strings, no objects) on the thread that queued it and
+handed to a background writer thread, which marshals it into
+
+    length, game time it was queued at, kind, <marshal version 2 bytes>
+
+Records are never changed once queued, so none of the serialising happens
+on the engine thread. The writer appends whatever has queued up in one write, and fsyncs at most once every fsyncInterval seconds
+- a crash loses at most that much. Files are rotated when they reach
+maxBytes:
+
+    ActionHistory/journal-20111231-235959.0000.ajl
+    ActionHistory/journal-20111231-235959.0001.ajl
+    ...
+
+A session starts with a SESSION record - the gameOptions it was played
+with that a replay has to match, testToRun and seed - which sessionInfo()
+reads back. Every so often ActionMgr also writes a KEYFRAME record - the world state
+at that game time - so a replay can start anywhere without running the
+whole session from the beginning.
+
+JournalStream reads a session back lazily and can seek to a keyframe,
+readJournal() reads all of its action records and toHistory() sorts them
+by time - Tools/journalToYaml.py turns those into an actionHistory.yaml.
+
+Reading a file never builds anything but plain data: loads() refuses
+whatever marshal can carry besides None, numbers, strings, tuples, lists
+and dicts.
+
+Nothing in here touches ogre.
+'''
+
+import os
+import glob
+import time
+import struct
+import marshal
+import threading
+import traceback
+
+Magic      = 'EAJ3'
+record     = struct.Struct("=IdB") # payload length, game time, kind
+Extension  = '.ajl'
+
+ACTION   = 0
+KEYFRAME = 1
+SESSION  = 2
+
+MAX_BYTES      = 16 * 1024 * 1024
+FSYNC_INTERVAL = 1.0
+
+Plain = (type(None), bool, int, long, float, str, unicode)
+
+def dumps(obj):
+    return marshal.dumps(obj, 2)
+
+def loads(payload):
+    '''marshal.loads, but only for plain data - see checkPlain
+    '''
+    obj = marshal.loads(payload)
+    checkPlain(obj)
+    return obj
+
+def checkPlain(obj):
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, (tuple, list)):
+            stack.extend(obj)
+        elif isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif not isinstance(obj, Plain):
+            raise ValueError('not plain data: %s' % type(obj).__name__)
+
+
+class Journal(threading.Thread):
+    def __init__(self, directory, name=None, maxBytes=MAX_BYTES, fsyncInterval=FSYNC_INTERVAL):
+        threading.Thread.__init__(self)
+        self.setDaemon(True)
+        self.directory = directory
+        self.name = name or time.strftime('journal-%Y%m%d-%H%M%S')
+        self.maxBytes = maxBytes
+        self.fsyncInterval = fsyncInterval
+
+        self.pending = [] # (kind, record, game time) waiting for the writer
+        self.condition = threading.Condition()
+        self.die = False
+
+        self.file = None
+        self.fileIndex = -1
+        self.fileBytes = 0
+        self.lastSync = 0.0
+        self.unsynced = False
+        self.nRecords = 0
+        self.nBytes = 0
+        self.nFailed = 0
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.start()
+
+    def append(self, action, now):
+        '''Called on the engine thread - action is a plain record, not the action itself
+        '''
+        self.appendRecord(ACTION, action, now)
+
+    def appendKeyframe(self, state, now):
+        self.appendRecord(KEYFRAME, state, now)
+
+    def appendSession(self, info, now):
+        self.appendRecord(SESSION, info, now)
+
+    def appendRecord(self, kind, obj, now):
+        '''Queue obj for the writer - nothing may change it afterwards
+        '''
+        self.condition.acquire()
+        self.pending.append((kind, obj, now))
+        self.condition.notify()
+        self.condition.release()
+
+    def serialise(self, batch):
+        '''Bytes of each (kind, record, time) in batch - on the writer thread
+        '''
+        serialised = []
+        for kind, obj, now in batch:
+            try:
+                payload = dumps(obj)
+            except Exception:
+                self.nFailed += 1
+                print 'Journal: cannot serialise', repr(obj)[:200]
+                traceback.print_exc()
+                continue
+            serialised.append(record.pack(len(payload), now, kind) + payload)
+        return serialised
+
+    def close(self):
+        self.condition.acquire()
+        self.die = True
+        self.condition.notify()
+        self.condition.release()
+        self.join(5.0)
+
+    def path(self, index):
+        return os.path.join(self.directory, '%s.%04i%s' % (self.name, index, Extension))
+
+    def rotate(self):
+        if self.file:
+            self.sync()
+            self.file.close()
+        self.fileIndex += 1
+        self.file = open(self.path(self.fileIndex), 'wb')
+        self.file.write(Magic)
+        self.fileBytes = len(Magic)
+
+    def sync(self):
+        if self.unsynced:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.unsynced = False
+        self.lastSync = time.time()
+
+    def run(self):
+        while True:
+            self.condition.acquire()
+            if not self.pending and not self.die:
+                timeout = None # nothing to write, nothing to sync - sleep until append
+                if self.unsynced:
+                    timeout = max(0.0, self.lastSync + self.fsyncInterval - time.time())
+                self.condition.wait(timeout)
+            batch, self.pending = self.pending, []
+            die = self.die
+            self.condition.release()
+
+            try:
+                self.write(self.serialise(batch))
+                if self.file and (die or time.time() - self.lastSync >= self.fsyncInterval):
+                    self.sync()
+            except (IOError, OSError):
+                print 'Journal: write failed'
+                traceback.print_exc()
+            if die:
+                break
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def write(self, batch):
+        if not batch:
+            return
+        if self.file is None:
+            self.rotate()
+        chunk = []
+        size = 0
+        for data in batch:
+            if self.fileBytes + size + len(data) > self.maxBytes and self.fileBytes + size > len(Magic):
+                self.file.write(''.join(chunk))
+                self.unsynced = True
+                self.rotate()
+                chunk = []
+                size = 0
+            chunk.append(data)
+            size += len(data)
+        self.file.write(''.join(chunk))
+        self.fileBytes += size
+        self.unsynced = True
+        self.nRecords += len(batch)
+        self.nBytes += sum([len(data) for data in batch])
+
+
+def journalFiles(path):
+    '''Every file of the session path belongs to, in order
+    path is one .ajl file or the session prefix (directory/journal-...)
+    '''
+    if path.endswith(Extension):
+        path = path[:-len(Extension)].rsplit('.', 1)[0]
+    return sorted(glob.glob(path + '.[0-9][0-9][0-9][0-9]' + Extension))
+
+class JournalStream(object):
+    '''A session read back lazily, in the order it was written
+    Only the record headers are read ahead - a payload is decoded when its
+    action is due. A record cut short by a crash ends its file, one that
+    does not decode is skipped.
+    '''
+    def __init__(self, path):
+        self.filenames = journalFiles(path)
+        self.file = None
+        self.fileIndex = -1
+        self.head = None # (length, time, kind) of the next record
+        self.index = None
+        self.nextFile()
+
+    def __nonzero__(self):
+        return self.head is not None
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+        self.head = None
+
+    def nextFile(self):
+        while True:
+            if self.file:
+                self.file.close()
+                self.file = None
+            self.fileIndex += 1
+            if self.fileIndex >= len(self.filenames):
+                self.head = None
+                return
+            self.file = open(self.filenames[self.fileIndex], 'rb')
+            if self.file.read(len(Magic)) == Magic:
+                self.readHead()
+                return
+            print 'Journal: %s is not a journal file' % self.filenames[self.fileIndex]
+
+    def readHead(self):
+        head = self.file.read(record.size)
+        if len(head) < record.size:
+            self.head = None
+        else:
+            self.head = record.unpack(head)
+
+    def readPayload(self):
+        '''Decoded payload of the current record, and move on to the next one
+        None if the record is cut short or does not decode
+        '''
+        length = self.head[0]
+        payload = self.file.read(length)
+        obj = None
+        if len(payload) < length:
+            print 'Journal: %s ends in a partial record' % self.filenames[self.fileIndex]
+            self.head = None
+        else:
+            try:
+                obj = loads(payload)
+            except Exception:
+                print 'Journal: skipping a record of %s that does not decode' % self.filenames[self.fileIndex]
+                traceback.print_exc()
+            self.readHead()
+        if self.head is None:
+            self.nextFile()
+        return obj
+
+    def skipPayload(self):
+        self.file.seek(self.head[0], 1)
+        self.readHead()
+        if self.head is None:
+            self.nextFile()
+
+    def readUntil(self, now):
+        '''Action records that were queued at or before game time now, in the order they were queued
+        '''
+        actions = []
+        while self.head and self.head[1] <= now:
+            if self.head[2] == ACTION:
+                action = self.readPayload()
+                if action is not None:
+                    actions.append(action)
+            else:
+                self.skipPayload()
+        return actions
+
+    def skipUntil(self, now):
+        '''Drop everything queued at or before game time now
+        '''
+        while self.head and self.head[1] <= now:
+            self.skipPayload()
+
+    def keyframes(self):
+        '''[(time, fileIndex, offset)] of every keyframe - headers only, built once
+        '''
+        if self.index is None:
+            self.index = []
+            for fileIndex, filename in enumerate(self.filenames):
+                f = open(filename, 'rb')
+                try:
+                    if f.read(len(Magic)) != Magic:
+                        continue
+                    offset = len(Magic)
+                    size = os.fstat(f.fileno()).st_size
+                    while offset + record.size <= size:
+                        length, t, kind = record.unpack(f.read(record.size))
+                        if offset + record.size + length > size:
+                            break
+                        if kind == KEYFRAME:
+                            self.index.append((t, fileIndex, offset))
+                        offset += record.size + length
+                        f.seek(offset)
+                finally:
+                    f.close()
+        return self.index
+
+    def seek(self, now):
+        '''Position just after the last keyframe at or before game time now
+        Returns (keyframe time, keyframe state), or None - and back to the start - if there is none
+        '''
+        best = None
+        for keyframe in self.keyframes():
+            if keyframe[0] > now:
+                break
+            best = keyframe
+        self.close()
+        if best is None:
+            self.fileIndex = -1
+            self.nextFile()
+            return None
+        t, self.fileIndex, offset = best
+        self.file = open(self.filenames[self.fileIndex], 'rb')
+        self.file.seek(offset)
+        self.readHead()
+        return t, self.readPayload()
+
+
+def readJournal(path):
+    '''Yields the action records of a session in the order they were queued
+    '''
+    stream = JournalStream(path)
+    while stream:
+        if stream.head[2] == ACTION:
+            action = stream.readPayload()
+            if action is not None:
+                yield action
+        else:
+            stream.skipPayload()
+
+def sessionInfo(path):
+    '''The SESSION record's dict a session starts with, None if it has none
+    '''
+    stream = JournalStream(path)
+    try:
+        if stream and stream.head[2] == SESSION:
+            return stream.readPayload()
+        return None
+    finally:
+        stream.close()
+
+def toHistory(path):
+    '''Every action record of a journal session, time ordered
+    '''
+    actions = list(readJournal(path))
+    actions.sort(key=lambda action:action[1])
+    return actions
@@ -23,11 +23,13 @@
 import exceptions
 from mgr import Mgr
 from vector import vector3
-import timer
 import os
 import yaml
-import traceback
 import command
+import desiredState
+import snapshot
+from actionQueue import ActionQueue
+from actionJournal import Journal, JournalStream
 
 class ActionHistory(object):
     def __init__(self):
@@ -35,10 +37,15 @@ class ActionHistory(object):
         self.actions = []
 
 class Action(object):
+    """Journals and snapshots hold toRecord's plain tuple (class name, time, handle, ...)
+    An actionHistory.yaml holds the actions as yaml.dump writes them - see HistoryLoader
+    """
     def __init__(self, time):
         self.time = time
     def do(self, engine):
         raise exceptions.CallingAbstractFunction
+    def toRecord(self):
+        raise exceptions.CallingAbstractFunction
 
 class CreateEntity(Action):
     def __init__(self, time, handle, type):
@@ -46,6 +53,15 @@ class CreateEntity(Action):
         self.handle = handle
         self.type = type
 
+    def toRecord(self):
+        return ('CreateEntity', self.time, self.handle, self.type.__name__)
+
+    @classmethod
+    def fromRecord(cls, record):
+        import boat
+        name, time, handle, typeName = record
+        return cls(time, tuple(handle), boat.typeNamed(typeName))
+
     def do(self, engine):
         #print 'CreateEntity.do', self.handle, self.type
         engine.entMgr.createEntity(self.handle, self.type)
@@ -56,6 +72,14 @@ class MoveEntity(Action):
         self.handle = handle
         self.pos = pos
 
+    def toRecord(self):
+        return ('MoveEntity', self.time, self.handle, (self.pos.x, self.pos.y, self.pos.z))
+
+    @classmethod
+    def fromRecord(cls, record):
+        name, time, handle, pos = record
+        return cls(time, tuple(handle), vector3(*pos))
+
     def do(self, engine):
         #print 'MoveEntity.do', self.handle, self.pos
         ent = engine.entMgr.findEntFromHandle(self.handle)
@@ -68,6 +92,14 @@ class MoveToAction(Action):
         self.desiredState = desiredState
         self.replaceExistingCommands = replaceExistingCommands
 
+    def toRecord(self):
+        return ('MoveToAction', self.time, self.handle, desiredState.toRecord(self.desiredState), self.replaceExistingCommands)
+
+    @classmethod
+    def fromRecord(cls, record):
+        name, time, handle, state, replaceExistingCommands = record
+        return cls(time, tuple(handle), desiredState.fromRecord(state), bool(replaceExistingCommands))
+
     def do(self, engine):
         ent = engine.entMgr.findEntFromHandle(self.handle)
         self.desiredState.connectToEngine(engine)
@@ -75,6 +107,7 @@ class MoveToAction(Action):
         if self.replaceExistingCommands:
             ent.squad.SquadAI.commands = []
         ent.squad.SquadAI.commands.append(cmd)
+        engine.pathPlanner.route(ent, cmd)
 
 class AdjustSpeed(Action):
     def __init__(self, time, handle, speed):
@@ -82,73 +115,184 @@ class AdjustSpeed(Action):
         self.handle = handle
         self.speed = speed
 
+    def toRecord(self):
+        return ('AdjustSpeed', self.time, self.handle, self.speed)
+
+    @classmethod
+    def fromRecord(cls, record):
+        name, time, handle, speed = record
+        return cls(time, tuple(handle), speed)
+
     def do(self, engine):
         ent = engine.entMgr.findEntFromHandle(self.handle)
         ent.UnitAI.navDesiredSpeed      = self.speed
         ent.UnitAI.command.desiredSpeed = self.speed
         ent.uiDesiredSpeed              = self.speed
 
+actionTypes = dict([(cls.__name__, cls) for cls in (CreateEntity, MoveEntity, MoveToAction, AdjustSpeed)])
+
+def actionFromRecord(record):
+    actionType = actionTypes.get(record[0])
+    if actionType is None:
+        raise ValueError('unknown action %r' % (record[0],))
+    return actionType.fromRecord(record)
+
+def globalKey(name):
+    # (module, name) of a dotted name - engine.actionMgr or actionMgr, depending on who imported it
+    module, name = name.rsplit('.', 1)
+    return module.rsplit('.', 1)[-1], name
+
+class HistoryLoader(getattr(yaml, 'CSafeLoader', yaml.SafeLoader)):
+    """Reads the ActionHistory documents yaml.dump writes without letting them build anything else
+    Only the python tags an action history is made of are understood: the
+    history, the four actions, their DesiredStates, handle tuples, vector3
+    positions and boat types. Any other tag is a ConstructorError, as with
+    a plain SafeLoader.
+    """
+    def constructObject(self, suffix, node):
+        state = self.construct_mapping(node, deep=True)
+        module, name = globalKey(suffix)
+        if (module, name) == ('actionMgr', 'ActionHistory'):
+            history = ActionHistory()
+            history.actions = list(state.get('actions', []))
+            for action in history.actions:
+                if not isinstance(action, Action):
+                    raise yaml.constructor.ConstructorError(None, None, 'not an action: %r' % (action,), node.start_mark)
+            return history
+        if module == 'actionMgr' and name in actionTypes:
+            try:
+                action = actionTypes[name](**state)
+            except TypeError:
+                raise yaml.constructor.ConstructorError(None, None, 'bad %s: %r' % (name, state), node.start_mark)
+            action.handle = tuple(action.handle)
+            return action
+        if module == 'desiredState':
+            return desiredState.fromRecord((state['type'], state['pos'], state['offset'], state.get('entHandle')))
+        raise yaml.constructor.ConstructorError(None, None, 'not part of an action history: %s' % suffix, node.start_mark)
+
+    def constructApply(self, suffix, node):
+        if not suffix.startswith('ogre.') or globalKey(suffix)[1] != vector3.__name__:
+            raise yaml.constructor.ConstructorError(None, None, 'not part of an action history: %s' % suffix, node.start_mark)
+        return vector3(*self.construct_sequence(node, deep=True))
+
+    def constructName(self, suffix, node):
+        import boat
+        module, name = globalKey(suffix)
+        if module != 'boat':
+            raise yaml.constructor.ConstructorError(None, None, 'not a boat type: %s' % suffix, node.start_mark)
+        return boat.typeNamed(name)
+
+    def constructTuple(self, node):
+        return tuple(self.construct_sequence(node, deep=True))
+
+HistoryLoader.add_multi_constructor('tag:yaml.org,2002:python/object:', HistoryLoader.constructObject)
+HistoryLoader.add_multi_constructor('tag:yaml.org,2002:python/object/apply:', HistoryLoader.constructApply)
+HistoryLoader.add_multi_constructor('tag:yaml.org,2002:python/name:', HistoryLoader.constructName)
+HistoryLoader.add_constructor('tag:yaml.org,2002:python/tuple', HistoryLoader.constructTuple)
+
 class ActionMgr(Mgr):
     history = ActionHistory()
-    pendingActions = []
 
     def initialize(self):
-        pass
+        self.pendingActions = ActionQueue()
+        self.journal = None
+        self.streams = []
+        self.seekTo = None
+        self.nextKeyframe = 0.0
 
+    historyDirectory = 'ActionHistory/'
     def loadLevel(self):
         #print 'ActionMgr.loadLevel'
-        for filename in self.engine.localOptions.gameOptions.toLoad:
-            filename = os.path.join('ActionHistory/', filename)
-            f = open(filename, 'r')
-            s = f.read()
-            f.close()
-            history = yaml.load(s)
-            for action in history.actions:
-                self.enqueue(action)
+        gameOptions = self.engine.localOptions.gameOptions
+        for filename in gameOptions.toLoad:
+            filename = os.path.join(self.historyDirectory, filename)
+            if filename.endswith('.yaml'): # an ActionHistory, as written before the journal or by Tools/journalToYaml.py
+                f = open(filename, 'r')
+                history = yaml.load(f, Loader=HistoryLoader)
+                f.close()
+                self.pendingActions.pushMany(history.actions)
+            else: # a journal session - streamed in as the game time it was queued at comes round
+                stream = JournalStream(filename)
+                if not stream:
+                    print 'ActionMgr: nothing to load from', filename
+                    continue
+                self.streams.append(stream)
+        if gameOptions.startTime > 0.0:
+            self.seekTo = gameOptions.startTime # once everything else has loaded
+        # this session's new actions - Tools/journalToYaml.py turns it into a loadable history
+        self.nextKeyframe = 0.0
+        if gameOptions.journal:
+            self.journal = Journal(self.historyDirectory)
+            self.journal.appendSession({'testToRun' : gameOptions.testToRun, 'seed' : gameOptions.seed}, self.engine.gameTime)
+            print 'ActionMgr: journaling to', self.journal.path(0)
+
+    def releaseLevel(self):
+        if self.journal:
+            self.journal.close()
+            self.journal = None
+        for stream in self.streams:
+            stream.close()
+        self.streams = []
+        self.pendingActions.clear()
 
-    historyFilename = 'ActionHistory/actionHistory.yaml'
-    historyFilenameBackup = 'ActionHistory/actionHistory_backup.yaml'
-    toFileTimer = timer.Timer(1.0)
-    dirty = False
     def tick(self, dtime):
-        while self.pendingActions:
-            action = self.pendingActions[0]
+        if self.seekTo is not None:
+            self.seek(self.seekTo)
+            self.seekTo = None
+
+        now = self.engine.gameTime
+        for stream in self.streams:
+            self.pendingActions.pushMany([actionFromRecord(record) for record in stream.readUntil(now)])
+        for action in self.pendingActions.popDue(now):
             #print action, action.time, self.engine.gameTime
-            if self.engine.gameTime >= action.time:
-                self.pendingActions.pop(0)
-                self.do(action)
-            else:
-                break #list is sorted - if first fails, all fail
-
-        if self.dirty and self.toFileTimer.check(dtime):
-            self.dirty = False
-            try:
-                os.unlink(self.historyFilenameBackup)
-            except:
-                print 'Failed to erase old history file'
-                traceback.print_exc()
+            self.do(action)
 
-            try:
-                os.rename(self.historyFilename, self.historyFilenameBackup)
-            except:
-                print 'Failed to backup history file'
-                traceback.print_exc()
+        interval = self.engine.localOptions.gameOptions.keyframeInterval
+        if self.journal and interval > 0.0 and now >= self.nextKeyframe:
+            self.nextKeyframe = now + interval
+            self.journal.appendKeyframe(self.keyframe(), now)
+
+    def keyframe(self):
+        '''World state at this point of the tick, actions still to run included
+        Only builds the plain state - the journal's writer thread marshals it
+        '''
+        return snapshot.capture(self.engine)
+
+    def restoreKeyframe(self, state):
+        snapshot.restore(self.engine, state)
 
-            s = yaml.dump(self.history)
-            f = open(self.historyFilename, 'w')
-            f.write(s)
-            f.close()
+    def seek(self, t):
+        '''Jump a replay to game time t
+        Restores the latest keyframe at or before t, then lets the main loop
+        catch up to t - only the tail after the keyframe is simulated.
+        Ents the keyframe does not know about are left alone.
+        '''
+        best = None
+        for stream in self.streams:
+            found = stream.seek(t)
+            if found and found[1] is not None and (best is None or found[0] > best[0]):
+                best = found
+        if best is None:
+            print 'ActionMgr: no keyframe before %.1f, replaying from the start' % t
+            return
+        keyframeTime, state = best
+        for stream in self.streams: # the other sessions carry on from the keyframe
+            stream.seek(keyframeTime)
+            stream.skipUntil(keyframeTime)
+        self.restoreKeyframe(state)
+        self.engine.gameTime = keyframeTime
+        self.engine.gameTimeAccumulated = max(self.engine.gameTimeAccumulated, t)
+        self.nextKeyframe = keyframeTime
+        print 'ActionMgr: restored keyframe at %.1f, catching up to %.1f' % (keyframeTime, t)
 
     def do(self, action):
         action.do(self.engine)
         #print 'ActionMgr.do', action
 
     def enqueue(self, action):
-        self.dirty = True
-        self.pendingActions.append(action)
-        self.pendingActions.sort(key=lambda action:action.time)
-        #self.history.actions.append(action)
-        #self.history.actions.sort(key=lambda action:action.time)
+        self.pendingActions.push(action)
+        if self.journal:
+            self.journal.append(action.toRecord(), self.engine.gameTime)
 
     #class TestEntityClass:
         #def __init__(self):
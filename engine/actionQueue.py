@@ -0,0 +1,140 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Time ordered queue of pending actions
+
+A binary heap of (time, sequence, action). The sequence number breaks ties, so
+actions with the same time come out in the order they were queued, the same as
+the stable sort ActionMgr used to do after every enqueue - but enqueue and
+dequeue are O(log n), and pushMany loads a whole history in O(n).
+
+Nothing in here touches ogre.
+'''
+
+import heapq
+
+
+class ActionQueue(object):
+    def __init__(self):
+        self.heap = []
+        self.sequence = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __nonzero__(self):
+        return bool(self.heap)
+
+    def push(self, action):
+        heapq.heappush(self.heap, (action.time, self.sequence, action))
+        self.sequence += 1
+
+    def pushMany(self, actions):
+        '''Bulk load - one heapify instead of a push per action
+        '''
+        sequence = self.sequence
+        entries = [(action.time, sequence + i, action) for i, action in enumerate(actions)]
+        self.sequence = sequence + len(entries)
+        if len(entries) > len(self.heap):
+            self.heap.extend(entries)
+            heapq.heapify(self.heap)
+        else:
+            for entry in entries:
+                heapq.heappush(self.heap, entry)
+
+    def peek(self):
+        '''Earliest action, or None
+        '''
+        if self.heap:
+            return self.heap[0][2]
+        return None
+
+    def pop(self):
+        return heapq.heappop(self.heap)[2]
+
+    def popDue(self, now):
+        '''Yields, in order, every action with time <= now
+        An action queued while we are yielding is picked up too if it is due
+        '''
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            yield heapq.heappop(heap)[2]
+
+    def clear(self):
+        self.heap = []
+
+    def __iter__(self):
+        '''Pending actions in the order they will run - a sorted copy, the queue is untouched
+        '''
+        return (entry[2] for entry in sorted(self.heap))
+
+
+if __name__ == '__main__':
+    import time
+    import random
+
+    class Action(object):
+        def __init__(self, time):
+            self.time = time
+
+    def oldEnqueue(pending, action): # what ActionMgr.enqueue did
+        pending.append(action)
+        pending.sort(key=lambda action:action.time)
+
+    def oldDrain(pending):
+        while pending:
+            pending.pop(0)
+
+    random.seed(1)
+    for n in (1000, 5000, 10000, 100000):
+        actions = [Action(round(random.uniform(0.0, 3600.0), 1)) for i in xrange(n)]
+
+        if n <= 5000: # the old way is quadratic - 10k already takes half a minute
+            pending = []
+            start = time.time()
+            for action in actions:
+                oldEnqueue(pending, action)
+            oldLoad = time.time() - start
+            start = time.time()
+            oldDrain(pending)
+            oldRun = time.time() - start
+            old = 'list+sort load: %8.1f ms  run: %8.1f ms' % (oldLoad * 1000.0, oldRun * 1000.0)
+        else:
+            old = 'list+sort skipped'
+
+        queue = ActionQueue()
+        start = time.time()
+        queue.pushMany(actions)
+        bulkLoad = time.time() - start
+        start = time.time()
+        ran = list(queue.popDue(3600.0))
+        heapRun = time.time() - start
+        assert len(ran) == n and all(ran[i].time <= ran[i + 1].time for i in xrange(n - 1))
+
+        queue = ActionQueue()
+        start = time.time()
+        for action in actions:
+            queue.push(action)
+        pushLoad = time.time() - start
+
+        print '%6i actions  %s   heap bulk load: %6.1f ms  push load: %6.1f ms  run: %6.1f ms' % (n, old, bulkLoad * 1000.0, pushLoad * 1000.0, heapRun * 1000.0)
@@ -0,0 +1,298 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Monte Carlo batches - one scenario run many times with different seeds
+
+    from engine.batch import runBatch, CarrierApproach, ResultTable
+    table = ResultTable()
+    for seed, metrics in runBatch(CarrierApproach(20), range(1, 201), localOptions):
+        table.add(seed, metrics)
+    print table.format()
+
+Every worker process brings up one headless engine, builds the scenario
+once and snapshots it. A run resets to that snapshot (Engine.loadSnapshot),
+reseeds engine.random with the run's seed, lets the scenario scatter its
+ships with it and steps the sim, sampling metrics as it goes - no level
+load, no ents created. Results come back as runs finish, in any order.
+
+A Scenario is build / scatter / begin / sample / result. It is pickled out
+to each worker before build() runs there, so ents it keeps stay per worker.
+'''
+
+import math
+import timeit
+
+from spatialGrid import SpatialGrid
+
+class Scenario(object):
+    seconds = 300.0      # game seconds per run
+    sampleInterval = 0.5 # game seconds between sample() calls
+
+    def build(self, engine):
+        '''Create the ships, once per worker
+        '''
+        pass
+
+    def scatter(self, engine, rng):
+        '''Randomize the freshly reset world for this run
+        '''
+        pass
+
+    def begin(self, engine):
+        pass
+
+    def sample(self, engine):
+        pass
+
+    def result(self, engine):
+        '''{metric: number or None} for the run that just ended
+        '''
+        return {}
+
+def hullDistance(a, b):
+    '''Gap between two hulls, each a capsule as long as the boat and beam wide - negative when they overlap
+    '''
+    ra = a.beam * 0.5
+    rb = b.beam * 0.5
+    return segmentDistance(hullSegment(a, ra), hullSegment(b, rb)) - ra - rb
+
+def hullSegment(ent, radius):
+    half = max(ent.length * 0.5 - radius, 0.0)
+    dx = math.cos(ent.yaw) * half
+    dz = -math.sin(ent.yaw) * half # mathlib.vectorToYaw
+    return (ent.pos.x - dx, ent.pos.z - dz, ent.pos.x + dx, ent.pos.z + dz)
+
+def pointSegmentDistance(px, pz, segment):
+    ax, az, bx, bz = segment
+    dx = bx - ax
+    dz = bz - az
+    length2 = dx * dx + dz * dz
+    t = 0.0
+    if length2 > 0.0:
+        t = min(max(((px - ax) * dx + (pz - az) * dz) / length2, 0.0), 1.0)
+    x = ax + t * dx - px
+    z = az + t * dz - pz
+    return math.sqrt(x * x + z * z)
+
+def segmentDistance(s1, s2):
+    ax, az, bx, bz = s1
+    cx, cz, dx, dz = s2
+    def cross(ox, oz, px, pz, qx, qz):
+        return (px - ox) * (qz - oz) - (pz - oz) * (qx - ox)
+    d1 = cross(cx, cz, dx, dz, ax, az)
+    d2 = cross(cx, cz, dx, dz, bx, bz)
+    d3 = cross(ax, az, bx, bz, cx, cz)
+    d4 = cross(ax, az, bx, bz, dx, dz)
+    if d1 * d2 < 0.0 and d3 * d4 < 0.0:
+        return 0.0
+    return min(pointSegmentDistance(ax, az, s2), pointSegmentDistance(bx, bz, s2),
+               pointSegmentDistance(cx, cz, s1), pointSegmentDistance(dx, dz, s1))
+
+class CarrierApproach(Scenario):
+    '''TestMgr.setupCarrierApproach - speed boats closing on stations around a moving carrier
+
+    station_*   seconds until each boat is first within stationTolerance of its station
+    on_station  fraction of the boats that got there at all
+    closest_*   smallest hull to hull gap seen, to the carrier and between boats
+    collisions  times two hulls went from apart to touching
+    '''
+    nearRadius = 200.0 # boats further apart than this are not looked at for closest / collisions
+
+    def __init__(self, numSpeedBoats=20, seconds=300.0, sampleInterval=0.5, stationTolerance=50.0):
+        self.numSpeedBoats = numSpeedBoats
+        self.seconds = seconds
+        self.sampleInterval = sampleInterval
+        self.stationTolerance = stationTolerance
+
+    def build(self, engine):
+        self.carrier, self.speedBoats = engine.testMgr.setupCarrierApproach(self.numSpeedBoats)
+
+    def scatter(self, engine, rng):
+        engine.testMgr.scatterCarrierApproach(self.carrier, self.speedBoats, rng)
+
+    def begin(self, engine):
+        self.startTime = engine.gameTime
+        self.arrivals = [None] * len(self.speedBoats)
+        self.closestCarrier = None
+        self.closestBoats = None
+        self.touching = set()
+        self.collisions = 0
+
+    def sample(self, engine):
+        now = engine.gameTime - self.startTime
+        tolerance2 = self.stationTolerance ** 2
+        for i, ent in enumerate(self.speedBoats):
+            if self.arrivals[i] is None:
+                station = ent.UnitAI.commands and ent.UnitAI.commands[0].desiredState
+                if not station:
+                    continue
+                target = station.calcWorldPos(ent)
+                dx = target.x - ent.pos.x
+                dz = target.z - ent.pos.z
+                if dx * dx + dz * dz < tolerance2:
+                    self.arrivals[i] = now
+
+        ships = [self.carrier] + self.speedBoats
+        grid = SpatialGrid(self.nearRadius)
+        for i, ent in enumerate(ships):
+            if i:
+                grid.insert(i, ent.pos.x, ent.pos.z)
+        touching = set()
+        for i, ent in enumerate(ships):
+            reach = self.nearRadius + ent.length * 0.5
+            for j, d2 in grid.queryCircle(ent.pos.x, ent.pos.z, reach):
+                if j <= i:
+                    continue
+                gap = hullDistance(ent, ships[j])
+                if i == 0:
+                    if self.closestCarrier is None or gap < self.closestCarrier:
+                        self.closestCarrier = gap
+                elif self.closestBoats is None or gap < self.closestBoats:
+                    self.closestBoats = gap
+                if gap <= 0.0:
+                    touching.add((i, j))
+        self.collisions += len(touching - self.touching)
+        self.touching = touching
+
+    def result(self, engine):
+        arrived = [t for t in self.arrivals if t is not None]
+        stationMean = stationMax = None
+        if arrived:
+            stationMean = sum(arrived) / len(arrived)
+            stationMax = max(arrived)
+        return {
+            'station_mean_s'     : stationMean,
+            'station_max_s'      : stationMax,
+            'on_station'         : len(arrived) / float(max(len(self.arrivals), 1)),
+            'closest_carrier_m'  : self.closestCarrier,
+            'closest_boats_m'    : self.closestBoats,
+            'collisions'         : self.collisions,
+        }
+
+_worker = None # (engine, scenario, snapshot) - one per pool process
+
+def _initWorker(scenario, localOptions):
+    global _worker
+    from headless import startEngine
+    gameOptions = localOptions.gameOptions
+    gameOptions.testToRun = 0 # empty ocean, the scenario builds its own ships
+    gameOptions.deterministic = True
+    gameOptions.seed = 0
+    gameOptions.journal = False
+    gameOptions.keyframeInterval = 0.0
+    e = startEngine(localOptions)
+    e.stateHasher = None # runs are compared by their metrics, hashes would just pile up
+    scenario.build(e)
+    _worker = (e, scenario, e.saveSnapshot())
+
+def _run(seed):
+    e, scenario, snapshot = _worker
+    start = timeit.default_timer()
+    e.loadSnapshot(snapshot)
+    e.gameTimeAccumulated = e.gameTime
+    e.random.seed(seed)
+    scenario.scatter(e, e.random)
+    scenario.begin(e)
+
+    step = e.kTimeStepSize
+    sampleEvery = max(int(round(scenario.sampleInterval / step)), 1)
+    for tick in xrange(1, int(round(scenario.seconds / step)) + 1):
+        e.mainStep(step)
+        e.gameTime += step
+        if tick % sampleEvery == 0:
+            scenario.sample(e)
+
+    metrics = scenario.result(e)
+    metrics['run_ms'] = (timeit.default_timer() - start) * 1000.0
+    return seed, metrics
+
+def runBatch(scenario, seeds, localOptions, processes=None):
+    '''Yields (seed, metrics) as the runs finish
+    processes - pool size, one per cpu by default
+    '''
+    import multiprocessing
+    pool = multiprocessing.Pool(processes, initializer=_initWorker, initargs=(scenario, localOptions))
+    try:
+        for seed, metrics in pool.imap_unordered(_run, seeds):
+            yield seed, metrics
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+class ResultTable(object):
+    '''Per run metrics as they come in, plus a summary of each metric over the runs
+    '''
+    stats = ('n', 'mean', 'std', 'min', 'p05', 'p50', 'p95', 'max')
+
+    def __init__(self):
+        self.columns = []
+        self.rows = []
+
+    def add(self, seed, metrics):
+        for name in sorted(metrics):
+            if name not in self.columns:
+                self.columns.append(name)
+        self.rows.append((seed, metrics))
+
+    def summary(self):
+        '''{metric: {stat: value}} - runs where a metric is None are left out of it
+        '''
+        summary = {}
+        for name in self.columns:
+            values = [metrics[name] for seed, metrics in self.rows if metrics.get(name) is not None]
+            if not values:
+                continue
+            values.sort()
+            n = len(values)
+            mean = sum(values) / float(n)
+            pick = lambda p: values[min(n - 1, int(n * p))]
+            summary[name] = {
+                'n'     : n,
+                'mean'  : mean,
+                'std'   : math.sqrt(sum([(v - mean) ** 2 for v in values]) / n),
+                'min'   : values[0],
+                'p05'   : pick(0.05),
+                'p50'   : pick(0.50),
+                'p95'   : pick(0.95),
+                'max'   : values[-1],
+            }
+        return summary
+
+    def format(self):
+        summary = self.summary()
+        lines = ['%-20s' % 'metric' + ''.join(['%12s' % stat for stat in self.stats])]
+        for name in self.columns:
+            if name in summary:
+                lines.append('%-20s' % name + ''.join(['%12.4g' % summary[name][stat] for stat in self.stats]))
+        return '\n'.join(lines)
+
+    def write(self, filename):
+        '''One CSV row per run, sorted by seed
+        '''
+        f = open(filename, 'w')
+        f.write(','.join(['seed'] + self.columns) + '\n')
+        for seed, metrics in sorted(self.rows):
+            values = [metrics.get(name) for name in self.columns]
+            f.write(','.join([str(seed)] + [value is not None and repr(value) or '' for value in values]) + '\n')
+        f.close()
@@ -243,3 +243,11 @@ class CIGARETTE(SmallBoat):
     width  = meters (2.44)
 
 
+
+def typeNamed(name):
+    """A Boat type by class name - the journal and snapshots store the name, not the class
+    """
+    boatType = globals().get(name)
+    if not isinstance(boatType, type) or not issubclass(boatType, Boat):
+        raise ValueError('unknown boat type %r' % (name,))
+    return boatType
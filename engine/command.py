@@ -74,3 +74,26 @@ class ManualControl(Command):
     def uiStr(self):
         return 'ManualControl:'
 
+
+def toRecord(cmd):
+    '''Plain tuple of a command for the journal and snapshots - fromRecord undoes it
+    '''
+    if isinstance(cmd, MoveTo):
+        return ('MoveTo', desiredState.toRecord(cmd.desiredState), cmd.desiredSpeed)
+    if isinstance(cmd, Stop):
+        return ('Stop', cmd.duration)
+    if isinstance(cmd, (NetSlave, ManualControl)):
+        return (type(cmd).__name__,)
+    raise ValueError('cannot record %r' % cmd)
+
+def fromRecord(engine, record):
+    kind = record[0]
+    if kind == 'MoveTo':
+        return MoveTo(engine, desiredState.fromRecord(record[1]), record[2])
+    if kind == 'Stop':
+        return Stop(engine, record[1])
+    if kind == 'NetSlave':
+        return NetSlave(engine)
+    if kind == 'ManualControl':
+        return ManualControl(engine)
+    raise ValueError('unknown command %r' % (kind,))
@@ -44,7 +44,7 @@ class ManualControl(Aspect):
 
     def init(self):
         self.ddContext = self.engine.debugDrawSystem.getContext()
-        self.timer = Timer(0.01)
+        self.timer = Timer(0.01, rng=self.engine.random)
         self.desiredSpeed = 0.0
         self.desiredHeading = 0.0
 
@@ -113,5 +113,31 @@ class MaintainingRelativeToEnt(DesiredState):
     def connectToEngine(self, engine):
         if self.entHandle:
             self.ent = engine.entMgr.findEntFromHandle(self.entHandle)
+            self.targetID = self.ent.UnitAI.cent.id
             self.entHandle = None
 
+
+def toRecord(state):
+    '''Plain tuple of a DesiredState for the journal and snapshots - fromRecord undoes it
+    '''
+    saved = state.__getstate__()
+    return (saved['type'], saved['pos'], saved['offset'], saved.get('entHandle'))
+
+def fromRecord(record):
+    '''A DesiredState from toRecord's tuple (or the lists yaml gives back)
+    Relative states still need connectToEngine before they are used
+    '''
+    type, pos, offset, entHandle = record
+    if type == DesiredState.Type.STOPPED_AT_POSITION:
+        state = StoppedAtPosition.__new__(StoppedAtPosition)
+    elif type == DesiredState.Type.MAINTAINING_RELATIVE_TO_ENT:
+        state = MaintainingRelativeToEnt.__new__(MaintainingRelativeToEnt)
+    else:
+        raise ValueError('unknown desired state type %r' % (type,))
+    state.__setstate__({
+        'type'      : type,
+        'pos'       : (float(pos[0]), float(pos[1])),
+        'offset'    : (float(offset[0]), float(offset[1])),
+        'entHandle' : entHandle and tuple(entHandle) or None,
+    })
+    return state
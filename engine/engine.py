@@ -71,11 +71,23 @@ class Engine(EngineObject):
     def __init__(self, localOptions):
         import time
         import random
+        gameOptions = localOptions.gameOptions
+        self.deterministic = gameOptions.deterministic
         r = random.Random()
-        r.seed(time.time())
+        if self.deterministic:
+            r.seed(gameOptions.seed)
+        else:
+            r.seed(time.time())
         self.executionHandle = abs(int(r.getrandbits(32)))
+        self.random = random.Random(r.getrandbits(32)) # the sim's own stream - scenarios, timers
         self.localOptions = localOptions
 
+        self.headless = localOptions.gfxOptions.headless
+        self.stateHasher = None
+        if self.deterministic:
+            from stateHash import StateHasher
+            self.stateHasher = StateHasher()
+
         if localOptions.engineeringOptions.loadPsyco:
             try:
                 import psyco
@@ -115,6 +127,7 @@ class Engine(EngineObject):
         assert self.state == self.State.RELEASED
 
         from actionMgr import ActionMgr
+        from pathPlanner import PathPlanner
         from aspectMgr import AspectMgr
         from entMgr import EntMgr
         from gfxSystem import GfxSystem
@@ -126,8 +139,16 @@ class Engine(EngineObject):
         from widget import WidgetMgr
         from testMgr import TestMgr
         from netMgr import NetMgr
+        if self.headless:
+            from headless import HeadlessGfxSystem as GfxSystem
+            from headless import HeadlessCameraSystem as CameraSystem
+            from headless import HeadlessDebugDrawSystem as DebugDrawSystem
+            from headless import HeadlessInputSystem as InputSystem
+            from headless import HeadlessSelectionSystem as SelectionSystem
+            from headless import HeadlessWidgetMgr as WidgetMgr
 
         self.actionMgr = ActionMgr(self)
+        self.pathPlanner = PathPlanner(self)
         self.aspectMgr = AspectMgr(self)
         self.entMgr = EntMgr(self)
         self.gfxSystem = GfxSystem(self)
@@ -141,6 +162,7 @@ class Engine(EngineObject):
         self.netMgr  = NetMgr(self)
 
         self.actionMgr.initialize()
+        self.pathPlanner.initialize()
         self.aspectMgr.initialize()
         self.entMgr.initialize()
         self.gfxSystem.initialize()
@@ -165,6 +187,7 @@ class Engine(EngineObject):
         self.crosslink()
         self.memoryMgr.crosslink()
         self.actionMgr.crosslink()
+        self.pathPlanner.crosslink()
         self.aspectMgr.crosslink()
         self.entMgr.crosslink()
         self.gfxSystem.crosslink()
@@ -179,6 +202,7 @@ class Engine(EngineObject):
 
     def initEngine(self):
         self.actionMgr.initEngine()
+        self.pathPlanner.initEngine()
         self.aspectMgr.initEngine()
         self.entMgr.initEngine()
         self.gfxSystem.initEngine()
@@ -192,6 +216,7 @@ class Engine(EngineObject):
         self.netMgr.initEngine()
 
         self.actionMgr.initEnginePost()
+        self.pathPlanner.initEnginePost()
         self.aspectMgr.initEnginePost()
         self.entMgr.initEnginePost()
         self.gfxSystem.initEnginePost()
@@ -206,6 +231,7 @@ class Engine(EngineObject):
 
     def initMenu(self):
         self.actionMgr.initMenu()
+        self.pathPlanner.initMenu()
         self.aspectMgr.initMenu()
         self.entMgr.initMenu()
         self.gfxSystem.initMenu()
@@ -221,6 +247,7 @@ class Engine(EngineObject):
     def loadLevel(self):
         self.levelSystem.loadLevel()
         self.actionMgr.loadLevel()
+        self.pathPlanner.loadLevel()
         self.aspectMgr.loadLevel()
         self.entMgr.loadLevel()
         self.gfxSystem.loadLevel()
@@ -241,6 +268,7 @@ class Engine(EngineObject):
         self.cameraSystem.releaseLevel()
         self.entMgr.releaseLevel()
         self.actionMgr.releaseLevel()
+        self.pathPlanner.releaseLevel()
         self.aspectMgr.releaseLevel()
         self.levelSystem.releaseLevel()
         self.testMgr.releaseLevel()
@@ -256,6 +284,7 @@ class Engine(EngineObject):
         self.cameraSystem.releaseEngine()
         self.entMgr.releaseEngine()
         self.actionMgr.releaseEngine()
+        self.pathPlanner.releaseEngine()
         self.aspectMgr.releaseEngine()
         self.testMgr.releaseEngine()
         self.netMgr.releaseEngine()
@@ -288,6 +317,16 @@ class Engine(EngineObject):
             time.sleep(0.001)
 
 
+    def stepFor(self, seconds):
+        """ Run the universe for some game time as fast as it will go - no rendering, no real time
+        headless / batch runs use this instead of mainLoop
+        """
+        end = self.gameTime + seconds - self.kTimeStepSize * 0.5
+        while self.gameTime < end:
+            self.mainStep(self.kTimeStepSize)
+            self.gameTime += self.kTimeStepSize
+            self.gameTimeAccumulated = max(self.gameTimeAccumulated, self.gameTime)
+
     def mainStep(self, dtime):
         """ Update the universe by some time step
         """
@@ -302,6 +341,7 @@ class Engine(EngineObject):
         self.widgetMgr.tick(dtime)
         self.memoryMgr.tick(dtime)
         self.actionMgr.tick(dtime)
+        self.pathPlanner.tick(dtime)
         self.aspectMgr.tick(dtime)
         self.entMgr.tick(dtime)
         self.gfxSystem.tick(dtime)
@@ -310,6 +350,9 @@ class Engine(EngineObject):
         self.testMgr.tick(dtime)
         self.netMgr.tick(dtime)
 
+        if self.stateHasher:
+            self.stateHasher.update(self.gameTime)
+
     def _updateRealTime(self):
         import time
         newRealTime = time.clock()
@@ -341,3 +384,25 @@ class Engine(EngineObject):
             self.timeScale = max(0.1, self.timeScale * .5)
 
 
+
+    def saveSnapshot(self, filename=None):
+        """Whole sim state as one binary string - see snapshot.py
+        Also written to filename if given
+        """
+        import snapshot
+        data = snapshot.dumps(snapshot.capture(self))
+        if filename:
+            f = open(filename, 'wb')
+            f.write(data)
+            f.close()
+        return data
+
+    def loadSnapshot(self, data=None, filename=None):
+        """Back to what saveSnapshot returned (or wrote to filename)
+        """
+        import snapshot
+        if filename:
+            f = open(filename, 'rb')
+            data = f.read()
+            f.close()
+        return snapshot.restore(self, snapshot.loads(data))
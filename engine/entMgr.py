@@ -33,6 +33,7 @@ from player import Side
 class EntMgr(Mgr):
     types = []
     _ents = {}
+    _entOrder = [] # creation order - ticking in dict order differs run to run
     
     nEnts = 0
     entMap = {}
@@ -65,6 +66,7 @@ class EntMgr(Mgr):
         """
         ent = type(self.engine, handle, playerInfo)
         self._ents[handle] = ent
+        self._entOrder.append(ent)
         ent.createAspects(additionalAspects)
 
         if ent.hasSquad and createSquad:
@@ -85,9 +87,21 @@ class EntMgr(Mgr):
 
         return ent
 
+    def formSquad(self, ents):
+        """
+        Move ents into the first one's squad - it guides when the squad moves in formation
+        """
+        squad = ents[0].squad
+        for ent in ents[1:]:
+            if ent.squad is not squad:
+                ent.squad.SquadAI.squadMembers.remove(ent)
+                squad.SquadAI.squadMembers.append(ent)
+                ent.squad = squad
+        return squad
+
     dumpTimer = timer.Timer(60.0)
     def tick(self, dtime):
-        for ent in self._ents.values():
+        for ent in self._entOrder[:]:
             ent.tick(dtime)
         #if self.dumpTimer.check(dtime):
             #self.dump()
@@ -111,7 +125,7 @@ class EntMgr(Mgr):
 
     @ents.getter
     def ents(self):
-        return self._ents.values()
+        return self._entOrder[:]
 
     def findEntFromHandle(self, handle):
         return self._ents[handle]
@@ -0,0 +1,207 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Formations for SquadAI - slots around a guide ship and who takes which
+
+A slot is an (ahead, abeam) offset in the guide's frame, the same frame as a
+MaintainingRelativeToEnt offset, so a member holds its slot with the native
+station keeping. The guide is the squad's first member and sits at (0, 0).
+
+Slots are handed out by least total travel: an exact assignment (Hungarian)
+for up to kHungarianLimit members, greedy closest pairs past that.
+'''
+
+import math
+
+LINE   = 'LINE'   # line abreast, alternating either side of the guide
+COLUMN = 'COLUMN' # line astern
+WEDGE  = 'WEDGE'  # a V trailing back from the guide
+SCREEN = 'SCREEN' # arcs across the guide's bow, rings further out as they fill
+
+kHungarianLimit = 60
+
+class Formation(object):
+    def __init__(self, shape, spacing=200.0, screenRadius=1500.0, speedFraction=0.8):
+        """spacing       - meters between neighbouring slots
+        screenRadius     - SCREEN only, radius of the innermost arc
+        speedFraction    - the guide cruises at this fraction of the slowest member's top speed so stragglers catch up
+        """
+        self.shape = shape
+        self.spacing = spacing
+        self.screenRadius = screenRadius
+        self.speedFraction = speedFraction
+
+    def slots(self, count):
+        '''(ahead, abeam) offsets for count ships besides the guide
+        '''
+        spacing = self.spacing
+        if self.shape == LINE:
+            return [(0.0, side(i) * spacing * (i / 2 + 1)) for i in range(count)]
+        elif self.shape == COLUMN:
+            return [(-spacing * (i + 1), 0.0) for i in range(count)]
+        elif self.shape == WEDGE:
+            return [(-spacing * (i / 2 + 1), side(i) * spacing * (i / 2 + 1)) for i in range(count)]
+        elif self.shape == SCREEN:
+            return screenSlots(count, spacing, self.screenRadius)
+        raise ValueError('unknown formation %s' % self.shape)
+
+    def __str__(self):
+        return '%s@%.0f' % (self.shape, self.spacing)
+
+def side(i):
+    return i % 2 and -1.0 or 1.0
+
+def screenSlots(count, spacing, radius):
+    '''Arcs from beam to beam across the bow, spacing apart along the arc
+    '''
+    slots = []
+    ring = 0
+    while len(slots) < count:
+        r = radius + ring * spacing
+        n = min(max(int(math.pi * r / spacing) + 1, 1), count - len(slots))
+        for i in range(n):
+            bearing = n > 1 and (-0.5 + i / float(n - 1)) * math.pi or 0.0
+            slots.append((r * math.cos(bearing), r * math.sin(bearing)))
+        ring += 1
+    return slots
+
+def toWorld(slots, pos, yaw):
+    '''World (x, z) of each slot with the guide at pos heading yaw - mathlib.yawVector, one sin / cos for all
+    '''
+    c = math.cos(yaw)
+    s = math.sin(yaw)
+    return [(pos.x + c * ahead + s * abeam, pos.z - s * ahead + c * abeam) for ahead, abeam in slots]
+
+def travelCosts(positions, targets):
+    return [[math.sqrt((x - tx) * (x - tx) + (z - tz) * (z - tz)) for tx, tz in targets] for x, z in positions]
+
+def assign(positions, targets):
+    '''Member i goes to targets[result[i]], least total distance - len(targets) >= len(positions)
+    '''
+    if len(positions) <= kHungarianLimit:
+        return hungarian(travelCosts(positions, targets))
+    return greedy(positions, targets)
+
+def travel(positions, targets, assignment):
+    '''Total distance for an assignment
+    '''
+    total = 0.0
+    for (x, z), j in zip(positions, assignment):
+        tx, tz = targets[j]
+        total += math.sqrt((x - tx) * (x - tx) + (z - tz) * (z - tz))
+    return total
+
+def greedy(positions, targets):
+    '''Targets furthest from the members' middle go first, each to the nearest member still free
+    Only looks at nearby members through a SpatialGrid, so big squads stay cheap
+    '''
+    from spatialGrid import SpatialGrid
+    n = len(positions)
+    if not n:
+        return []
+    cx = sum([x for x, z in positions]) / n
+    cz = sum([z for x, z in positions]) / n
+    minX = min([x for x, z in positions])
+    maxX = max([x for x, z in positions])
+    minZ = min([z for x, z in positions])
+    maxZ = max([z for x, z in positions])
+    cellSize = max(maxX - minX, maxZ - minZ, 1.0) / math.sqrt(n) # about one member a cell
+    grid = SpatialGrid(cellSize)
+    for i, (x, z) in enumerate(positions):
+        grid.insert(i, x, z)
+
+    order = range(len(targets))
+    order.sort(key=lambda j: -((targets[j][0] - cx) ** 2 + (targets[j][1] - cz) ** 2))
+    result = [None] * n
+    left = n
+    for j in order:
+        tx, tz = targets[j]
+        radius = cellSize
+        found = grid.queryCircle(tx, tz, radius)
+        while not found:
+            radius *= 2.0
+            found = grid.queryCircle(tx, tz, radius)
+        i = min([(d2, i) for i, d2 in found])[1]
+        result[i] = j
+        x, z = positions[i]
+        key = grid.cellOf(x, z) # taken - out of the grid so later searches skip it
+        cell = grid.cells[key]
+        cell.remove((i, x, z))
+        if not cell:
+            del grid.cells[key]
+        left -= 1
+        if not left:
+            break
+    return result
+
+def hungarian(cost):
+    '''Exact minimum cost assignment, rows to columns, rows <= columns - O(rows^2 * columns)
+    '''
+    n = len(cost)
+    if not n:
+        return []
+    m = len(cost[0])
+    inf = float('inf')
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    match = [0] * (m + 1) # column -> row, 1 based, 0 for free
+    way = [0] * (m + 1)
+    for row in range(1, n + 1):
+        match[0] = row
+        j0 = 0
+        minv = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = match[j0]
+            delta = inf
+            j1 = 0
+            costRow = cost[i0 - 1]
+            ui0 = u[i0]
+            for j in range(1, m + 1):
+                if not used[j]:
+                    cur = costRow[j - 1] - ui0 - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[match[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if match[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            match[j0] = match[j1]
+            j0 = j1
+    result = [None] * n
+    for j in range(1, m + 1):
+        if match[j]:
+            result[match[j] - 1] = j - 1
+    return result
@@ -0,0 +1,80 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Stand-ins for the window, input and drawing systems - gfxOptions.headless
+
+Batch runs (Tools/replayCheck.py and friends) step the sim with
+Engine.stepFor and never open a window: no ogre Root, no OIS devices, no
+scene nodes. These keep just the bits of each system that the sim side
+(aspects, mgrs) reaches for. python-ogre is still needed for the math
+types in vector.py.
+'''
+
+from mgr import System
+from debugDrawSystem import DebugDrawSystem
+
+def startEngine(localOptions, level='openwater'):
+    '''An Engine brought all the way up to GAMEPLAY without a window
+    '''
+    from engine import Engine
+    localOptions.gfxOptions.headless = True
+    localOptions.networkingOptions.enableNetworking = False
+    e = Engine(localOptions)
+    e.transition(e.State.MINIMAL)
+    e.transition(e.State.MAINMENU)
+    e.levelSystem.levelToLoad = level
+    e.transition(e.State.GAMEPLAY)
+    return e
+
+class HeadlessGfxSystem(System):
+    sceneManager = None
+
+class HeadlessCameraSystem(System):
+    height = 0.0
+
+class HeadlessInputSystem(System):
+    keyboard = None
+    mouse    = None
+    joystick = None
+
+    def registerHandler(self, event, key, func, modifier=None):
+        pass
+
+class HeadlessSelectionSystem(System):
+    selectedEnts = []
+    forceMovingEnts = None
+
+class HeadlessWidgetMgr(System):
+    pass
+
+class HeadlessDebugDrawSystem(DebugDrawSystem):
+    '''Contexts still work, nothing is kept or drawn
+    '''
+    def initEnginePost(self):
+        pass
+
+    def render(self):
+        pass
+
+    def drawLine(self, context, a, b, yoffset=0, color=None):
+        pass
@@ -29,6 +29,7 @@ class LevelData(object):
     name = 'unnamed'
     dimensions = [10000, 10000]
     gridSize = 10
+    pathCellSize = 100 # meters - the path planner's grid
 
 class LevelSystem(System):
     filename = 'data/levels.yaml'
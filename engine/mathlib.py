@@ -53,18 +53,20 @@ def clamp(a, minValue, maxValue):
         return minValue
     return a
 
-def randomVectorSquare(maxRadius):
+def randomVectorSquare(maxRadius, rng=None):
     import random
     import vector
-    x = random.uniform(-maxRadius, maxRadius)
-    z = random.uniform(-maxRadius, maxRadius)
+    rng = rng or random
+    x = rng.uniform(-maxRadius, maxRadius)
+    z = rng.uniform(-maxRadius, maxRadius)
     return vector.vector3(x, 0, z)
 
-def randomVectorCircular(minRadius, maxRadius):
+def randomVectorCircular(minRadius, maxRadius, rng=None):
     import random
     import vector
-    r = random.uniform(minRadius, maxRadius)
-    t = random.uniform(0, twopi)
+    rng = rng or random
+    r = rng.uniform(minRadius, maxRadius)
+    t = rng.uniform(0, twopi)
     return vector.vector3(r * math.cos(t), 0, r * math.sin(t))
 
 def ipol(val1, val2, amount):
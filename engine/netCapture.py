@@ -0,0 +1,162 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Capture files of NetMgr traffic, and feeding them back in
+
+A capture is append only:
+
+    fileHeader      magic, version, wall clock time the capture started
+    record          seconds since start, direction, ip, port, length
+    <length bytes>  the datagram exactly as it went over the wire
+    record ...
+
+Recording happens on the net io thread as datagrams are sent and received, so
+the engine thread pays nothing for it. A capture cut short by a crash is still
+readable up to the last whole record.
+
+Nothing in here touches ogre so tools can import it on their own.
+'''
+
+import socket
+import struct
+import time
+
+from netClock import monotonic
+
+Magic   = 'ENCP'
+Version = 1
+
+fileHeader = struct.Struct("=4sHd")   # magic, version, wall clock start
+record     = struct.Struct("=dBIHI")  # time, direction, ip, port, length
+
+Received = 0
+Sent     = 1
+
+BroadcastIP    = 0xFFFFFFFF
+FLUSH_PERIOD   = 1.0 # seconds between flushes to disk
+WRITE_BUFFER   = 256 * 1024
+
+
+def packIP(ip):
+    if ip == '<broadcast>':
+        return BroadcastIP
+    return struct.unpack("=I", socket.inet_aton(ip))[0]
+
+def unpackIP(packed):
+    if packed == BroadcastIP:
+        return '<broadcast>'
+    return socket.inet_ntoa(struct.pack("=I", packed))
+
+
+class CaptureWriter(object):
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'wb', WRITE_BUFFER)
+        self.start = monotonic()
+        self.lastFlush = self.start
+        self.file.write(fileHeader.pack(Magic, Version, time.time()))
+        self.nRecords = 0
+        self.nBytes = 0
+
+    def write(self, direction, datagram, address, now):
+        '''address is (ip, port), now a netClock.monotonic() reading
+        '''
+        self.file.write(record.pack(now - self.start, direction, packIP(address[0]), address[1], len(datagram)))
+        self.file.write(datagram)
+        self.nRecords += 1
+        self.nBytes += len(datagram)
+        if now - self.lastFlush > FLUSH_PERIOD:
+            self.file.flush()
+            self.lastFlush = now
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+class CaptureReader(object):
+    '''Iterates (time, direction, address, datagram) over a capture
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        head = self.file.read(fileHeader.size)
+        if len(head) < fileHeader.size:
+            raise IOError('%s: not a capture file' % path)
+        magic, self.version, self.wallStart = fileHeader.unpack(head)
+        if magic != Magic:
+            raise IOError('%s: not a capture file' % path)
+        if self.version != Version:
+            raise IOError('%s: capture version %i, expected %i' % (path, self.version, Version))
+
+    def __iter__(self):
+        read = self.file.read
+        while True:
+            head = read(record.size)
+            if len(head) < record.size:
+                return
+            t, direction, ip, port, length = record.unpack(head)
+            datagram = read(length)
+            if len(datagram) < length:
+                return # cut short, probably a crash
+            yield t, direction, (unpackIP(ip), port), datagram
+
+    def close(self):
+        self.file.close()
+
+
+class CaptureReplay(object):
+    '''Feeds the received side of a capture to a Listener, paced by the engine's ticks
+    speed 1.0 is as recorded, 4.0 four times faster
+    '''
+    def __init__(self, path, speed=1.0):
+        self.reader = CaptureReader(path)
+        self.records = iter(self.reader)
+        self.speed = speed
+        self.start = None
+        self.next = None
+        self.done = False
+        self.nFed = 0
+        self.advance()
+
+    def advance(self):
+        for entry in self.records:
+            if entry[1] == Received:
+                self.next = entry
+                return
+        self.next = None
+        self.done = True
+        self.reader.close()
+
+    def feed(self, listener, now):
+        '''Hand the listener everything due by now (a netClock.monotonic() reading)
+        '''
+        if self.start is None:
+            self.start = now
+        replayTime = (now - self.start) * self.speed
+        while self.next is not None and self.next[0] <= replayTime:
+            t, direction, address, datagram = self.next
+            listener.receive(datagram, address, now)
+            self.nFed += 1
+            self.advance()
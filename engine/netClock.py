@@ -0,0 +1,141 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Monotonic clock and per peer clock synchronisation
+
+Ping/pong in the NTP style: the client stamps t0 when it sends a ping, the server
+stamps t1 on arrival and t2 when it answers, the client stamps t3 when the pong
+arrives. For each exchange
+    offset = ((t1 - t0) + (t2 - t3)) / 2   server clock - our clock
+    rtt    = (t3 - t0) - (t2 - t1)         time actually spent on the wire
+Queueing only ever adds delay, so of the last few samples the one with the
+smallest rtt has the most trustworthy offset (the NTP clock filter).
+
+Every clock involved is each process's own monotonic clock, seconds since its
+NetMgr started - never wall time, which jumps, and never time.clock(), which is
+cpu time on linux.
+
+Nothing in here touches ogre so tools can import it on their own.
+'''
+
+import os
+import time
+
+
+def _makeMonotonic():
+    if os.name == 'nt':
+        return time.clock # QueryPerformanceCounter on windows - wall rate, not cpu time
+    try:
+        import ctypes
+        import ctypes.util
+
+        class timespec(ctypes.Structure):
+            _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+        CLOCK_MONOTONIC = 1 # linux, see <time.h>
+        librt = ctypes.CDLL(ctypes.util.find_library('rt') or 'librt.so.1', use_errno=True)
+        clockGettime = librt.clock_gettime
+        clockGettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+        ts = timespec()
+        if clockGettime(CLOCK_MONOTONIC, ctypes.byref(ts)) != 0:
+            raise OSError(ctypes.get_errno(), 'clock_gettime')
+
+        def monotonic():
+            clockGettime(CLOCK_MONOTONIC, ctypes.byref(ts))
+            return ts.tv_sec + ts.tv_nsec * 1e-9
+        return monotonic
+    except (ImportError, OSError, AttributeError):
+        last = [time.time()]
+        def monotonic(): # best we can do - never let it run backwards
+            now = time.time()
+            if now > last[0]:
+                last[0] = now
+            return last[0]
+        return monotonic
+
+monotonic = _makeMonotonic()
+
+
+SAMPLE_WINDOW   = 8         # ping exchanges kept for the clock filter
+JITTER_GAIN     = 1.0/16.0  # RFC 3550 interarrival jitter smoothing
+INTERVAL_GAIN   = 1.0/8.0   # smoothing for the time between status updates
+
+
+class PeerClock(object):
+    '''What we know about one peer's clock and the path to it
+    '''
+    def __init__(self, address):
+        self.address = address
+        self.samples = [] # [(rtt, offset)] newest last
+        self.offset = 0.0 # peer clock - our clock, seconds
+        self.rtt = 0.0
+        self.synced = False
+        self.jitter = 0.0
+        self.lastTransit = None
+        self.lastArrival = None
+        self.updateInterval = 0.0
+
+    def addSample(self, t0, t1, t2, t3):
+        '''One ping/pong exchange - t0, t3 on our clock, t1, t2 on the peer's
+        '''
+        rtt = (t3 - t0) - (t2 - t1)
+        if rtt < 0.0:
+            rtt = 0.0 # clock resolution on the peer
+        offset = ((t1 - t0) + (t2 - t3)) / 2.0
+        self.samples.append((rtt, offset))
+        if len(self.samples) > SAMPLE_WINDOW:
+            del self.samples[0]
+        self.rtt, self.offset = min(self.samples)
+        self.synced = True
+
+    def addArrival(self, peerTime, arrival):
+        '''A timestamped message from the peer arrived at arrival, both in seconds
+        Tracks the interarrival jitter (RFC 3550) and how often the peer sends
+        '''
+        transit = arrival - peerTime
+        if self.lastTransit is not None:
+            self.jitter += (abs(transit - self.lastTransit) - self.jitter) * JITTER_GAIN
+            interval = arrival - self.lastArrival
+            if self.updateInterval == 0.0:
+                self.updateInterval = interval
+            else:
+                self.updateInterval += (interval - self.updateInterval) * INTERVAL_GAIN
+        self.lastTransit = transit
+        self.lastArrival = arrival
+
+    @property
+    def oneWayDelay(self):
+        return self.rtt / 2.0
+
+    def toLocal(self, peerTime):
+        return peerTime - self.offset
+
+    def age(self, peerTime, now):
+        '''How old something stamped peerTime on the peer's clock is at our time now
+        '''
+        return now - (peerTime - self.offset)
+
+    def __str__(self):
+        if not self.synced:
+            return "%s: not synced  jitter: %.2f ms  interval: %.2f ms" % (str(self.address), self.jitter * 1000.0, self.updateInterval * 1000.0)
+        return "%s: offset: %.2f ms  rtt: %.2f ms  jitter: %.2f ms  interval: %.2f ms" % (str(self.address), self.offset * 1000.0, self.rtt * 1000.0, self.jitter * 1000.0, self.updateInterval * 1000.0)
@@ -0,0 +1,143 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Server side interest management
+
+Every client tells the server where it is looking: its camera centre plus its
+selected ships, each with a radius (see NetMgr.sendInterest). For every client we
+keep a priority accumulator per entity. Each serve adds the entity's priority -
+1.0 inside a focus circle or for the client's own ships, falling off with the
+square of the distance outside it - and the entity is sent once its accumulator
+reaches 1. Far away ships still trickle in at MIN_PRIORITY so the client keeps a
+complete picture of the world, just a stale one. A per client byte budget caps
+how many records go out per serve, ranked by accumulator times priority so close
+ships win but a long starved far ship eventually climbs past them.
+
+Once any client has registered, the status message is no longer broadcast. Peers
+we have heard from but that never sent an interest message (VShip and older
+clients) get the full message unicast instead, see destinations.
+'''
+
+from spatialGrid import SpatialGrid
+
+MIN_PRIORITY           = 1.0 / 60.0 # about once every two seconds at 30 serves a second
+FALLOFF_RANGE          = 8.0        # beyond radius * FALLOFF_RANGE we use MIN_PRIORITY
+CLIENT_TIMEOUT         = 5.0        # seconds without an interest message before we forget a client
+CLIENT_BYTES_PER_SECOND = 256 * 1024
+GRID_CELL_SIZE         = 2000.0
+
+
+class ClientInterest(object):
+    def __init__(self, address):
+        self.address = address
+        self.playerId = -1
+        self.focus = [] # [(x, z, radius)]
+        self.lastHeard = 0.0
+        self.accumulators = {} # ent id -> accumulated priority
+
+
+class InterestMgr(object):
+    def __init__(self):
+        self.clients = {} # address -> ClientInterest
+        self.peers = set() # every address that ever sent us anything - old clients go quiet once joined, so never expired
+        self.grid = SpatialGrid(GRID_CELL_SIZE)
+
+    def notePeer(self, address):
+        self.peers.add(address)
+
+    def destinations(self, positions, recordSize, dtime):
+        '''Where this serve's status message goes, as [(address, indices)]
+        indices is None for peers without an interest record - they get the whole message
+        '''
+        result = [(client.address, indices) for client, indices in self.select(positions, recordSize, dtime)]
+        for address in self.peers:
+            if address not in self.clients:
+                result.append((address, None))
+        return result
+
+    def updateClient(self, address, records, now):
+        '''records are VInterest - all from one interest message
+        '''
+        client = self.clients.get(address)
+        if client is None:
+            client = ClientInterest(address)
+            self.clients[address] = client
+            self.peers.add(address)
+            print "Interest: new client", address
+        client.focus = [(r.x, r.z, r.radius) for r in records]
+        if records:
+            client.playerId = records[0].playerId
+        client.lastHeard = now
+
+    def expire(self, now):
+        for address, client in self.clients.items():
+            if now - client.lastHeard > CLIENT_TIMEOUT:
+                print "Interest: lost client", address
+                del self.clients[address]
+
+    def select(self, positions, recordSize, dtime):
+        '''positions is [(index, id, x, z, playerId)] for every ent in the full status message
+        Returns [(client, [index, ...])] - the records each client gets this serve, in message order
+        '''
+        grid = self.grid
+        grid.clear()
+        for p in positions:
+            grid.insert(p, p[2], p[3])
+
+        budget = max(1, int(CLIENT_BYTES_PER_SECOND * dtime / recordSize))
+        selections = []
+        for client in self.clients.itervalues():
+            priorities = {}
+            for x, z, radius in client.focus:
+                falloff = radius * FALLOFF_RANGE
+                radiusSquared = radius * radius
+                for p, d2 in grid.queryCircle(x, z, falloff):
+                    if d2 <= radiusSquared:
+                        priority = 1.0
+                    else:
+                        priority = max(MIN_PRIORITY, radiusSquared / d2)
+                    if priority > priorities.get(p[1], 0.0):
+                        priorities[p[1]] = priority
+
+            accumulators = client.accumulators
+            ready = []
+            for index, id, x, z, playerId in positions:
+                if playerId == client.playerId and playerId != -1:
+                    priority = 1.0
+                else:
+                    priority = priorities.get(id, MIN_PRIORITY)
+                accumulated = accumulators.get(id, 0.0) + priority
+                accumulators[id] = accumulated
+                if accumulated >= 1.0:
+                    ready.append((accumulated * priority, accumulated, index, id))
+
+            if len(ready) > budget:
+                ready.sort(reverse=True)
+                del ready[budget:] # the rest keep accumulating, so far ships still get through eventually
+            indices = []
+            for rank, accumulated, index, id in ready:
+                accumulators[id] = accumulated - 1.0
+                indices.append(index)
+            indices.sort()
+            selections.append((client, indices))
+        return selections
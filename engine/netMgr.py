@@ -24,11 +24,15 @@ from threading import Thread
 from collections import deque
 import time
 import socket
+import select
+import errno
 import sys
 import struct
 import os
 import yaml
 import math
+import random
+import zlib
 
 
 #ecslent imports
@@ -40,6 +44,15 @@ from units import *
 from netAspect import NetAspect
 from control   import ManualControl
 import command
+import netPacket
+from netState import NetStateTable, STATUS_STRIDE
+from netSmoothing import NetSmoother
+from netInterest import InterestMgr
+from timer import Timer
+from netClock import monotonic, PeerClock
+import netReliable
+from netReliable import ReliableChannel
+import netCapture
 
 from entMgr import Player
 
@@ -49,6 +62,7 @@ def createUDPSocket():
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE) # room for a burst of fragments
     sock.settimeout(1)
     return sock
 
@@ -68,10 +82,47 @@ def myIP():
 
 IgnoreMessagesFromSelf = False
 RECEIVE_BUFFER_LENGTH  = 100
-SERVER_FREQUENCY       = 0.47
-CLIENT_FREQUENCY       = 0.07
+SOCKET_BUFFER_SIZE     = 1024 * 1024
+FRAGMENT_TIMEOUT       = 0.25 # seconds to wait for the rest of a fragmented message before using what arrived
+MAX_RECEIVE_BATCH      = 64   # datagrams drained per wakeup before we look at the send queue again
+WOULD_BLOCK            = (errno.EAGAIN, errno.EWOULDBLOCK)
+INTEREST_PERIOD        = 0.5    # seconds between client interest updates
+SELECTED_INTEREST_RADIUS = 1000.0 # around each selected ship
+MIN_CAMERA_INTEREST_RADIUS = 2000.0
+PING_PERIOD            = 1.0    # seconds between client clock sync pings
+INFO_REQUEST_PERIOD    = 0.5    # seconds between batched requests for unknown ents
+MAX_IDS_PER_REQUEST    = 4096
+ALL_ENTS               = -1     # snapshot request id meaning everything - sent when joining
+SNAPSHOT_COMPRESSION   = 6
+SHARD_HALO             = 2000.0 # ships this close to a region border are ghosted into the neighbour
+
+class LatencyStats(object):
+    """Running count / mean / max of how long things sat in a queue, in seconds
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.maximum:
+            self.maximum = seconds
 
-class Listener(Thread):
+    def __str__(self):
+        if not self.count:
+            return "n: 0"
+        return "n: %i  mean: %.2f ms  max: %.2f ms" % (self.count, self.total / self.count * 1000.0, self.maximum * 1000.0)
+
+
+class Listener(object):
+    """Receive side - reassembles fragments and queues whole messages for the engine thread
+    The socket itself belongs to NetIO
+    """
     def __init__(self, ip, port, packetSize, isServer):
         self.ip = ip
         print self.ip, " Creating Listener"
@@ -79,34 +130,36 @@ class Listener(Thread):
         self.port = port
         self.packetSize = packetSize
         self.isServer = isServer
-        self.listenSocket = None
-        self.die    = False
         self.receiveQueue  = deque(maxlen=RECEIVE_BUFFER_LENGTH)
-        Thread.__init__(self)
-
-
-    def run(self):
-        self.listenSocket = createUDPSocket()
-        self.listenSocket.bind(('', self.port))
-        print self.ip, " Running listener thread "
-        while not self.die:
-            try:
-                msg, address = self.listenSocket.recvfrom(self.packetSize)
-                #print "From: ", str(address)
-                if not (address[0] == self.ip):
-                    self.receiveQueue.appendleft((msg, address))
-            except (socket.timeout):
-                pass
-                #print self.ip, " Waiting for network server"
-            except:
-                raise
-        print "Stopping Listener thread "
-        sys.stdout.flush()
-
-    def stop(self):
-        self.die = True
-        self.listenSocket.close()
-        time.sleep(0.5)
+        self.reassembler = netPacket.Reassembler(FRAGMENT_TIMEOUT)
+        self.latency = LatencyStats() # arrival -> handed to the engine
+        self.nDropped = 0
+        self.capture = None # netCapture.CaptureWriter when recording
+
+    def receive(self, msg, address, now):
+        """Called on the io thread for every datagram
+        """
+        if address[0] == self.ip:
+            return
+        if self.capture:
+            self.capture.write(netCapture.Received, msg, address, now)
+        if netPacket.isFragment(msg):
+            msg = self.reassembler.add(msg, address, now)
+            if msg is None:
+                return
+        self.queue(msg, address, now)
+
+    def queue(self, msg, address, now):
+        if len(self.receiveQueue) == RECEIVE_BUFFER_LENGTH:
+            self.nDropped += 1 # the deque throws away the oldest
+        self.receiveQueue.appendleft((msg, address, now))
+
+    def expire(self, now):
+        for msg in self.reassembler.expire(now): # partial, but every entity range in it is usable
+            self.queue(msg, None, now)
+
+    def timeUntilExpiry(self, now):
+        return self.reassembler.timeUntilExpiry(now)
 
     def getMessages(self):
         msg = self.getMessage()
@@ -116,7 +169,8 @@ class Listener(Thread):
 
     def getMessage(self):
         try:
-            msg, address = self.receiveQueue.pop()# pop on the right
+            msg, address, arrived = self.receiveQueue.pop()# pop on the right
+            self.latency.add(monotonic() - arrived)
             return msg
         except (IndexError): # empty!
             #print self.ip, "No Message Traffic!, no network"
@@ -124,54 +178,160 @@ class Listener(Thread):
         except:
             raise
 
-class Broadcaster(Thread):
+    def getAddressedMessages(self):
+        """Like getMessages but yields (msg, address, arrived) - address is None for expired partial messages
+        arrived is on the netClock.monotonic clock
+        """
+        while self.receiveQueue:
+            msg, address, arrived = self.receiveQueue.pop()
+            self.latency.add(monotonic() - arrived)
+            yield msg, address, arrived
+
+class Broadcaster(object):
+    """Send side - fragments and queues datagrams, NetIO sends them as soon as we flush
+    """
     def __init__(self, ip, port, packetSize, isServer):
-        Thread.__init__(self)
         self.ip = ip
         print self.ip, " Creating Broadcaster"
         self.port = port
         self.packetSize = packetSize
         self.isServer = isServer
-        self.broadcastSocket = None
-        self.die    = False
         self.sendQueue  = deque() # must send all commands
+        self.fragmentSequence = 0
+        self.latency = LatencyStats() # queued -> on the wire
+        self.io = None
+        self.capture = None # netCapture.CaptureWriter when recording
+
+    def fragment(self, msg):
+        '''Split msg into datagrams that fit the MTU, see netPacket.fragmentPacket
+        '''
+        datagrams = netPacket.fragmentPacket(msg, self.fragmentSequence)
+        if len(datagrams) > 1:
+            self.fragmentSequence = (self.fragmentSequence + 1) % netPacket.MaxSequence
+        return datagrams
+
+    def putMessage(self, msg):
+        now = monotonic()
+        self.sendQueue.extendleft([(datagram, None, now) for datagram in self.fragment(msg)])
+
+    def putMessageTo(self, msg, address):
+        """Unicast msg to one (ip, port) instead of broadcasting it
+        """
+        now = monotonic()
+        self.sendQueue.extendleft([(datagram, address, now) for datagram in self.fragment(msg)])
+
+    def putPriorityMessage(self, msg):
+        now = monotonic()
+        # popped from the right, so first fragment goes last
+        self.sendQueue.extend([(datagram, None, now) for datagram in reversed(self.fragment(msg))])
+
+    def putMessages(self, msgs):
+        for msg in msgs:
+            self.putMessage(msg)
+
+    def flush(self):
+        """Engine is done queueing for this tick - get it on the wire
+        """
+        if self.io and self.sendQueue:
+            self.io.wake()
+
+    def sendPending(self, sock):
+        """Called on the io thread - send until the queue is empty or the socket is full
+        """
+        broadcast = ('<broadcast>', self.port)
+        while self.sendQueue:
+            datagram, address, queued = self.sendQueue.pop()
+            try:
+                sock.sendto(datagram, address or broadcast)
+            except socket.error, e:
+                if e.args[0] in WOULD_BLOCK:
+                    self.sendQueue.append((datagram, address, queued)) # retry when select says writable
+                    return
+                raise
+            now = monotonic()
+            self.latency.add(now - queued)
+            if self.capture:
+                self.capture.write(netCapture.Sent, datagram, address or broadcast, now)
+
+
+class NetIO(Thread):
+    """The one thread doing socket io for the net mgr
+    Sleeps in select until a datagram arrives, the engine flushes something to send,
+    or a fragmented message times out. stop() wakes it, so shutdown is immediate.
+    """
+    def __init__(self, ip, port, listener, broadcaster):
+        Thread.__init__(self)
+        self.setDaemon(True)
+        self.ip = ip
+        self.port = port
+        self.listener = listener
+        self.broadcaster = broadcaster
+        self.broadcaster.io = self
+        self.die = False
+        self.sock = None
+
+        # select only takes sockets on windows, so wake ups go through a loopback udp socket
+        self.wakeReceiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.wakeReceiver.bind(('127.0.0.1', 0))
+        self.wakeReceiver.setblocking(0)
+        self.wakeAddress = self.wakeReceiver.getsockname()
+        self.wakeSender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def wake(self):
+        try:
+            self.wakeSender.sendto('w', self.wakeAddress)
+        except socket.error:
+            pass # already has a wake up pending
 
     def run(self):
-        self.broadcastSocket = createUDPSocket()
-        print self.ip, " Running Command Broadcaster thread "
+        self.sock = createUDPSocket()
+        self.sock.setblocking(0)
+        self.sock.bind(('', self.port))
+        print self.ip, " Running net io thread "
+        readers = [self.sock, self.wakeReceiver]
         while not self.die:
+            writers = self.broadcaster.sendQueue and [self.sock] or []
             try:
-                while self.sendQueue:
-                    msg = self.sendQueue.pop()
-                    n = self.broadcastSocket.sendto(msg, ('<broadcast>', self.port))
-
-                if self.isServer:
-                    time.sleep(SERVER_FREQUENCY)
-                else:
-                    time.sleep(CLIENT_FREQUENCY)                    
-                #print n, " bytes sent"
-            except (IndexError):
-                time.sleep(SERVER_FREQUENCY)
-                pass
-            except:
+                readable, writable, errored = select.select(readers, writers, [], self.listener.timeUntilExpiry(monotonic()))
+            except select.error, e:
+                if e.args[0] == errno.EINTR:
+                    continue
                 raise
-
-        print self.ip, "Stopping broadcast thread "
+            if self.wakeReceiver in readable:
+                self.drain(self.wakeReceiver)
+            if self.sock in readable:
+                self.receiveBatch()
+            self.broadcaster.sendPending(self.sock)
+            self.listener.expire(monotonic())
+
+        self.sock.close()
+        self.wakeReceiver.close()
+        self.wakeSender.close()
+        print self.ip, "Stopping net io thread "
         sys.stdout.flush()
-        
-    def stop(self):
-        self.die = True
-        self.broadcastSocket.close()
-        time.sleep(0.5)
 
-    def putMessage(self, msg):
-        self.sendQueue.appendleft(msg)
+    def receiveBatch(self):
+        now = monotonic()
+        for i in xrange(MAX_RECEIVE_BATCH):
+            try:
+                msg, address = self.sock.recvfrom(self.listener.packetSize)
+            except socket.error, e:
+                if e.args[0] in WOULD_BLOCK:
+                    return
+                raise
+            self.listener.receive(msg, address, now)
 
-    def putPriorityMessage(self, msg):
-        self.sendQueue.append(msg)
+    def drain(self, sock):
+        while True:
+            try:
+                sock.recv(64)
+            except socket.error:
+                return
 
-    def putMessages(self, msg):
-        self.sendQueue.extendleft(msg)
+    def stop(self):
+        self.die = True
+        self.wake()
+        self.join(1.0)
 
 
 class NetMgr(Mgr):
@@ -187,6 +347,14 @@ class NetMgr(Mgr):
     CreateShip         = 5 # not used
     AbsoluteInfo       = 6 
     SquelchCommand     = 7
+    FragmentMessage    = netPacket.FragmentMessage # only seen by Broadcaster/Listener
+    InterestMessage    = 9 # client -> server, where this client is looking. Not sent to VShip
+    PingMessage        = 10 # client -> server clock sync, see netClock
+    PongMessage        = 11 # server -> client clock sync
+    ReliableMessage    = netReliable.ReliableMessage # wraps commands and squelches, see netReliable
+    AckMessage         = netReliable.AckMessage
+    SnapshotRequest    = 14 # client -> server, (id, haveInfo) for ents it needs - replaces RequestInfoMessage off VShip
+    SnapshotMessage    = 15 # server -> client, zlib compressed session id + info + status messages
 
 
     netEnts = {}
@@ -209,28 +377,52 @@ class NetMgr(Mgr):
         self.listener    = None
         self.broadcaster = None
         self.isServer    = False
-        self.startTime   = time.clock()
-
-#-------structs to parse incoming outgoing messages
-
-        self.header       = struct.Struct("=Biii")
-        self.info         = struct.Struct("=i 256s256s ff fff ii")
-        #self.absoluteInfo = struct.Struct("i fff fff f 256s")
-        self.status       = struct.Struct("=i fff fff ff ff H")
-        self.int          = struct.Struct("=i")
-        self.squelch      = struct.Struct("=i")
-        self.command      = struct.Struct("=iff")
-        self.createShip   = struct.Struct("=256s 256s fff f")
-        self.absoluteInfo = struct.Struct("=i fff fff f 256s")
+        self.startTime   = monotonic()
+        self.netState    = NetStateTable()
+        self.smoother    = NetSmoother(self.netState)
+        self.peerClocks  = {} # address -> PeerClock, on clients
+        self.serverClock = None # PeerClock of whoever last sent us status
+        self.sessionId   = random.SystemRandom().randint(1, 2**31 - 1) # servers - clients cache info per session
+        self.packedInfo  = {} # ent id -> packed info record, on the server
+        self.infoCache   = {} # ent id -> VInfo for self.cacheSession, on clients
+        self.cacheSession = None
+        self.joined      = False
+
+#-------structs to parse incoming outgoing messages - shared with the tools through netPacket
+
+        self.header       = netPacket.header
+        self.info         = netPacket.info
+        self.status       = netPacket.status
+        self.int          = netPacket.int32
+        self.squelch      = netPacket.squelch
+        self.command      = netPacket.command
+        self.createShip   = netPacket.createShip
+        self.absoluteInfo = netPacket.absoluteInfo
+        self.interest     = netPacket.interest
+        self.ping         = netPacket.ping
+        self.snapshotRequest = netPacket.snapshotRequest
+        self.pong         = netPacket.pong
 
 
     def simTimeMilli(self):
-        return (time.clock() - self.startTime) * 1000.0 # convert to milli
+        return (monotonic() - self.startTime) * 1000.0 # convert to milli
+
+    def simTime(self, now=None):
+        '''Seconds on this NetMgr's clock - now is a netClock.monotonic() reading
+        '''
+        if now is None:
+            now = monotonic()
+        return now - self.startTime
 
 #-------optimization trick changes between two tick methods---------
 #-------Sets self.tick to be one of two methods
 #-------self.vShipTick turns on VShip networking
 #-------self.passTick runs without networking - does nothing
+    def crosslink(self):
+        import ogre.io.OIS as OIS
+        import inputSystem
+        self.engine.inputSystem.registerHandler(inputSystem.InputEvent.KEY_PRESSED, OIS.KC_F8, self.dumpStats)
+
     def initialize(self):
         '''
         Optimization trick changes between two tick methods
@@ -245,6 +437,25 @@ class NetMgr(Mgr):
             isServer = self.engine.localOptions.networkingOptions.server
             self.listener = Listener(self.ip, self.port, self.PacketSize, isServer)
             self.broadcaster = Broadcaster(self.ip, self.port, self.PacketSize, isServer)
+            self.netIO = NetIO(self.ip, self.port, self.listener, self.broadcaster)
+            self.capture = None
+            self.replay = None
+            self.shards = None
+            options = self.engine.localOptions.networkingOptions
+            if options.capture:
+                print "Capturing net traffic to", options.capture
+                self.capture = netCapture.CaptureWriter(options.capture)
+                self.listener.capture = self.capture
+                self.broadcaster.capture = self.capture
+            if options.replay: # the capture stands in for the socket
+                print "Replaying net traffic from", options.replay, "at", options.replaySpeed, "x"
+                self.replay = netCapture.CaptureReplay(options.replay, options.replaySpeed)
+                self.broadcaster.io = None
+            self.interestMgr = InterestMgr()
+            self.interestTimer = Timer(INTEREST_PERIOD, fireFirstCheck=True)
+            self.pingTimer = Timer(PING_PERIOD, fireFirstCheck=True)
+            self.reliable = ReliableChannel((self.ip, self.port))
+            self.infoRequestTimer = Timer(INFO_REQUEST_PERIOD, fireFirstCheck=True)
             if self.engine.localOptions.networkingOptions.server:
                 self.tick = self.serverTick
             else:
@@ -255,14 +466,38 @@ class NetMgr(Mgr):
     def passTick(self, dtime):
         pass
 
+    def replayTick(self):
+        '''Stands in for the io thread when replaying - what we would have sent goes nowhere
+        '''
+        now = monotonic()
+        self.broadcaster.sendQueue.clear()
+        self.replay.feed(self.listener, now)
+        self.listener.expire(now)
+
     def serverTick(self, dtime):
+        if self.replay:
+            self.replayTick()
         self.handleClientMessages(dtime)
+        if self.engine.localOptions.networkingOptions.shardGrid[0] > 0:
+            self.shardTick(dtime)
         self.serve(dtime)
+        self.reliableTick()
+        self.broadcaster.flush()
         #self.sendForceMoveInfo() # both client and server can move ents
 
     def clientTick(self, dtime):
+        if self.replay:
+            self.replayTick()
         self.handleServerMessages(dtime)
-        self.sendRequests()
+        self.smoother.step(dtime, self.serverClock, self.simTime(), self.engine.selectionSystem.forceMovingEnts)
+        self.sendRequests(dtime)
+        if not self.engine.localOptions.networkingOptions.vShipNet:
+            if self.interestTimer.check(dtime):
+                self.sendInterest()
+            if self.pingTimer.check(dtime):
+                self.sendPing()
+            self.reliableTick()
+        self.broadcaster.flush()
         #self.sendForceMoveInfo() # both client and server can move ents
 
 #------- End optimization trick-----------------------------
@@ -271,20 +506,90 @@ class NetMgr(Mgr):
 
     def loadLevel(self):
         if self.engine.localOptions.networkingOptions.enableNetworking:
+            self.joined = False
             self.loadVShipMap()
-            self.listener.start()
-            self.broadcaster.start()
+            if not self.replay:
+                self.netIO.start()
 
 
     def releaseLevel(self):
         if self.engine.localOptions.networkingOptions.enableNetworking:
-            self.listener.stop()
-            self.broadcaster.stop()
-
+            if not self.replay:
+                self.netIO.stop()
+            if self.shards:
+                self.shards.stop()
+                self.shards = None
+            if self.capture:
+                self.capture.close()
+
+    def dumpStats(self):
+        print '--------------------------------------------------------------------------------'
+        print 'NetMgr.dumpStats'
+        print '--------------------------------------------------------------------------------'
+        if not self.engine.localOptions.networkingOptions.enableNetworking:
+            print '    networking disabled'
+            return
+        print '    send    queue: %4i  latency: %s' % (len(self.broadcaster.sendQueue), self.broadcaster.latency)
+        print '    receive queue: %4i  latency: %s  dropped: %i' % (len(self.listener.receiveQueue), self.listener.latency, self.listener.nDropped)
+        r = self.listener.reassembler
+        print '    fragments complete: %i  partial: %i  dropped: %i  pending: %i' % (r.nComplete, r.nPartial, r.nDropped, len(r.pending))
+        print '    interested clients: %i' % (len(self.interestMgr.clients))
+        for clock in self.peerClocks.itervalues():
+            print '    peer', clock
+        print '    reliable', self.reliable
+        if self.capture:
+            print '    capture: %s  records: %i  bytes: %i' % (self.capture.path, self.capture.nRecords, self.capture.nBytes)
+        if self.replay:
+            print '    replay: fed %i  done: %s' % (self.replay.nFed, self.replay.done)
+        if self.shards:
+            print '    shards: %i  ships: %i  migrations: %i' % (len(self.shards.workers), len(self.shards.owner), self.shards.nMigrations)
+        self.broadcaster.latency.reset()
+        self.listener.latency.reset()
+
+
+# ------------------- Reliable channel ----------------------
+    def incoming(self):
+        '''Received messages as (msg, address, arrived) with the reliable layer peeled off
+        Reliable messages come out once each and in order per sender, acks are consumed here
+        '''
+        for msg, address, arrived in self.listener.getAddressedMessages():
+            if address is not None:
+                if netReliable.isAck(msg):
+                    self.reliable.receiveAck(msg, address, arrived)
+                    continue
+                if netReliable.isReliable(msg):
+                    for inner in self.reliable.receive(msg, address):
+                        yield inner, address, arrived
+                    continue
+            yield msg, address, arrived
+
+    def reliableTick(self):
+        for datagram in self.reliable.resend(monotonic()):
+            self.broadcaster.putPriorityMessage(datagram)
+        ackMsg = self.reliable.ackPacket(int(self.simTimeMilli()))
+        if ackMsg:
+            self.send(ackMsg)
+
+    def retransmitTimeout(self):
+        clock = self.serverClock
+        if clock is None or not clock.synced:
+            return netReliable.INITIAL_RTO
+        return min(netReliable.MAX_RTO, max(netReliable.MIN_RTO, 2.0 * clock.rtt + 4.0 * clock.jitter))
+
+    def sendReliable(self, packedMsg):
+        '''Sent once now, retransmitted until every peer acks it - VShip does not speak this, so not there
+        '''
+        if self.engine.localOptions.networkingOptions.vShipNet:
+            self.send(packedMsg)
+            return
+        for datagram in self.reliable.wrap(packedMsg, monotonic(), self.retransmitTimeout()):
+            self.broadcaster.putMessage(datagram)
 
 # ------------------- Server ----------------------
     def handleClientMessages(self, dtime):
-        for msg in self.listener.getMessages():
+        for msg, address, arrived in self.incoming():
+            if address is not None:
+                self.interestMgr.notePeer(address)
             unpackedMsg = self.unpack(msg)
             #print "Handle Message: "
             #print str(unpackedMsg)
@@ -293,33 +598,106 @@ class NetMgr(Mgr):
                 self.propagateCommand(unpackedMsg)
             elif unpackedMsg.msgType == self.RequestInfoMessage:
                 self.sendShipsInfo(unpackedMsg)
+            elif unpackedMsg.msgType == self.SnapshotRequest:
+                if address is not None:
+                    self.sendSnapshot(unpackedMsg, address)
             elif unpackedMsg.msgType == self.CreateShip:
                 self.createShips(unpackedMsg)
             elif unpackedMsg.msgType == self.AbsoluteInfo:
                 self.rawShipPosOrientation(unpackedMsg)
             elif unpackedMsg.msgType == self.SquelchCommand:
                 pass
+            elif unpackedMsg.msgType == self.InterestMessage:
+                if address is not None:
+                    self.interestMgr.updateClient(address, unpackedMsg.data, monotonic())
+            elif unpackedMsg.msgType == self.PingMessage:
+                if address is not None:
+                    self.sendPong(unpackedMsg, address, arrived)
             else:
                 print "Server: Unknown Message type, ignoring...", str(unpackedMsg)
+        self.interestMgr.expire(monotonic())
 
     def serve(self, dtime):
-        #self.header       = struct.Struct("=Biii")
-        packedMessage = self.header.pack(self.StatusMessage, int(self.simTimeMilli()), self.engine.entMgr.nEnts, self.status.size)
-        for id, ent in self.engine.entMgr.entMap.iteritems():
+        packet = self.header.pack(self.StatusMessage, int(self.simTimeMilli()), len(self.engine.entMgr.entMap), self.status.size)
+        filtered = self.interestMgr.clients and not self.engine.localOptions.networkingOptions.vShipNet
+        positions = []
+        helm = self.helm
+        for index, (id, ent) in enumerate(self.engine.entMgr.entMap.iteritems()):
             #self.status       = struct.Struct("=i fff fff ff ff H")
-            ds, dh = 0, 0
-            if ent.UnitAI.state == ent.UnitAI.State.MANUAL_CONTROL:
-                ds, dh = ent.ManualControl.desiredSpeed, ent.ManualControl.desiredHeading
-            elif ent.UnitAI.state == ent.UnitAI.State.AI:
-                ds, dh = ent.UnitAI.helmDesiredSpeed, ent.UnitAI.helmDesiredHeading
-            elif ent.UnitAI.state == ent.UnitAI.State.STOP:
-                ds, dh = 0, ent.UnitAI.helmDesiredHeading
-            else:
-                ds, dh = ent.desiredSpeed, ent.desiredHeading
-
-            msg = self.status.pack(id, ent.pos.x, ent.pos.y, ent.pos.z, ent.velocity.x, ent.velocity.y, ent.velocity.z, ent.yaw, 0.0, ds, dh, 0)
-            packedMessage += msg
-        self.send(packedMessage)
+            ds, dh = helm(ent)
+            packet += self.status.pack(id, ent.pos.x, ent.pos.y, ent.pos.z, ent.velocity.x, ent.velocity.y, ent.velocity.z, ent.yaw, 0.0, ds, dh, 0)
+            if filtered:
+                positions.append((index, id, ent.pos.x, ent.pos.z, ent.player.playerId))
+        if not filtered:
+            self.send(packet)
+            return
+        # every client that told us what it is looking at gets its own cut of the status message, the rest all of it
+        for address, indices in self.interestMgr.destinations(positions, self.status.size, dtime):
+            if indices is None:
+                self.broadcaster.putMessageTo(packet, address)
+            elif indices:
+                self.broadcaster.putMessageTo(netPacket.selectRecords(packet, indices), address)
+
+    def helm(self, ent):
+        '''(desired speed, desired heading) as served
+        '''
+        if ent.UnitAI.state == ent.UnitAI.State.MANUAL_CONTROL:
+            return ent.ManualControl.desiredSpeed, ent.ManualControl.desiredHeading
+        elif ent.UnitAI.state == ent.UnitAI.State.AI:
+            return ent.UnitAI.helmDesiredSpeed, ent.UnitAI.helmDesiredHeading
+        elif ent.UnitAI.state == ent.UnitAI.State.STOP:
+            return 0, ent.UnitAI.helmDesiredHeading
+        return ent.desiredSpeed, ent.desiredHeading
+
+    def startShards(self):
+        import shard
+        nx, nz = self.engine.localOptions.networkingOptions.shardGrid
+        width, height = self.engine.levelSystem.currentLevel.dimensions
+        regions = shard.RegionMap(-width * 0.5, -height * 0.5, width * 0.5, height * 0.5, nx, nz, SHARD_HALO)
+        print "Sharding the server over %i x %i region processes" % (nx, nz)
+        self.shards = shard.ShardCoordinator(regions)
+        self.shardHelm = {} # ent id -> (ds, dh) last sent to the shards
+
+    def shardTick(self, dtime):
+        '''Physics and avoidance run in the region processes - our ents and their CEnts take their state from there
+        The local UnitAI only steers (UnitAI.physicsElsewhere), we forward its helm whenever it changes
+        '''
+        import shard
+        import snapshot
+        import cent
+        if self.shards is None:
+            self.startShards()
+        shards, shardHelm, helm = self.shards, self.shardHelm, self.helm
+        entMap = self.engine.entMgr.entMap
+        for id, ent in entMap.iteritems():
+            desired = helm(ent)
+            if id not in shards:
+                shards.add(shard.shipFromEnt(id, ent, desired[0], desired[1]))
+                shardHelm[id] = desired
+                ent.UnitAI.physicsElsewhere = True
+            elif shardHelm[id] != desired:
+                shards.command(id, desired[1], desired[0])
+                shardHelm[id] = desired
+        kinematics = bytearray(cent.getKinematics())
+        record = snapshot.kinematics.size
+        motion = shard.motion.pack_into
+        for id, x, z, velX, velZ, yaw, speed, ds, dh in shards.tick(dtime):
+            ent = entMap.get(id)
+            if ent is not None:
+                ent.pos.x = x
+                ent.pos.z = z
+                ent.yaw = yaw
+                ent.speed = speed
+                ent.velocity = vector3(velX, 0, velZ)
+                motion(kinematics, ent.UnitAI.cent.id * record, x, z, yaw, speed, velX, velZ)
+        cent.setKinematics(str(kinematics)) # the navigators steer from where the shards put the ships
+
+    def sendPong(self, unpkdMsg, address, arrived):
+        '''Answer straight away - t1 is when the ping reached our socket, t2 is now
+        '''
+        received = self.simTime(arrived)
+        pongs = [(ping.t0, received, self.simTime()) for ping in unpkdMsg.data]
+        self.broadcaster.putMessageTo(netPacket.buildPacket(self.PongMessage, int(self.simTimeMilli()), self.pong, pongs), address)
 
     def propagateCommand(self, unpkdMsg):
         for data in unpkdMsg.data:
@@ -334,12 +712,62 @@ class NetMgr(Mgr):
                 print "Unknown id: %s, this is a BUG" % (data.id)
 
 
+    def infoRecord(self, eid, ent):
+        '''Packed info for ent - it never changes, so packed once per session
+        '''
+        packed = self.packedInfo.get(eid)
+        if packed is None:
+            packed = self.info.pack(eid, str(ent), ent.__class__.__name__, ent.maxSpeed, ent.maxSpeed/10.0, ent.length, ent.beam, ent.draft, ent.player.playerId, ent.player.side)
+            self.packedInfo[eid] = packed
+        return packed
+
+    def requestedEnts(self, ids):
+        entMap = self.engine.entMgr.entMap
+        if ALL_ENTS in ids:
+            return entMap.items()
+        return [(eid, entMap[eid]) for eid in ids if eid in entMap]
+
     def sendShipsInfo(self, unpkdMsg):
-        msg = self.header.pack(self.InfoMessage, int(self.simTimeMilli()), len(self.engine.entMgr.entMap.keys()), self.info.size)
-        for eid, ent in self.engine.entMgr.entMap.iteritems():
-            msg += self.info.pack(eid, str(ent), ent.__class__.__name__, ent.maxSpeed, ent.maxSpeed/10.0, ent.length, ent.beam, ent.draft, ent.player.playerId, ent.player.side)
+        '''Info for the requested ids only - the old protocol, still what VShip clients speak
+        '''
+        ents = self.requestedEnts(set([d.val for d in unpkdMsg.data]))
+        if not ents:
+            return
+        msg = self.header.pack(self.InfoMessage, int(self.simTimeMilli()), len(ents), self.info.size)
+        for eid, ent in ents:
+            msg += self.infoRecord(eid, ent)
         self.prioritySend(msg)
 
+    def sendSnapshot(self, unpkdMsg, address):
+        '''One compressed reply holding info for the ents the client lacks and state for all it asked about
+        '''
+        haveInfo = set()
+        ids = set()
+        for d in unpkdMsg.data:
+            ids.add(d.id)
+            if d.haveInfo:
+                haveInfo.add(d.id)
+        ents = self.requestedEnts(ids)
+        if not ents:
+            return
+        now = int(self.simTimeMilli())
+        infos = ''
+        for eid, ent in ents:
+            if eid not in haveInfo:
+                infos += self.infoRecord(eid, ent)
+        statuses = ''
+        for eid, ent in ents:
+            ds, dh = self.helm(ent)
+            statuses += self.status.pack(eid, ent.pos.x, ent.pos.y, ent.pos.z, ent.velocity.x, ent.velocity.y, ent.velocity.z, ent.yaw, 0.0, ds, dh, 0)
+        infoMsg = self.header.pack(self.InfoMessage, now, len(infos) / self.info.size, self.info.size) + infos
+        statusMsg = self.header.pack(self.StatusMessage, now, len(ents), self.status.size) + statuses
+        payload = zlib.compress(self.int.pack(self.sessionId) + statusMsg + infoMsg, SNAPSHOT_COMPRESSION)
+        # one byte records, so the fragmenter can cut it anywhere
+        snapshot = bytearray(self.header.size + len(payload))
+        self.header.pack_into(snapshot, 0, self.SnapshotMessage, now, len(payload), 1)
+        snapshot[self.header.size:] = payload
+        self.broadcaster.putMessageTo(snapshot, address)
+
     def createShips(self, unpkdMsg):
         pass
 
@@ -374,8 +802,8 @@ class NetMgr(Mgr):
 
 #----Communicate with Server----------------------------
 
-    def sendRequests(self):
-        self.sendUnknownEntQueries()
+    def sendRequests(self, dtime):
+        self.sendUnknownEntQueries(dtime)
         self.combineCommandsIntoNetMessage()
         self.combineSquelchesIntoNetMessage()
         self.sendForceMoveInfo() #I'm sending this in clientTick for symmetry with server
@@ -384,11 +812,48 @@ class NetMgr(Mgr):
     def moveAbsolute(self):
         pass
 
+    def sendPing(self):
+        self.send(netPacket.buildPacket(self.PingMessage, int(self.simTimeMilli()), self.ping, [(self.simTime(),)]))
+
+    def peerClock(self, address):
+        clock = self.peerClocks.get(address)
+        if clock is None:
+            clock = PeerClock(address)
+            self.peerClocks[address] = clock
+        return clock
+
+    def sendInterest(self):
+        '''Tell the server what we are looking at - the camera centre and our selected ships
+        The server uses this to decide how often we hear about each ship, see netInterest
+        '''
+        playerId = self.engine.entMgr.player.playerId
+        focus = []
+        camera = self.engine.cameraSystem
+        if camera.cameraCenterPos is not None:
+            radius = max(MIN_CAMERA_INTEREST_RADIUS, abs(camera.height) * 4.0)
+            focus.append((playerId, camera.cameraCenterPos.x, camera.cameraCenterPos.z, radius))
+        for ent in self.engine.selectionSystem.selectedEnts:
+            focus.append((playerId, ent.pos.x, ent.pos.z, SELECTED_INTEREST_RADIUS))
+        if focus:
+            self.send(netPacket.buildPacket(self.InterestMessage, int(self.simTimeMilli()), self.interest, focus))
+
+
+    def sendUnknownEntQueries(self, dtime):
+        '''At most one batched request per INFO_REQUEST_PERIOD, however many ents we are missing
+        '''
+        if not self.infoRequestTimer.check(dtime):
+            return
+        if self.engine.localOptions.networkingOptions.vShipNet:
+            if self.unknowns:
+                self.prioritySend(self.packNewEntQuery(self.unknowns.keys()[:MAX_IDS_PER_REQUEST]))
+            return
+        if not self.joined: # everything, minus the info we cached last time we were in this session
+            records = [(ALL_ENTS, 0)] + [(id, 1) for id in self.infoCache.keys()[:MAX_IDS_PER_REQUEST]]
+        else:
+            records = [(id, int(id in self.infoCache)) for id in self.unknowns.keys()[:MAX_IDS_PER_REQUEST]]
+        if records:
+            self.prioritySend(netPacket.buildPacket(self.SnapshotRequest, int(self.simTimeMilli()), self.snapshotRequest, records))
 
-    def sendUnknownEntQueries(self):
-        for id in self.unknowns.keys():
-            self.prioritySend(self.packNewEntQuery([id]))
-        
     def packNewEntQuery(self, msg):
         packedMsg = self.header.pack(self.RequestInfoMessage , int(self.simTimeMilli()), len(msg), self.int.size)
         for i in msg:
@@ -398,12 +863,12 @@ class NetMgr(Mgr):
     def prioritySend(self, packedMsg): # from netAspect and from createEnts here
         self.broadcaster.putPriorityMessage(packedMsg)
 
-    def addCommand(self, packedCommand): # from netAspect
-        #print "Adding Command: ",  VCommand(self.command.unpack_from(packedCommand, 0))
-        self.commandQueue.appendleft(packedCommand)
+    def addCommand(self, commandFields): # from netAspect - (id, dh, ds), packed when the message is built
+        #print "Adding Command: ",  VCommand(commandFields)
+        self.commandQueue.appendleft(commandFields)
 
-    def addSquelch(self, packedCommand): # from netAspect
-        self.squelchQueue.appendleft(packedCommand)
+    def addSquelch(self, squelchFields): # from netAspect - (id,)
+        self.squelchQueue.appendleft(squelchFields)
 
 #---------------not needed?--------------------------------------------------------------------------------
     def addForcedMove(self, packedCommand):
@@ -411,7 +876,7 @@ class NetMgr(Mgr):
 
     def combineForcedMovesIntoNetMessage(self):
         if self.forcedMoveQueue:
-            packedMsg = self.header.pack(self.AbsoluteInfo, int(self.simTimeMilli()), 1, self.absoluteInfo.size)
+            packedMsg = self.header.pack(self.AbsoluteInfo, int(self.simTimeMilli()), len(self.forcedMoveQueue), self.absoluteInfo.size)
             while self.forcedMoveQueue:
                 packedMsg += self.forcedMoveQueue.pop()
             self.send(packedMsg)
@@ -419,19 +884,19 @@ class NetMgr(Mgr):
     #----these two \/\/\/\/ look very similar--------
     def combineSquelchesIntoNetMessage(self):
         if self.squelchQueue:
-            packedMsg = self.header.pack(self.SquelchCommand, int(self.simTimeMilli()), 1, self.squelch.size)
+            packedMsg = self.header.pack(self.SquelchCommand, int(self.simTimeMilli()), len(self.squelchQueue), self.squelch.size)
             while self.squelchQueue:
-                packedMsg += self.squelchQueue.pop()
-            self.send(packedMsg)
+                packedMsg += self.squelch.pack(*self.squelchQueue.pop())
+            self.sendReliable(packedMsg)
     #----these two \/\/\/\/ look very similar--------
     def combineCommandsIntoNetMessage(self): # every tick
         if self.commandQueue:
             packedMsg = self.header.pack(self.CommandMessage , int(self.simTimeMilli()), len(self.commandQueue), self.command.size)
             while self.commandQueue:
-                packedMsg += self.commandQueue.pop()
+                packedMsg += self.command.pack(*self.commandQueue.pop())
             #print "Sending: "
             #print str(self.unpack(packedMsg))
-            self.send(packedMsg)
+            self.sendReliable(packedMsg)
 
     def send(self, packedMsg):
         self.broadcaster.putMessage(packedMsg)
@@ -447,17 +912,30 @@ class NetMgr(Mgr):
 #---------Communicate with listener------------------
 
     def handleServerMessages(self, dtime):
-        for msg in self.listener.getMessages():
+        for msg, address, arrived in self.incoming():
             unpackedMsg = self.unpack(msg)
             if unpackedMsg.msgType == self.StatusMessage:
+                if address is not None: # expired partial messages have lost their sender
+                    self.serverClock = self.peerClock(address)
+                    self.serverClock.addArrival(unpackedMsg.time / 1000.0, self.simTime(arrived))
                 self.updateStatus(unpackedMsg)
             elif unpackedMsg.msgType == self.InfoMessage:
-                self.createEnts(unpackedMsg)
+                self.createEnts(unpackedMsg.data)
+            elif unpackedMsg.msgType == self.SnapshotMessage:
+                self.applySnapshot(unpackedMsg)
             elif unpackedMsg.msgType == self.SquelchCommand:
                 #print "Squelching: ", str(unpackedMsg)
                 self.squelchEnts(unpackedMsg)
             elif unpackedMsg.msgType == self.AbsoluteInfo:
                 pass
+            elif unpackedMsg.msgType == self.PongMessage:
+                if address is not None:
+                    t3 = self.simTime(arrived)
+                    clock = self.peerClock(address)
+                    for pong in unpackedMsg.data:
+                        clock.addSample(pong.t0, pong.t1, pong.t2, t3)
+            elif unpackedMsg.msgType in (self.InterestMessage, self.PingMessage, self.SnapshotRequest):
+                pass # another client talking to the server
             else:
                 pass
                 print "Unknown Message type, ignoring...", str(unpackedMsg)
@@ -474,16 +952,41 @@ class NetMgr(Mgr):
                 print "Unknown ent with id: ", d.id
 
     def updateStatus(self, status):
-        for d in status.data:
-            if d.id in self.netEnts.keys():
-                ent = self.netEnts[d.id]
-                ent.updateQueue.appendleft(d)
-            else:
-                self.unknowns[d.id] = d
-
-    def createEnts(self, infoMsg):
-        for info in infoMsg.data:
-            if info.id in self.unknowns.keys():
+        records = status.records
+        for base in self.netState.applyStatus(status.time, records):
+            d = VStatus(records[base:base + STATUS_STRIDE])
+            d.time = status.time
+            self.unknowns[d.id] = d
+
+    def applySnapshot(self, snapshot):
+        '''session id, status message, info message - see sendSnapshot
+        '''
+        try:
+            payload = zlib.decompress(str(snapshot.payload))
+        except zlib.error, e:
+            print "Snapshot damaged, will ask again: ", e # fragments lost, unknowns stay unknown
+            return
+        session = self.int.unpack_from(payload)[0]
+        if session != self.cacheSession: # new server, ids mean something else now
+            self.infoCache = {}
+            self.cacheSession = session
+        offset = self.int.size
+        messages = []
+        while offset < len(payload):
+            msgType, time, entCount, entSize = self.header.unpack_from(payload, offset)
+            end = offset + self.header.size + entCount * entSize
+            messages.append(self.unpack(payload[offset:end]))
+            offset = end
+        status, info = messages
+        self.updateStatus(status)
+        infos = info.data + [self.infoCache[id] for id in self.unknowns.keys() if id in self.infoCache]
+        self.createEnts(infos)
+        self.joined = True
+
+    def createEnts(self, infos):
+        for info in infos:
+            self.infoCache[info.id] = info
+            if info.id in self.unknowns:
                 if info.type in self.entNameClassMap:
                     entityType = self.entNameClassMap[info.type]
                 else:
@@ -517,7 +1020,8 @@ class NetMgr(Mgr):
         if unpackedMsg.msgType == self.InfoMessage:
             self.extractData(msg, unpackedMsg,  VInfo, self.info)
         elif unpackedMsg.msgType == self.StatusMessage:
-            self.extractData(msg, unpackedMsg, VStatus, self.status)
+            # decoded in one go into a flat tuple, see NetStateTable.applyStatus
+            unpackedMsg.records = netPacket.unpackRecords(self.status, msg, unpackedMsg.entCount)
         elif unpackedMsg.msgType == self.SquelchCommand:
             self.extractData(msg, unpackedMsg, VSquelchCommand, self.squelch)
         elif unpackedMsg.msgType == self.RequestInfoMessage:
@@ -535,6 +1039,16 @@ class NetMgr(Mgr):
         elif unpackedMsg.msgType == self.AbsoluteInfo:
             self.extractData(msg, unpackedMsg, VSetAbsoluteInfo, self.absoluteInfo)
             pass 
+        elif unpackedMsg.msgType == self.InterestMessage:
+            self.extractData(msg, unpackedMsg, VInterest, self.interest)
+        elif unpackedMsg.msgType == self.PingMessage:
+            self.extractData(msg, unpackedMsg, VPing, self.ping)
+        elif unpackedMsg.msgType == self.PongMessage:
+            self.extractData(msg, unpackedMsg, VPong, self.pong)
+        elif unpackedMsg.msgType == self.SnapshotRequest:
+            self.extractData(msg, unpackedMsg, VSnapshotRequest, self.snapshotRequest)
+        elif unpackedMsg.msgType == self.SnapshotMessage:
+            unpackedMsg.payload = msg[self.header.size:self.header.size + unpackedMsg.entCount] # compressed, see applySnapshot
         else:
             print "UNPACK: Unknown message type", str(mHeader)
         return unpackedMsg
@@ -635,6 +1149,40 @@ class VCommand:
     def __str__(self):
         return str(self.id) + "     " + str(self.dh)  + "     " + str(self.ds)
 
+class VInterest:
+    def __init__(self, data):
+        self.playerId = data[0]
+        self.x = data[1]
+        self.z = data[2]
+        self.radius = data[3]
+
+    def __str__(self):
+        return "Player: " + str(self.playerId) + "  at: (" + str(self.x) + ", " + str(self.z) + ")  radius: " + str(self.radius)
+
+class VPing:
+    def __init__(self, data):
+        self.t0 = data[0]
+
+    def __str__(self):
+        return "Ping sent: " + str(self.t0)
+
+class VPong:
+    def __init__(self, data):
+        self.t0 = data[0]
+        self.t1 = data[1]
+        self.t2 = data[2]
+
+    def __str__(self):
+        return "Pong t0: " + str(self.t0) + "  t1: " + str(self.t1) + "  t2: " + str(self.t2)
+
+class VSnapshotRequest:
+    def __init__(self, data):
+        self.id = data[0]
+        self.haveInfo = data[1]
+
+    def __str__(self):
+        return str(self.id) + "  have info: " + str(self.haveInfo)
+
 class VCreateShip:
     def __init__(self, data):
         self.label = data[0]
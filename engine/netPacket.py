@@ -0,0 +1,269 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Wire format structs and packet helpers for NetMgr
+
+Messages are a header followed by entCount fixed size records, built by
+concatenating packed records. Packing them in place into one presized
+bytearray measured no faster on CPython 2.7, which grows the string in
+place - run this file to check on another interpreter:
+
+    python engine/netPacket.py
+
+Nothing in here touches ogre so tools can import it on their own.
+'''
+
+import struct
+
+#-------structs to parse incoming outgoing messages
+header       = struct.Struct("=Biii")
+info         = struct.Struct("=i 256s256s ff fff ii")
+status       = struct.Struct("=i fff fff ff ff H")
+int32        = struct.Struct("=i")
+squelch      = struct.Struct("=i")
+command      = struct.Struct("=iff")
+createShip   = struct.Struct("=256s 256s fff f")
+absoluteInfo = struct.Struct("=i fff fff f 256s")
+interest     = struct.Struct("=i ff f") # playerId, x, z, radius
+ping         = struct.Struct("=d")      # t0 - seconds on the client's clock, see netClock
+pong         = struct.Struct("=d dd")   # t0 echoed, t1 ping arrived, t2 pong sent - server's clock
+snapshotRequest = struct.Struct("=iB")  # ent id, client already has its info
+
+
+_recordBlocks = {}
+def recordBlock(record, count):
+    '''A struct covering count back to back records, cached per (format, count)
+    '''
+    key = (record.format, count)
+    block = _recordBlocks.get(key)
+    if block is None:
+        block = struct.Struct(record.format[0] + record.format[1:] * count)
+        _recordBlocks[key] = block
+    return block
+
+def unpackRecords(record, msg, count, offset=header.size):
+    '''Decode count records in one call
+    Returns one flat tuple - record i starts at i * len(fields)
+    '''
+    if count <= 0:
+        return ()
+    return recordBlock(record, count).unpack_from(msg, offset)
+
+
+def buildPacket(msgType, time, record, records):
+    '''Pack a sequence of field tuples into one message
+    '''
+    msg = header.pack(msgType, time, len(records), record.size)
+    for fields in records:
+        msg += record.pack(*fields)
+    return msg
+
+def selectRecords(packet, indices):
+    '''A copy of packet carrying only the records at indices, header fixed up
+    '''
+    msgType, time, entCount, entSize = header.unpack_from(packet)
+    buf = bytearray(header.size + len(indices) * entSize)
+    header.pack_into(buf, 0, msgType, time, len(indices), entSize)
+    offset = header.size
+    for i in indices:
+        start = header.size + i * entSize
+        buf[offset:offset + entSize] = packet[start:start + entSize]
+        offset += entSize
+    return buf
+
+
+#-------fragmentation------------------------------------------------------------
+# A message bigger than one datagram goes out as several fragments. Each fragment
+# is a fragment header followed by a complete, self contained message carrying a
+# contiguous range of the original records, so whatever arrives is usable on its own.
+# Messages that fit are sent untouched, which keeps us wire compatible with VShip.
+
+FragmentMessage = 8 # msgType slot, keep synced with NetMgr
+fragment        = struct.Struct("=BHHH") # FragmentMessage, sequence, index, count
+
+MaxDatagramSize = 1400 # stay under a typical ethernet MTU so fragments are not split again by IP
+MaxSequence     = 65536
+
+def splitPacket(packet, maxDatagramSize, reserve=0):
+    '''Cut packet into complete messages of at most maxDatagramSize bytes, each
+    carrying a contiguous range of its records and starting with reserve spare bytes
+    for a wrapper header. Returns [packet] untouched if it fits and nothing is reserved.
+    '''
+    if len(packet) + reserve <= maxDatagramSize:
+        if not reserve:
+            return [packet]
+        datagram = bytearray(reserve + len(packet))
+        datagram[reserve:] = packet
+        return [datagram]
+
+    msgType, time, entCount, entSize = header.unpack_from(packet)
+    perPart = max(1, (maxDatagramSize - reserve - header.size) / max(1, entSize))
+    nParts = (entCount + perPart - 1) / perPart
+    prefix = reserve + header.size
+    parts = []
+    for index in xrange(nParts):
+        first = index * perPart
+        count = min(perPart, entCount - first)
+        start = header.size + first * entSize
+        part = bytearray(prefix + count * entSize)
+        header.pack_into(part, reserve, msgType, time, count, entSize)
+        part[prefix:] = packet[start:start + count * entSize]
+        parts.append(part)
+    return parts
+
+def fragmentPacket(packet, sequence, maxDatagramSize=MaxDatagramSize):
+    '''Returns the list of datagrams to send for packet
+    '''
+    if len(packet) <= maxDatagramSize:
+        return [packet]
+
+    datagrams = splitPacket(packet, maxDatagramSize, fragment.size)
+    for index, datagram in enumerate(datagrams):
+        fragment.pack_into(datagram, 0, FragmentMessage, sequence, index, len(datagrams))
+    return datagrams
+
+msgTypeOnly = struct.Struct("=B")
+def isFragment(datagram):
+    return len(datagram) >= fragment.size and msgTypeOnly.unpack_from(datagram)[0] == FragmentMessage
+
+
+class Reassembler(object):
+    '''Collects fragments back into whole messages
+    A message is released as soon as all its fragments arrived, or after timeout
+    seconds with whatever entity ranges did make it
+    '''
+    class Pending(object):
+        def __init__(self, firstSeen, nFragments):
+            self.firstSeen = firstSeen
+            self.nFragments = nFragments
+            self.parts = {}
+
+    def __init__(self, timeout=0.25, maxPending=64):
+        self.timeout = timeout
+        self.maxPending = maxPending
+        self.pending = {} # (address, sequence) -> Pending
+        self.nComplete = 0
+        self.nPartial = 0
+        self.nDropped = 0
+
+    def add(self, datagram, address, now):
+        '''Feed one fragment in, returns the reassembled message once complete, else None
+        '''
+        marker, sequence, index, nFragments = fragment.unpack_from(datagram)
+        key = (address, sequence)
+        pending = self.pending.get(key)
+        if pending is None:
+            if len(self.pending) >= self.maxPending:
+                self._dropOldest()
+            pending = self.Pending(now, nFragments)
+            self.pending[key] = pending
+        pending.parts[index] = datagram[fragment.size:]
+        if len(pending.parts) == pending.nFragments:
+            del self.pending[key]
+            self.nComplete += 1
+            return self.merge(pending.parts)
+        return None
+
+    def expire(self, now):
+        '''Release everything older than timeout, returns the partial messages
+        '''
+        partials = []
+        for key, pending in self.pending.items():
+            if now - pending.firstSeen > self.timeout:
+                del self.pending[key]
+                self.nPartial += 1
+                partials.append(self.merge(pending.parts))
+        return partials
+
+    def timeUntilExpiry(self, now):
+        '''Seconds until the oldest pending message times out, None if nothing is pending
+        '''
+        if not self.pending:
+            return None
+        oldest = min([pending.firstSeen for pending in self.pending.itervalues()])
+        return max(0.0, oldest + self.timeout - now)
+
+    def _dropOldest(self):
+        oldestKey = min(self.pending, key=lambda k: self.pending[k].firstSeen)
+        del self.pending[oldestKey]
+        self.nDropped += 1
+
+    def merge(self, parts):
+        '''Glue the record ranges of the fragments we have back into one message
+        '''
+        indices = sorted(parts)
+        msgType, time, entCount, entSize = header.unpack_from(parts[indices[0]])
+        total = 0
+        for i in indices:
+            total += header.unpack_from(parts[i])[2]
+        merged = bytearray(header.size + total * entSize)
+        header.pack_into(merged, 0, msgType, time, total, entSize)
+        offset = header.size
+        for i in indices:
+            body = buffer(parts[i], header.size)
+            merged[offset:offset + len(body)] = body
+            offset += len(body)
+        return merged
+
+
+#microbenchmark - python engine/netPacket.py
+if __name__ == '__main__':
+    import time
+
+    class FakeEnt(object):
+        def __init__(self, i):
+            self.x, self.y, self.z = i * 1.0, 0.0, -i * 1.0
+            self.vx, self.vy, self.vz = 1.0, 0.0, 1.0
+            self.yaw, self.ds, self.dh = 0.5, 10.0, 0.25
+
+    def concatStatus(ents):
+        packedMessage = header.pack(1, 0, len(ents), status.size)
+        for i, e in enumerate(ents):
+            packedMessage += status.pack(i, e.x, e.y, e.z, e.vx, e.vy, e.vz, e.yaw, 0.0, e.ds, e.dh, 0)
+        return packedMessage
+
+    def inPlaceStatus(ents):
+        buf = bytearray(header.size + status.size * len(ents))
+        header.pack_into(buf, 0, 1, 0, len(ents), status.size)
+        offset, stride, packInto = header.size, status.size, status.pack_into
+        for i, e in enumerate(ents):
+            packInto(buf, offset, i, e.x, e.y, e.z, e.vx, e.vy, e.vz, e.yaw, 0.0, e.ds, e.dh, 0)
+            offset += stride
+        return buf
+
+    def bench(func, ents, repeat):
+        start = time.time()
+        for i in xrange(repeat):
+            func(ents)
+        return (time.time() - start) / repeat * 1000.0
+
+    assert str(concatStatus([FakeEnt(3)])) == str(inPlaceStatus([FakeEnt(3)]))
+
+    print 'status packet build time'
+    print '%8s %10s %14s %14s' % ('ents', 'bytes', 'concat ms', 'in place ms')
+    for n in [10, 100, 1000, 5000]:
+        ents = [FakeEnt(i) for i in range(n)]
+        repeat = max(5, 20000 / n)
+        concatMs = bench(concatStatus, ents, repeat)
+        inPlaceMs = bench(inPlaceStatus, ents, repeat)
+        print '%8i %10i %14.4f %14.4f' % (n, header.size + n * status.size, concatMs, inPlaceMs)
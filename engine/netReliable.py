@@ -0,0 +1,267 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Reliable, ordered delivery for command class messages (helm commands, squelches)
+
+Status goes out unreliable and the newest one wins, but losing a helm command
+loses it for good - the dead band in NetAspect.updateServer never resends it.
+Messages sent through a ReliableChannel get a per sender sequence number:
+
+    ReliableMessage, sequence, oldest unacked sequence, <an ordinary complete message>
+
+Every receiver delivers each sender's stream in order, once, and remembers what
+it got. Once per tick, and only if something new arrived, it broadcasts a single
+AckMessage holding a cumulative ack plus a 32 bit selective ack mask for every
+sender it heard from. Senders retransmit whatever a known peer has not acked,
+backing off exponentially. Nothing waits on an ack, so the hot path gets no
+extra round trip - just one small ack datagram per tick at most.
+
+A receiver starts a new stream at the oldest sequence the sender still holds, so
+a lost first message is still retransmitted and delivered. Every datagram carries
+that oldest sequence, and a receiver still waiting on something older skips ahead
+to it - the sender gave up on the gap, so waiting would stall the stream for good. A peer that stops acking
+is forgotten after PEER_TIMEOUT so it cannot pin messages in the send window.
+
+Nothing in here touches ogre so tools can import it on their own.
+'''
+
+import socket
+import struct
+
+import netPacket
+
+ReliableMessage = 12 # msgType slot, keep synced with NetMgr
+AckMessage      = 13
+
+reliable = struct.Struct("=BHH")    # ReliableMessage, sequence, oldest unacked
+ack      = struct.Struct("=I H H I") # acked sender ip, port, cumulative sequence, selective mask
+
+MaxSequence  = 65536
+HalfSequence = MaxSequence / 2
+ACK_BITS     = 32
+
+INITIAL_RTO  = 0.1   # seconds before the first retransmit if we know nothing about the path
+MIN_RTO      = 0.03
+MAX_RTO      = 1.0
+MAX_ATTEMPTS = 10    # then give up on it and say so
+PEER_TIMEOUT = 5.0   # seconds without an ack before we stop waiting for a peer
+MAX_BUFFERED = 256   # out of order messages held per sender
+
+
+def seqLess(a, b):
+    '''a comes before b, allowing for wrap around
+    '''
+    return a != b and ((b - a) % MaxSequence) < HalfSequence
+
+def seqDiff(a, b):
+    '''How far a is ahead of b
+    '''
+    d = (a - b) % MaxSequence
+    if d >= HalfSequence:
+        d -= MaxSequence
+    return d
+
+def packAddress(address):
+    return struct.unpack("=I", socket.inet_aton(address[0]))[0], address[1]
+
+def isReliable(datagram):
+    return len(datagram) >= reliable.size and netPacket.msgTypeOnly.unpack_from(datagram)[0] == ReliableMessage
+
+def isAck(datagram):
+    return len(datagram) >= netPacket.header.size and netPacket.msgTypeOnly.unpack_from(datagram)[0] == AckMessage
+
+
+class Outstanding(object):
+    def __init__(self, sequence, datagram, now, rto):
+        self.sequence = sequence
+        self.datagram = datagram
+        self.nextSend = now + rto
+        self.rto = rto
+        self.attempts = 1
+
+
+class Peer(object):
+    '''Someone acking our stream
+    '''
+    def __init__(self, address, now):
+        self.address = address
+        self.lastHeard = now
+        self.cumulative = None
+        self.mask = 0
+
+    def hasAcked(self, sequence):
+        if self.cumulative is None:
+            return False
+        d = seqDiff(sequence, self.cumulative)
+        if d <= 0:
+            return True
+        return d <= ACK_BITS and bool(self.mask & (1 << (d - 1)))
+
+
+class Stream(object):
+    '''What we received from one sender
+    '''
+    def __init__(self, firstSequence):
+        self.expected = firstSequence
+        self.buffered = {} # sequence -> message
+
+    def ackFields(self):
+        cumulative = (self.expected - 1) % MaxSequence
+        mask = 0
+        for sequence in self.buffered:
+            d = seqDiff(sequence, cumulative)
+            if 0 < d <= ACK_BITS:
+                mask |= 1 << (d - 1)
+        return cumulative, mask
+
+
+class ReliableChannel(object):
+    def __init__(self, address, maxDatagramSize=netPacket.MaxDatagramSize):
+        '''address is the (ip, port) other hosts see our datagrams come from
+        '''
+        self.address = address
+        self.packedAddress = packAddress(address)
+        self.maxDatagramSize = maxDatagramSize
+        self.sequence = 0
+        self.outstanding = [] # Outstanding, oldest first
+        self.peers = {}   # address -> Peer
+        self.streams = {} # address -> Stream
+        self.ackDirty = False
+        self.nSent = 0
+        self.nResent = 0
+        self.nGivenUp = 0
+        self.nDelivered = 0
+        self.nDuplicates = 0
+
+#-------sending-------------------------------------------------------------------------
+    def wrap(self, packet, now, rto=INITIAL_RTO):
+        '''Returns the datagrams to send now for packet, and keeps them until acked
+        '''
+        datagrams = netPacket.splitPacket(packet, self.maxDatagramSize, reliable.size)
+        for datagram in datagrams:
+            self.outstanding.append(Outstanding(self.sequence, datagram, now, rto))
+            reliable.pack_into(datagram, 0, ReliableMessage, self.sequence, self.outstanding[0].sequence)
+            self.sequence = (self.sequence + 1) % MaxSequence
+            self.nSent += 1
+        return datagrams
+
+    def resend(self, now):
+        '''Retire what every live peer acked, return the datagrams due for a retransmit
+        '''
+        for address, peer in self.peers.items():
+            if now - peer.lastHeard > PEER_TIMEOUT:
+                print "Reliable: lost peer", address
+                del self.peers[address]
+        peers = self.peers.values()
+
+        due = []
+        keep = []
+        for o in self.outstanding:
+            if peers and all(peer.hasAcked(o.sequence) for peer in peers):
+                continue
+            if o.nextSend <= now:
+                if o.attempts >= MAX_ATTEMPTS:
+                    if peers:
+                        self.nGivenUp += 1
+                        print "Reliable: giving up on", o.sequence
+                    continue # nobody ever acked anything - no one to resend to
+                o.attempts += 1
+                o.rto = min(MAX_RTO, o.rto * 2.0)
+                o.nextSend = now + o.rto
+                reliable.pack_into(o.datagram, 0, ReliableMessage, o.sequence, self.outstanding[0].sequence)
+                due.append(o.datagram)
+                self.nResent += 1
+            keep.append(o)
+        self.outstanding = keep
+        return due
+
+    def receiveAck(self, msg, address, now):
+        '''An AckMessage from address - only the record about us matters
+        '''
+        msgType, time, count, size = netPacket.header.unpack_from(msg)
+        records = netPacket.unpackRecords(ack, msg, count)
+        ip, port = self.packedAddress
+        for i in xrange(0, len(records), 4):
+            if records[i] == ip and records[i + 1] == port:
+                peer = self.peers.get(address)
+                if peer is None:
+                    peer = Peer(address, now)
+                    self.peers[address] = peer
+                peer.lastHeard = now
+                peer.cumulative = records[i + 2]
+                peer.mask = records[i + 3]
+                return
+
+#-------receiving-----------------------------------------------------------------------
+    def receive(self, datagram, address):
+        '''A ReliableMessage from address - returns the inner messages now deliverable, in order
+        '''
+        msgType, sequence, oldest = reliable.unpack_from(datagram)
+        msg = datagram[reliable.size:]
+        self.ackDirty = True # duplicates too, our last ack may have been lost
+
+        stream = self.streams.get(address)
+        if stream is None:
+            if seqDiff(sequence, oldest) > MAX_BUFFERED:
+                oldest = sequence
+            stream = Stream(oldest)
+            self.streams[address] = stream
+
+        delivered = []
+        if seqLess(stream.expected, oldest): # the sender gave up on or retired everything before oldest
+            skipped = [s for s in stream.buffered if seqLess(s, oldest)]
+            skipped.sort(key=lambda s: seqDiff(s, stream.expected))
+            for s in skipped: # arrived, and acked, so still ours to deliver - just not the gaps between them
+                delivered.append(stream.buffered.pop(s))
+            stream.expected = oldest
+
+        if seqLess(sequence, stream.expected) or sequence in stream.buffered:
+            self.nDuplicates += 1
+        else:
+            if seqDiff(sequence, stream.expected) > MAX_BUFFERED:
+                print "Reliable: %s jumped ahead to %i, resyncing" % (str(address), sequence)
+                stream.expected = sequence
+                stream.buffered = {}
+            stream.buffered[sequence] = msg
+
+        while stream.expected in stream.buffered:
+            delivered.append(stream.buffered.pop(stream.expected))
+            stream.expected = (stream.expected + 1) % MaxSequence
+        self.nDelivered += len(delivered)
+        return delivered
+
+    def ackPacket(self, time):
+        '''The AckMessage to send this tick, or None if nothing new arrived
+        '''
+        if not self.ackDirty:
+            return None
+        self.ackDirty = False
+        records = []
+        for address, stream in self.streams.iteritems():
+            ip, port = packAddress(address)
+            cumulative, mask = stream.ackFields()
+            records.append((ip, port, cumulative, mask))
+        return netPacket.buildPacket(AckMessage, time, ack, records)
+
+    def __str__(self):
+        return "sent: %i  resent: %i  given up: %i  outstanding: %i  peers: %i  delivered: %i  duplicates: %i" % (self.nSent, self.nResent, self.nGivenUp, len(self.outstanding), len(self.peers), self.nDelivered, self.nDuplicates)
@@ -0,0 +1,149 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Dead reckoning and error correction for every networked ent in one pass
+
+Works straight off the NetStateTable columns. When a new status lands for a
+slot we extrapolate it to where the ship will be once the blend is over, work
+out how far our local copy is from that, and spread the difference over the
+blend as a fixed per tick correction. Yaw is plain angle arithmetic - start,
+shortest signed difference, fraction done - instead of building and slerping
+ogre quaternions for every ship every tick.
+
+The local copy keeps moving under its own physics in between, the corrections
+only ever pull it towards the served track.
+'''
+
+from mathlib import differenceBetweenAngles, pi, twopi
+from vector import vector3
+
+HEADING_TOLERANCE = pi/360.0
+MAX_STATUS_AGE    = 1.0 # seconds - never extrapolate a served state further than this
+JITTER_MARGIN     = 2.0 # blend over the update interval plus this many jitters
+
+
+class NetSmoother(object):
+    def __init__(self, table):
+        self.table = table
+        self.clear()
+
+    def clear(self):
+        self.lastTime = [] # server ms of the last status we blended towards
+        self.steps    = [] # ticks of correction left
+        self.corrX    = []
+        self.corrY    = []
+        self.corrZ    = []
+        self.yawFrom  = []
+        self.yawDelta = []
+        self.yawDone  = [] # fraction of yawDelta applied, 1.0 when not turning
+        self.yawStep  = []
+
+    def grow(self):
+        '''Bring the columns up to the table's length - new slots start settled
+        '''
+        for i in xrange(len(self.lastTime), len(self.table)):
+            self.lastTime.append(0)
+            self.steps.append(0)
+            self.corrX.append(0.0)
+            self.corrY.append(0.0)
+            self.corrZ.append(0.0)
+            self.yawFrom.append(0.0)
+            self.yawDelta.append(0.0)
+            self.yawDone.append(1.0)
+            self.yawStep.append(0.0)
+
+    def timing(self, statusTime, lastTime, dtime, clock, now):
+        '''(latency, blendTime) for one status
+        latency is how stale the served state is, blendTime what we spread the correction over
+        Servers that never answer pings (VShip) fall back to the time between their status messages
+        '''
+        if clock is not None and clock.synced:
+            age = clock.age(statusTime / 1000.0, now) # status time is in milliseconds
+            latency = min(MAX_STATUS_AGE, max(0.0, age))
+            return latency, max(dtime, clock.updateInterval + JITTER_MARGIN * clock.jitter)
+        return 0.0, min(MAX_STATUS_AGE, (statusTime - lastTime)/1000.0)
+
+    def step(self, dtime, clock, now, skip=()):
+        '''One tick for every slot - clock is the server's PeerClock or None,
+        now our netMgr.simTime(), skip the ents being force moved locally
+        '''
+        table = self.table
+        if len(self.lastTime) != len(table):
+            self.grow()
+        if dtime <= 0.0:
+            return
+        fresh, ents, times = table.fresh, table.ents, table.time
+        posX, posY, posZ = table.posX, table.posY, table.posZ
+        velX, velY, velZ = table.velX, table.velY, table.velZ
+        yaws, rSpeeds, dss, dhs = table.yaw, table.rSpeed, table.ds, table.dh
+        lastTime, steps = self.lastTime, self.steps
+        corrX, corrY, corrZ = self.corrX, self.corrY, self.corrZ
+        yawFrom, yawDelta, yawDone, yawStep = self.yawFrom, self.yawDelta, self.yawDone, self.yawStep
+
+        for slot in xrange(len(ents)):
+            ent = ents[slot]
+            if skip and ent in skip:
+                continue
+
+            if fresh[slot]: # the table only keeps the latest, so at most one blend starts per tick
+                fresh[slot] = False
+                statusTime = times[slot]
+                if statusTime > lastTime[slot]:
+                    latency, blendTime = self.timing(statusTime, lastTime[slot], dtime, clock, now)
+                    lastTime[slot] = statusTime
+                    n = max(1.0, blendTime/dtime)
+                    lead = latency + blendTime
+                    pos, vel = ent.pos, ent.velocity
+                    corrX[slot] = ((pos.x + vel.x * blendTime) - (posX[slot] + velX[slot] * lead)) / n
+                    corrY[slot] = ((pos.y + vel.y * blendTime) - (posY[slot] + velY[slot] * lead)) / n
+                    corrZ[slot] = ((pos.z + vel.z * blendTime) - (posZ[slot] + velZ[slot] * lead)) / n
+                    steps[slot] = n
+
+                    delta = differenceBetweenAngles(ent.yaw, yaws[slot] + rSpeeds[slot] * lead)
+                    yawFrom[slot] = ent.yaw
+                    yawDelta[slot] = delta
+                    if abs(delta) < HEADING_TOLERANCE:
+                        yawDone[slot] = 1.0
+                    else:
+                        yawStep[slot] = 1.0/n
+                        yawDone[slot] = yawStep[slot]
+
+                    ent.desiredSpeed = dss[slot]
+                    ent.desiredHeading = dhs[slot]
+                else:
+                    yawDone[slot] = 1.0
+                    steps[slot] = 0
+
+            if steps[slot] > 0:
+                pos = ent.pos
+                ent.pos = vector3(pos.x - corrX[slot], pos.y - corrY[slot], pos.z - corrZ[slot])
+                done = yawDone[slot]
+                if done < 1.0:
+                    yaw = yawFrom[slot] + yawDelta[slot] * done
+                    if yaw > pi:
+                        yaw -= twopi
+                    elif yaw < -pi:
+                        yaw += twopi
+                    ent.yaw = yaw
+                    yawDone[slot] = done + yawStep[slot]
+                steps[slot] -= 1
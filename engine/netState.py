@@ -0,0 +1,110 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Column store for the latest served state of every networked ent
+
+A status message decodes into one flat tuple (see netPacket.unpackRecords).
+Server ids map to table slots through the slots dict, and each record is
+written straight into the columns at its slot - no per record python objects.
+Messages may list any subset of the ents in any order.
+'''
+
+# offsets of each field within a status record - keep synced with netPacket.status
+STATUS_STRIDE = 12
+ID, POS_X, POS_Y, POS_Z, VEL_X, VEL_Y, VEL_Z, YAW, ROT_SPEED, DS, DH = range(11)
+
+
+class NetStateTable(object):
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.slots   = {} # server id -> slot
+        self.ids     = []
+        self.ents    = []
+
+        self.time   = []
+        self.posX   = []
+        self.posY   = []
+        self.posZ   = []
+        self.velX   = []
+        self.velY   = []
+        self.velZ   = []
+        self.yaw    = []
+        self.rSpeed = []
+        self.ds     = []
+        self.dh     = []
+        self.fresh  = [] # set when a new status lands, cleared once the NetAspect consumed it
+
+    def __len__(self):
+        return len(self.ids)
+
+    def addEnt(self, id, ent, status):
+        '''Give a newly created net ent a slot, seeded with the status it was created from
+        '''
+        slot = len(self.ids)
+        self.slots[id] = slot
+        self.ids.append(id)
+        self.ents.append(ent)
+
+        self.time.append(status.time)
+        self.posX.append(status.pos[0])
+        self.posY.append(status.pos[1])
+        self.posZ.append(status.pos[2])
+        self.velX.append(status.vel[0])
+        self.velY.append(status.vel[1])
+        self.velZ.append(status.vel[2])
+        self.yaw.append(status.yaw)
+        self.rSpeed.append(status.rSpeed)
+        self.ds.append(status.ds)
+        self.dh.append(status.dh)
+        self.fresh.append(False)
+        return slot
+
+    def applyStatus(self, time, records):
+        '''Write a decoded status message into the columns
+        Returns the record offsets of ids we don't have a slot for yet
+        '''
+        stride = STATUS_STRIDE
+        ids = records[ID::stride]
+        unknown = []
+        slots = self.slots
+        for i in xrange(len(ids)):
+            base = i * stride
+            slot = slots.get(ids[i])
+            if slot is None:
+                unknown.append(base)
+                continue
+            self.time[slot]   = time
+            self.posX[slot]   = records[base + POS_X]
+            self.posY[slot]   = records[base + POS_Y]
+            self.posZ[slot]   = records[base + POS_Z]
+            self.velX[slot]   = records[base + VEL_X]
+            self.velY[slot]   = records[base + VEL_Y]
+            self.velZ[slot]   = records[base + VEL_Z]
+            self.yaw[slot]    = records[base + YAW]
+            self.rSpeed[slot] = records[base + ROT_SPEED]
+            self.ds[slot]     = records[base + DS]
+            self.dh[slot]     = records[base + DH]
+            self.fresh[slot]  = True
+        return unknown
@@ -0,0 +1,421 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Routes around big, slow ships - MoveTo orders get waypoints
+
+    engine.pathPlanner.route(ent, cmd) # cmd a MoveTo to a StoppedAtPosition, already in ent's squad's commands
+
+The level (LevelData.dimensions, centred on the origin) is a grid of
+LevelData.pathCellSize cells. Every kObstacleInterval game seconds the ships
+that are large (length >= kObstacleMinLength) and slow (speed <=
+kObstacleMaxSpeed) are marked on it as blocked cells, grown by half their
+length plus kClearance.
+
+Planning is hierarchical:
+    a clear line on the fine grid needs no waypoints at all
+    A* over sectors (kSectorCells x kSectorCells cells) priced by how blocked they are
+    A* over just the fine cells of that sector corridor, string pulled down to its corners
+
+It runs on one worker thread shared by every ship, so an order never waits
+for it: the ship heads straight for its goal and its MoveTo is split into
+one MoveTo per waypoint when the path comes back on a later tick. Paths are
+cached by (start sector, goal sector) until the obstacles change, and other
+ships reuse a cached path when they have a clear line onto and off it.
+Deterministic runs plan inline with plain plan() - no worker, no cache -
+so a replay gets the same waypoints on the same tick. Snapshots carry the
+obstacle grid, and restoring one drops the cache and requests in flight.
+'''
+
+import math
+import heapq
+import threading
+import traceback
+
+from mgr import Mgr
+
+kObstacleInterval  = 5.0   # game seconds between obstacle map updates
+kObstacleMinLength = 50.0  # ships at least this long ...
+kObstacleMaxSpeed  = 2.0   # ... and no faster than this are obstacles
+kClearance         = 100.0 # meters kept off an obstacle's hull circle
+kSectorCells       = 10
+kBlockedCost       = 50.0  # a blocked cell costs this many free ones - ships can still get out of one
+kMaxCacheSize      = 4096
+
+SQRT2 = math.sqrt(2.0)
+NEIGHBOURS = [(1, 0, 1.0), (-1, 0, 1.0), (0, 1, 1.0), (0, -1, 1.0),
+              (1, 1, SQRT2), (1, -1, SQRT2), (-1, 1, SQRT2), (-1, -1, SQRT2)]
+
+class Grid(object):
+    '''The level's obstacles at one moment - never changed once built, so threads can share it
+    '''
+    def __init__(self, dimensions, cellSize, blocked=frozenset(), version=0):
+        self.cellSize = float(cellSize)
+        self.originX = -dimensions[0] / 2.0
+        self.originZ = -dimensions[1] / 2.0
+        self.width = int(math.ceil(dimensions[0] / self.cellSize))
+        self.height = int(math.ceil(dimensions[1] / self.cellSize))
+        self.blocked = blocked
+        self.version = version
+        self.sectorBlocked = {} # sector -> fraction of its cells blocked
+        for i, j in blocked:
+            sector = (i / kSectorCells, j / kSectorCells)
+            self.sectorBlocked[sector] = self.sectorBlocked.get(sector, 0) + 1.0 / (kSectorCells * kSectorCells)
+
+    def cellOf(self, x, z):
+        '''(i, j) or None off the level
+        '''
+        i = int(math.floor((x - self.originX) / self.cellSize))
+        j = int(math.floor((z - self.originZ) / self.cellSize))
+        if 0 <= i < self.width and 0 <= j < self.height:
+            return (i, j)
+        return None
+
+    def center(self, cell):
+        return (self.originX + (cell[0] + 0.5) * self.cellSize, self.originZ + (cell[1] + 0.5) * self.cellSize)
+
+    def lineClear(self, a, b):
+        '''No blocked cell under the segment a - b, sampled every half cell
+        '''
+        if not self.blocked:
+            return True
+        ax, az = a
+        bx, bz = b
+        steps = int(math.hypot(bx - ax, bz - az) / (self.cellSize * 0.5)) + 1
+        for k in xrange(steps + 1):
+            t = k / float(steps)
+            if self.cellOf(ax + (bx - ax) * t, az + (bz - az) * t) in self.blocked:
+                return False
+        return True
+
+def obstacleCells(grid, ents):
+    '''Blocked cells for the large, slow ships among ents
+    '''
+    blocked = set()
+    size = grid.cellSize
+    for ent in ents:
+        if not ent.hasSquad or ent.length < kObstacleMinLength or abs(ent.speed) > kObstacleMaxSpeed:
+            continue
+        radius = ent.length * 0.5 + kClearance
+        reach = int(math.ceil(radius / size))
+        ci = int(math.floor((ent.pos.x - grid.originX) / size))
+        cj = int(math.floor((ent.pos.z - grid.originZ) / size))
+        for i in xrange(max(ci - reach, 0), min(ci + reach, grid.width - 1) + 1):
+            for j in xrange(max(cj - reach, 0), min(cj + reach, grid.height - 1) + 1):
+                x, z = grid.center((i, j))
+                if (x - ent.pos.x) ** 2 + (z - ent.pos.z) ** 2 <= (radius + size * 0.71) ** 2: # any of the cell inside
+                    blocked.add((i, j))
+    return frozenset(blocked)
+
+def astar(start, goal, neighbours, heuristic):
+    '''Cheapest node list start .. goal, None if there is none
+    neighbours(node) - [(next, cost)]
+    '''
+    openHeap = [(heuristic(start), 0.0, start)]
+    cameFrom = {start: None}
+    costSoFar = {start: 0.0}
+    while openHeap:
+        f, g, node = heapq.heappop(openHeap)
+        if node == goal:
+            path = []
+            while node is not None:
+                path.append(node)
+                node = cameFrom[node]
+            path.reverse()
+            return path
+        if g > costSoFar[node]:
+            continue
+        for nextNode, cost in neighbours(node):
+            ng = g + cost
+            if ng < costSoFar.get(nextNode, 1e300):
+                costSoFar[nextNode] = ng
+                cameFrom[nextNode] = node
+                heapq.heappush(openHeap, (ng + heuristic(nextNode), ng, nextNode))
+    return None
+
+def octile(a, b):
+    dx = abs(a[0] - b[0])
+    dy = abs(a[1] - b[1])
+    return max(dx, dy) + (SQRT2 - 1.0) * min(dx, dy)
+
+def sectorPath(grid, start, goal):
+    sectorsWide = (grid.width + kSectorCells - 1) / kSectorCells
+    sectorsHigh = (grid.height + kSectorCells - 1) / kSectorCells
+    def neighbours(sector):
+        result = []
+        for di, dj, step in NEIGHBOURS:
+            i = sector[0] + di
+            j = sector[1] + dj
+            if 0 <= i < sectorsWide and 0 <= j < sectorsHigh:
+                result.append(((i, j), step * (1.0 + kBlockedCost * grid.sectorBlocked.get((i, j), 0.0))))
+        return result
+    return astar(start, goal, neighbours, lambda sector: octile(sector, goal))
+
+def cellPath(grid, start, goal, corridor=None):
+    '''Fine A*, only through cells whose sector is in corridor when given
+    '''
+    blocked = grid.blocked
+    def neighbours(cell):
+        result = []
+        for di, dj, step in NEIGHBOURS:
+            i = cell[0] + di
+            j = cell[1] + dj
+            if not (0 <= i < grid.width and 0 <= j < grid.height):
+                continue
+            if corridor is not None and (i / kSectorCells, j / kSectorCells) not in corridor:
+                continue
+            if (i, j) in blocked:
+                step *= kBlockedCost
+            result.append(((i, j), step))
+        return result
+    return astar(start, goal, neighbours, lambda cell: octile(cell, goal))
+
+def stringPull(grid, points):
+    '''Drop every point the line from the last kept one can skip
+    '''
+    if len(points) < 3:
+        return points
+    kept = [points[0]]
+    i = 0
+    while i < len(points) - 1:
+        j = len(points) - 1
+        while j > i + 1 and not grid.lineClear(points[i], points[j]):
+            j -= 1
+        kept.append(points[j])
+        i = j
+    return kept
+
+def plan(grid, start, goal):
+    '''World (x, z) waypoints strictly between start and goal, [] to go straight
+    '''
+    if grid.lineClear(start, goal):
+        return []
+    startCell = grid.cellOf(*start)
+    goalCell = grid.cellOf(*goal)
+    if startCell is None or goalCell is None:
+        return [] # off the level - we know of no obstacles there
+    sectors = sectorPath(grid, (startCell[0] / kSectorCells, startCell[1] / kSectorCells), (goalCell[0] / kSectorCells, goalCell[1] / kSectorCells))
+    corridor = set()
+    for i, j in sectors:
+        for di in (-1, 0, 1):
+            for dj in (-1, 0, 1):
+                corridor.add((i + di, j + dj))
+    cells = cellPath(grid, startCell, goalCell, corridor) or cellPath(grid, startCell, goalCell) or []
+    points = [start] + [grid.center(cell) for cell in cells[1:-1]] + [goal]
+    return stringPull(grid, points)[1:-1]
+
+class Planner(threading.Thread):
+    '''The worker - takes (key, grid, start, goal) requests, leaves (key, waypoints) in done
+    Owns the path cache, nothing else touches it
+    '''
+    def __init__(self):
+        threading.Thread.__init__(self)
+        self.setDaemon(True)
+        self.condition = threading.Condition()
+        self.pending = []
+        self.done = []
+        self.die = False
+        self.flush = False
+        self.cache = {}
+        self.cacheVersion = None
+        self.nPlanned = 0
+        self.nCacheHits = 0
+        self.start()
+
+    def request(self, key, grid, start, goal):
+        self.condition.acquire()
+        self.pending.append((key, grid, start, goal))
+        self.condition.notify()
+        self.condition.release()
+
+    def results(self):
+        self.condition.acquire()
+        done, self.done = self.done, []
+        self.condition.release()
+        return done
+
+    def clearCache(self):
+        '''Forget every cached path before planning anything else
+        '''
+        self.condition.acquire()
+        self.pending = []
+        self.flush = True
+        self.condition.release()
+
+    def close(self):
+        self.condition.acquire()
+        self.die = True
+        self.condition.notify()
+        self.condition.release()
+        self.join(5.0)
+
+    def run(self):
+        while True:
+            self.condition.acquire()
+            while not self.pending and not self.die:
+                self.condition.wait()
+            batch, self.pending = self.pending, []
+            die = self.die
+            if self.flush:
+                self.cache = {}
+                self.cacheVersion = None
+                self.flush = False
+            self.condition.release()
+            if die:
+                break
+            for key, grid, start, goal in batch:
+                try:
+                    waypoints = self.solve(grid, start, goal)
+                except Exception:
+                    print 'Planner: failed', start, goal
+                    traceback.print_exc()
+                    waypoints = []
+                self.condition.acquire()
+                self.done.append((key, waypoints))
+                self.condition.release()
+
+    def solve(self, grid, start, goal):
+        '''plan() through the cache
+        '''
+        if grid.version != self.cacheVersion or len(self.cache) > kMaxCacheSize:
+            self.cache = {}
+            self.cacheVersion = grid.version
+        startCell = grid.cellOf(*start)
+        goalCell = grid.cellOf(*goal)
+        key = None
+        if startCell and goalCell:
+            key = (startCell[0] / kSectorCells, startCell[1] / kSectorCells, goalCell[0] / kSectorCells, goalCell[1] / kSectorCells)
+            waypoints = self.cache.get(key)
+            if waypoints and grid.lineClear(start, waypoints[0]) and grid.lineClear(waypoints[-1], goal):
+                self.nCacheHits += 1
+                return waypoints
+        waypoints = plan(grid, start, goal)
+        self.nPlanned += 1
+        if key and waypoints:
+            self.cache[key] = waypoints
+        return waypoints
+
+class PathPlanner(Mgr):
+    def initialize(self):
+        self.grid = None
+        self.worker = None
+        self.requests = {} # key -> (ent, cmd) waiting on the worker
+        self.requestCounter = 0
+        self.nextObstacleUpdate = 0.0
+        self.gridVersion = 0
+
+    def loadLevel(self):
+        self.grid = self.newGrid()
+        self.nextObstacleUpdate = self.engine.gameTime
+
+    def releaseLevel(self):
+        self.grid = None
+        self.requests = {}
+
+    def releaseEngine(self):
+        if self.worker:
+            self.worker.close()
+            self.worker = None
+
+    def tick(self, dtime):
+        if self.grid is None or not self.engine.localOptions.gameOptions.pathPlanning:
+            return
+        self.refreshObstacles()
+        if self.worker:
+            for key, waypoints in self.worker.results():
+                request = self.requests.pop(key, None)
+                if request:
+                    self.apply(request[0], request[1], waypoints)
+
+    def refreshObstacles(self):
+        '''Mark the ships on the grid again every kObstacleInterval - and before the first route, for orders given as the level loads
+        '''
+        if self.engine.gameTime >= self.nextObstacleUpdate:
+            self.nextObstacleUpdate = self.engine.gameTime + kObstacleInterval
+            self.updateObstacles()
+
+    def newGrid(self, blocked=frozenset()):
+        '''A grid with a version no earlier grid had, restores included - the worker's cache is keyed on it
+        '''
+        self.gridVersion += 1
+        level = self.engine.levelSystem.currentLevel
+        return Grid(level.dimensions, level.pathCellSize, blocked, self.gridVersion)
+
+    def updateObstacles(self):
+        blocked = obstacleCells(self.grid, self.engine.entMgr.ents)
+        if blocked != self.grid.blocked:
+            self.grid = self.newGrid(blocked)
+
+    def state(self):
+        '''Obstacle grid and when it is next updated, as plain data for snapshot.py
+        '''
+        if self.grid is None:
+            return None
+        return (sorted(self.grid.blocked), self.nextObstacleUpdate)
+
+    def restore(self, state):
+        '''Back to a snapshot's grid - what was cached or asked for belongs to another world
+        '''
+        self.requests = {}
+        if self.worker:
+            self.worker.clearCache()
+        if self.grid is None or state is None:
+            return
+        blocked, self.nextObstacleUpdate = state
+        self.grid = self.newGrid(frozenset([tuple(cell) for cell in blocked]))
+
+    def route(self, ent, cmd):
+        """Split cmd, a MoveTo in ent's squad's commands, into waypoints around the obstacles - a few ticks later
+        Does nothing unless gameOptions.pathPlanning is on and cmd is headed for a StoppedAtPosition
+        """
+        from desiredState import StoppedAtPosition # here, not at the top - the planning above is tested without ogre
+        if not self.engine.localOptions.gameOptions.pathPlanning or self.grid is None:
+            return
+        if not isinstance(cmd.desiredState, StoppedAtPosition):
+            return
+        commands = ent.squad.SquadAI.commands
+        index = commands.index(cmd)
+        start = (ent.pos.x, ent.pos.z)
+        if index > 0 and isinstance(commands[index - 1].desiredState, StoppedAtPosition):
+            previous = commands[index - 1].desiredState
+            start = (previous.pos.x, previous.pos.z)
+        goal = (cmd.desiredState.pos.x, cmd.desiredState.pos.z)
+        self.refreshObstacles()
+
+        if self.engine.deterministic: # same waypoints on the same tick every run
+            self.apply(ent, cmd, plan(self.grid, start, goal))
+            return
+        if not self.worker:
+            self.worker = Planner()
+        self.requestCounter += 1
+        self.requests[self.requestCounter] = (ent, cmd)
+        self.worker.request(self.requestCounter, self.grid, start, goal)
+
+    def apply(self, ent, cmd, waypoints):
+        import command
+        from desiredState import StoppedAtPosition
+        from vector import vector3
+        commands = ent.squad.SquadAI.commands
+        if not waypoints or cmd not in commands:
+            return # straight there, or the order has been replaced meanwhile
+        index = commands.index(cmd)
+        commands[index:index] = [command.MoveTo(self.engine, StoppedAtPosition(vector3(x, 0, z)), cmd.desiredSpeed) for x, z in waypoints]
@@ -35,6 +35,8 @@ class Renderable(Aspect):
         self.ent.ogreName = str(self.ent)
         self.ent.pos = vector3(0.0, 0.0, 0.0)
         self.ent.yaw = 0.0
+        if self.engine.headless:
+            return
 
         self._rootNode = self.engine.gfxSystem.sceneManager.getRootSceneNode().createChildSceneNode(self.ent.ogreName, self.ent.pos)
 
@@ -77,6 +79,8 @@ class Renderable(Aspect):
         self.mouseOverCircle.setup(radius=radius + 10,  thickness = thickness)
 
     def tick(self, dtime):
+        if self.engine.headless:
+            return
         #dist = -(self.engine.cameraSystem.wvp * self.ent.pos).z
         dist = self.engine.cameraSystem.height
         self._rootNode.setPosition(self.ent.pos)
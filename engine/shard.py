@@ -0,0 +1,298 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Splitting the ocean into regions, each simulated by its own worker process
+
+    coordinator  <-- pipe -->  region worker 0   (cent.CEnt physics + avoidance)
+                 <-- pipe -->  region worker 1
+                 ...
+
+The world is cut into a grid of regions. Each worker owns the ships inside its
+region and runs their native helm plus a simple separation based avoidance.
+Ships near a border also show up in the neighbouring regions as read only
+ghosts, so avoidance works across the border. A ship that sails out of its
+region is handed, cent parameters and all, to the region it entered.
+
+Every tick the coordinator sends each worker its arrivals, ghosts and helm
+commands, all workers step in parallel, and the coordinator merges what
+comes back into one list of ship states sorted by id - what NetMgr.serve
+needs. Pipes are multiprocessing's, so this all runs on one machine.
+
+The server process no longer moves sharded ships itself: their UnitAI only
+runs the navigator (CEnt.navTick) for the helm, and NetMgr.shardTick writes
+the region results back into the ents and their CEnts.
+
+Needs cent, but not ogre.
+'''
+
+import math
+import struct
+import multiprocessing
+
+import cent
+from spatialGrid import SpatialGrid
+
+AVOID_RADIUS_SCALE = 4.0  # avoid anything within this many ship lengths
+AVOID_GAIN         = 1.5
+MIN_AVOID_RADIUS   = 200.0
+
+# ship tuple - everything needed to rebuild a ship in another process
+(S_ID, S_X, S_Z, S_YAW, S_SPEED, S_DS, S_DH, S_MAX_SPEED, S_MAX_ASTERN, S_ACCEL, S_ROT_SPEED,
+ S_SIZE_X, S_SIZE_Z, S_LOOK_AHEAD, S_MAX_STOP, S_MIN_STOP, S_CRAMP, S_CLASS) = range(18)
+
+# state tuple - per tick result, sorted by id
+(T_ID, T_X, T_Z, T_VEL_X, T_VEL_Z, T_YAW, T_SPEED, T_DS, T_DH) = range(9)
+
+# the motion fields leading every getKinematics record (snapshot.kinematics) - how results go back into the server's CEnts
+motion = struct.Struct("=6f") # posX, posY, yaw, speed, velX, velY
+
+
+class RegionMap(object):
+    '''nx by nz regions covering [minX, maxX) x [minZ, maxZ), anything outside
+    belongs to the nearest edge region
+    '''
+    def __init__(self, minX, minZ, maxX, maxZ, nx, nz, halo):
+        self.minX, self.minZ, self.maxX, self.maxZ = float(minX), float(minZ), float(maxX), float(maxZ)
+        self.nx, self.nz = nx, nz
+        self.halo = halo
+        self.cellX = (self.maxX - self.minX) / nx
+        self.cellZ = (self.maxZ - self.minZ) / nz
+
+    def __len__(self):
+        return self.nx * self.nz
+
+    def region(self, x, z):
+        i = min(self.nx - 1, max(0, int((x - self.minX) / self.cellX)))
+        j = min(self.nz - 1, max(0, int((z - self.minZ) / self.cellZ)))
+        return j * self.nx + i
+
+    def haloRegions(self, x, z, home):
+        '''Regions other than home within halo of x, z
+        '''
+        h = self.halo
+        found = set()
+        for dx in (-h, 0.0, h):
+            for dz in (-h, 0.0, h):
+                r = self.region(x + dx, z + dz)
+                if r != home:
+                    found.add(r)
+        return found
+
+
+def shipFromEnt(id, ent, ds, dh):
+    '''A ship tuple for an engine ent - see UnitAI.init for where the cent parameters come from
+    '''
+    return (id, ent.pos.x, ent.pos.z, ent.yaw, ent.speed, ds, dh,
+            ent.maxSpeed, ent.maxSpeed * -.5, ent.accelSpeed, ent.rotationalSpeed,
+            ent.avoidanceSize.x, ent.avoidanceSize.z, ent.collisionLookAheadTime,
+            ent.maxDistanceForFullStop, ent.minDistanceForFullStop, ent.crampDistance, ent.collisionClass)
+
+
+class RegionShip(object):
+    def __init__(self, ship):
+        self.id = ship[S_ID]
+        self.params = ship[S_MAX_SPEED:]
+        self.cent = cent.CEnt(*self.params)
+        self.cent.posX = ship[S_X]
+        self.cent.posY = ship[S_Z]
+        self.cent.yaw = ship[S_YAW]
+        self.cent.speed = ship[S_SPEED]
+        self.ds = ship[S_DS]
+        self.dh = ship[S_DH]
+        self.avoidRadius = max(MIN_AVOID_RADIUS, ship[S_SIZE_X] * 2.0 * AVOID_RADIUS_SCALE)
+
+    def toTuple(self):
+        c = self.cent
+        return (self.id, c.posX, c.posY, c.yaw, c.speed, self.ds, self.dh) + self.params
+
+
+class Region(object):
+    '''One region's ships - lives in a worker process
+    '''
+    def __init__(self, index, regionMap):
+        self.index = index
+        self.regionMap = regionMap
+        self.ships = {} # id -> RegionShip
+        self.grid = SpatialGrid(max(MIN_AVOID_RADIUS, regionMap.halo))
+
+    def step(self, dtime, arrivals, ghosts, commands):
+        for ship in arrivals:
+            self.ships[ship[S_ID]] = RegionShip(ship)
+        for id, dh, ds in commands:
+            ship = self.ships.get(id)
+            if ship:
+                ship.dh, ship.ds = dh, ds
+
+        grid = self.grid
+        grid.clear()
+        for ship in self.ships.itervalues():
+            grid.insert((ship.id, ship.cent.posX, ship.cent.posY), ship.cent.posX, ship.cent.posY)
+        for ghost in ghosts:
+            grid.insert(ghost, ghost[1], ghost[2])
+
+        regionMap = self.regionMap
+        states = []
+        emigrants = []
+        halo = []
+        for ship in self.ships.values():
+            c = ship.cent
+            c.helmDesiredSpeed = ship.ds
+            c.helmDesiredHeading = self.avoid(ship, grid)
+            c.helmTick(dtime)
+            x, z = c.posX, c.posY
+            states.append((ship.id, x, z, c.velX, c.velY, c.yaw, c.speed, ship.ds, ship.dh))
+            home = regionMap.region(x, z)
+            if home != self.index:
+                emigrants.append((home, ship.toTuple()))
+                del self.ships[ship.id]
+            for r in regionMap.haloRegions(x, z, home):
+                halo.append((r, (ship.id, x, z)))
+        return states, emigrants, halo
+
+    def avoid(self, ship, grid):
+        '''Desired heading bent away from anything too close, owned or ghost
+        '''
+        c = ship.cent
+        x, z = c.posX, c.posY
+        radius = ship.avoidRadius
+        pushX = pushZ = 0.0
+        for (id, otherX, otherZ), d2 in grid.queryCircle(x, z, radius):
+            if id == ship.id or d2 <= 0.0:
+                continue
+            d = math.sqrt(d2)
+            weight = (radius - d) / (radius * d) # 1/radius .. 0 as d goes 0 .. radius, times the unit vector
+            pushX += (x - otherX) * weight
+            pushZ += (z - otherZ) * weight
+        if pushX == 0.0 and pushZ == 0.0:
+            return ship.dh
+        # heading convention from cent: velocity is (cos(-yaw), sin(-yaw))
+        wantX = math.cos(-ship.dh) + AVOID_GAIN * pushX
+        wantZ = math.sin(-ship.dh) + AVOID_GAIN * pushZ
+        return -math.atan2(wantZ, wantX)
+
+
+def workerMain(index, regionMap, conn):
+    region = Region(index, regionMap)
+    while True:
+        msg = conn.recv()
+        if msg is None:
+            break
+        dtime, arrivals, ghosts, commands = msg
+        conn.send(region.step(dtime, arrivals, ghosts, commands))
+    conn.close()
+
+
+class ShardCoordinator(object):
+    '''Runs one worker process per region and stitches their results together
+    '''
+    def __init__(self, regionMap):
+        self.regionMap = regionMap
+        self.owner = {} # ship id -> region
+        self.arrivals = [[] for r in xrange(len(regionMap))]
+        self.ghosts   = [[] for r in xrange(len(regionMap))]
+        self.commands = [[] for r in xrange(len(regionMap))]
+        self.connections = []
+        self.workers = []
+        self.nMigrations = 0
+        for index in xrange(len(regionMap)):
+            mine, theirs = multiprocessing.Pipe()
+            worker = multiprocessing.Process(target=workerMain, args=(index, regionMap, theirs))
+            worker.daemon = True
+            worker.start()
+            self.connections.append(mine)
+            self.workers.append(worker)
+
+    def __contains__(self, id):
+        return id in self.owner
+
+    def add(self, ship):
+        '''A ship tuple - it joins its region on the next tick
+        '''
+        region = self.regionMap.region(ship[S_X], ship[S_Z])
+        self.owner[ship[S_ID]] = region
+        self.arrivals[region].append(ship)
+
+    def command(self, id, dh, ds):
+        region = self.owner.get(id)
+        if region is not None:
+            self.commands[region].append((id, dh, ds))
+
+    def tick(self, dtime):
+        '''Step every region in parallel, returns state tuples for every ship sorted by id
+        '''
+        n = len(self.connections)
+        for r in xrange(n):
+            self.connections[r].send((dtime, self.arrivals[r], self.ghosts[r], self.commands[r]))
+        self.arrivals = [[] for r in xrange(n)]
+        self.ghosts   = [[] for r in xrange(n)]
+        self.commands = [[] for r in xrange(n)]
+
+        states = []
+        for r in xrange(n):
+            regionStates, emigrants, halo = self.connections[r].recv()
+            states.extend(regionStates)
+            for home, ship in emigrants:
+                self.owner[ship[S_ID]] = home
+                self.arrivals[home].append(ship)
+                self.nMigrations += 1
+            for region, ghost in halo:
+                self.ghosts[region].append(ghost)
+        states.sort()
+        return states
+
+    def stop(self):
+        for conn in self.connections:
+            try:
+                conn.send(None)
+            except (IOError, EOFError):
+                pass
+        for worker in self.workers:
+            worker.join(1.0)
+        self.connections = []
+        self.workers = []
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+    import random
+
+    nShips = len(sys.argv) > 1 and int(sys.argv[1]) or 2000
+    nTicks = 100
+    rng = random.Random(1)
+    ships = []
+    for id in xrange(nShips):
+        yaw = rng.uniform(-math.pi, math.pi)
+        ships.append((id, rng.uniform(-20000.0, 20000.0), rng.uniform(-20000.0, 20000.0), yaw, 10.0, 10.0, yaw,
+                      15.0, -7.5, 1.0, 0.1, 77.0, 15.0, 300.0, 50.0, 1500.0, 7500.0, 1))
+    for nx, nz in ((1, 1), (2, 1), (2, 2)):
+        coordinator = ShardCoordinator(RegionMap(-20000, -20000, 20000, 20000, nx, nz, 1000.0))
+        for ship in ships:
+            coordinator.add(ship)
+        coordinator.tick(0.1)
+        start = time.time()
+        for i in xrange(nTicks):
+            states = coordinator.tick(1.0) # big steps so ships cross borders
+        elapsed = time.time() - start
+        coordinator.stop()
+        print '%i regions: %i ships  %.2f ms/tick  migrations: %i' % (nx * nz, len(states), elapsed / nTicks * 1000.0, coordinator.nMigrations)
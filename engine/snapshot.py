@@ -0,0 +1,213 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Binary snapshot of the whole simulation - Engine.saveSnapshot / loadSnapshot
+
+    magic | marshal of the state
+
+capture() builds the state as plain data - numbers, strings, tuples, lists
+and dicts - so it can be marshalled, journalled as a keyframe and read
+back without unpickling anything. It holds a record of every ship (type
+name, handle, squad, player, AI state, speed limit, navigator route,
+timers, command queue as command.toRecord tuples, whether the ship
+follows its squad's own command list and how far along it it is), one of
+every squad of those ships (members in order, formation and slot
+assignment, command queue, timer), the actions still pending as their
+records, the path planner's obstacle grid, and the kinematics straight out
+of the native CEnt table in one call, in CEnt id order.
+
+Restoring onto the world the snapshot was taken from - a batch run
+resetting its scenario - only writes state back. Ships the world does not
+have yet are created and put back in their squads, ships the snapshot does
+not know about are left alone.
+'''
+
+import struct
+
+import cent
+import command
+import actionJournal
+import formation
+from vector import vector3
+from player import Player
+
+Magic      = 'ESN3'
+kinematics = struct.Struct("=12fi")  # IMPORTANT: keep synced with CEntKinematics in CEnt/cent.h
+kinematicsFields = ('posX', 'posY', 'yaw', 'speed', 'velX', 'velY',
+    'helmDesiredSpeed', 'helmDesiredHeading', 'navDesiredSpeed', 'navDesiredHeading',
+    'destinationX', 'destinationY', 'flags')
+
+def dumps(state):
+    return Magic + actionJournal.dumps(state)
+
+def loads(data):
+    if data[:len(Magic)] != Magic:
+        raise ValueError('not a snapshot')
+    return actionJournal.loads(data[len(Magic):])
+
+def ships(engine):
+    '''Every ent with a UnitAI, in CEnt id order
+    '''
+    ents = [ent for ent in engine.entMgr.ents if ent.hasSquad]
+    ents.sort(key=lambda ent: ent.UnitAI.cent.id)
+    return ents
+
+def capture(engine):
+    '''The state restore() needs, as plain data
+    '''
+    records = []
+    ids = []
+    squads = []
+    for ent in ships(engine):
+        unitAI = ent.UnitAI
+        squadAI = ent.squad.SquadAI
+        if ent.squad not in squads:
+            squads.append(ent.squad)
+        destination = unitAI.destination and (unitAI.destination.x, unitAI.destination.y, unitAI.destination.z)
+        player = ent.player and (ent.player.side, ent.player.playerId)
+        followsSquad = unitAI.commands is squadAI.commands
+        unitCommands = not followsSquad and [command.toRecord(cmd) for cmd in unitAI.commands] or []
+        records.append((ent.handle, type(ent).__name__, player, ent.squad.handle, ent.pos.y,
+            ent.desiredSpeed, ent.desiredHeading, ent.uiDesiredSpeed, getattr(ent, 'hasDestination', False),
+            unitAI.state, unitAI.stopAtDestination, destination, unitCommands, followsSquad, unitAI.updateTimer.timeUntilReset,
+            unitAI.speedLimit, ent.ManualControl.desiredSpeed, ent.ManualControl.desiredHeading,
+            unitAI.cent.getWaypoints(), unitAI.cent.waypointIndex,
+            commandIndices(unitAI.commands, unitAI.routeCommands or []), commandIndices(unitAI.commands, [unitAI.lastPassed])))
+        ids.append(unitAI.cent.id)
+    squadRecords = []
+    for squad in squads:
+        squadAI = squad.SquadAI
+        shape = squadAI.formation
+        squadRecords.append((squad.handle, [ent.handle for ent in squadAI.squadMembers],
+            shape and (shape.shape, shape.spacing, shape.screenRadius, shape.speedFraction),
+            squadAI.formationOrders is not None, list(squadAI.slots), list(squadAI.assignment), squadAI.assignTime,
+            [command.toRecord(cmd) for cmd in squadAI.commands], squadAI.longTermUpdateTimer.timeUntilReset))
+    return {
+        'time'          : engine.gameTime,
+        'ents'          : records,
+        'squads'        : squadRecords,
+        'ids'           : ids,
+        'handleCounter' : engine.entMgr.handleCounter,
+        'pending'       : [action.toRecord() for action in engine.actionMgr.pendingActions],
+        'pathPlanner'   : engine.pathPlanner.state(),
+        'kinematics'    : cent.getKinematics(),
+    }
+
+def commandIndices(commands, wanted):
+    '''Where each of wanted is in commands, by identity - what a snapshot keeps of a ship's progress
+    '''
+    return [i for i, cmd in enumerate(commands) for want in wanted if cmd is want]
+
+def restoreSquad(engine, record):
+    '''The squad of a squad record, its members back in it in their order, first one guiding
+    '''
+    (squadHandle, memberHandles, shape, inFormation, slots, assignment, assignTime,
+        commands, timer) = record
+    entMgr = engine.entMgr
+    members = [entMgr._ents[tuple(handle)] for handle in memberHandles]
+    squad = entMgr._ents.get(tuple(squadHandle))
+    if squad is None: # a new ship's own squad takes the handle
+        squad = members[0].squad
+        del entMgr._ents[squad.handle]
+        squad.handle = tuple(squadHandle)
+        entMgr._ents[squad.handle] = squad
+    squadAI = squad.SquadAI
+    for ent in members:
+        if ent.squad is not squad:
+            ent.squad.SquadAI.squadMembers.remove(ent)
+            ent.squad = squad
+    squadAI.squadMembers[:] = members + [ent for ent in squadAI.squadMembers if ent not in members]
+
+    squadAI.longTermData.commands = [command.fromRecord(engine, cmd) for cmd in commands]
+    squadAI.longTermUpdateTimer.timeUntilReset = timer
+    squadAI.formation = shape and formation.Formation(*shape)
+    squadAI.formationOrders = inFormation and (squadAI.commands, tuple(squadAI.squadMembers), squadAI.formation) or None
+    squadAI.slots = [tuple(slot) for slot in slots]
+    squadAI.assignment = list(assignment)
+    squadAI.assignTime = assignTime
+    return squad
+
+def restore(engine, state):
+    '''Put the world back the way capture() found it, returns the snapshot's game time
+    '''
+    import boat
+    from actionMgr import actionFromRecord
+    entMgr = engine.entMgr
+    ents = []
+    for record in state['ents']:
+        handle, typeName, player = record[:3]
+        ent = entMgr._ents.get(tuple(handle))
+        if ent is None:
+            ent = entMgr.createEntity(tuple(handle), boat.typeNamed(typeName), playerInfo=player and Player(*player))
+        ents.append(ent)
+    entMgr.handleCounter = max(entMgr.handleCounter, state['handleCounter'])
+    for record in state['squads']:
+        restoreSquad(engine, record)
+
+    for ent, record in zip(ents, state['ents']):
+        (handle, typeName, player, squadHandle, posY,
+            ent.desiredSpeed, ent.desiredHeading, ent.uiDesiredSpeed, ent.hasDestination,
+            unitState, stopAtDestination, destination, unitCommands, followsSquad, unitTimer,
+            speedLimit, ent.ManualControl.desiredSpeed, ent.ManualControl.desiredHeading,
+            route, waypointIndex, routeIndices, passedIndices) = record
+        ent.player = player and Player(*player)
+        squadAI = ent.squad.SquadAI
+        unitAI = ent.UnitAI
+        unitAI.state = unitState
+        unitAI.stopAtDestination = stopAtDestination
+        unitAI.destination = destination and vector3(*destination)
+        unitAI.speedLimit = speedLimit
+        if followsSquad:
+            unitAI._commands = squadAI.longTermData.commands
+        else:
+            unitAI._commands = [command.fromRecord(engine, cmd) for cmd in unitCommands]
+        unitAI.cent.setWaypoints(route, waypointIndex)
+        unitAI.routeCommands = [unitAI._commands[i] for i in routeIndices] or None
+        unitAI.lastPassed = passedIndices and unitAI._commands[passedIndices[0]] or None
+        unitAI.updateTimer.timeUntilReset = unitTimer
+        for cmd in unitAI._commands + squadAI.longTermData.commands: # the ents they follow exist now
+            if cmd.desiredState is not None:
+                cmd.desiredState.connectToEngine(engine)
+
+    native = state['kinematics']
+    ids = [ent.UnitAI.cent.id for ent in ents]
+    if ids != list(state['ids']): # a different world - move each record to its ship's CEnt id
+        size = kinematics.size
+        buf = bytearray(cent.getKinematics())
+        for old, new in zip(state['ids'], ids):
+            buf[new * size:(new + 1) * size] = native[old * size:(old + 1) * size]
+        native = str(buf)
+    cent.setKinematics(native)
+
+    for ent, record in zip(ents, state['ents']):
+        c = ent.UnitAI.cent
+        ent.pos = vector3(c.posX, record[4], c.posY)
+        ent.yaw = c.yaw
+        ent.speed = c.speed
+        ent.velocity = vector3(c.velX, 0, c.velY)
+
+    engine.actionMgr.pendingActions.clear()
+    engine.actionMgr.pendingActions.pushMany([actionFromRecord(action) for action in state['pending']])
+    engine.pathPlanner.restore(state['pathPlanner'])
+    engine.gameTime = state['time']
+    return engine.gameTime
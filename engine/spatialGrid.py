@@ -0,0 +1,75 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Uniform bucket grid over the x/z (water) plane
+
+Rebuilt from scratch whenever it is needed - insertion is a dict lookup and a list
+append, so rebuilding every tick is cheaper than tracking moves. Queries only look
+at the buckets overlapping the query circle.
+'''
+
+import math
+
+
+class SpatialGrid(object):
+    def __init__(self, cellSize):
+        self.cellSize = float(cellSize)
+        self.cells = {}
+
+    def clear(self):
+        self.cells = {}
+
+    def cellOf(self, x, z):
+        return (int(math.floor(x / self.cellSize)), int(math.floor(z / self.cellSize)))
+
+    def insert(self, item, x, z):
+        key = (int(math.floor(x / self.cellSize)), int(math.floor(z / self.cellSize)))
+        cell = self.cells.get(key)
+        if cell is None:
+            self.cells[key] = [(item, x, z)]
+        else:
+            cell.append((item, x, z))
+
+    def queryCircle(self, x, z, radius):
+        '''Returns [(item, distanceSquared)] for everything within radius of x, z
+        '''
+        found = []
+        radiusSquared = radius * radius
+        minX, minZ = self.cellOf(x - radius, z - radius)
+        maxX, maxZ = self.cellOf(x + radius, z + radius)
+        cells = self.cells
+        if (maxX - minX + 1) * (maxZ - minZ + 1) > len(cells):
+            keys = [key for key in cells if minX <= key[0] <= maxX and minZ <= key[1] <= maxZ] # big query, few occupied cells
+        else:
+            keys = [(i, j) for i in xrange(minX, maxX + 1) for j in xrange(minZ, maxZ + 1)]
+        for key in keys:
+            cell = cells.get(key)
+            if cell is None:
+                continue
+            for item, ix, iz in cell:
+                dx = ix - x
+                dz = iz - z
+                d2 = dx * dx + dz * dz
+                if d2 <= radiusSquared:
+                    found.append((item, d2))
+        return found
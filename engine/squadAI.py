@@ -27,9 +27,13 @@ import timer
 from aspect import Aspect
 from vector import vector3
 from mathlib import differenceBetweenAngles, clamp
+from desiredState import MaintainingRelativeToEnt
 import command
+import formation
 
 kUpdateStrategyFrequency = 0.1
+kFormationReassignInterval = 10.0 # game seconds between looking for a cheaper slot assignment
+kFormationReassignGain = 0.1      # ... which has to cut total travel by this fraction to be taken
 
 class SquadAI(Aspect):
     """
@@ -59,6 +63,12 @@ class SquadAI(Aspect):
         self.mediumTermData = self.MediumTermData()
         self.longTermData = self.LongTermData()
 
+        self.formation = None
+        self.formationOrders = None # (commands, members, formation) the members were last given slots for
+        self.slots = []             # slot offsets, squadMembers[i + 1] holds slots[assignment[i]]
+        self.assignment = []
+        self.assignTime = 0.0
+
         self.immediateData.ddContext = self.engine.debugDrawSystem.getContext()
         self.mediumTermData.ddContext = self.engine.debugDrawSystem.getContext()
         self.longTermData.ddContext = self.engine.debugDrawSystem.getContext()
@@ -83,14 +93,29 @@ class SquadAI(Aspect):
     def commands(self, commands):
         self.longTermData.commands = commands
 
+    def setFormation(self, shape):
+        """A formation.Formation for moves, None to have every member go to the same place
+        """
+        if self.formationOrders:
+            self.breakFormation()
+        self.formation = shape
+
     def longTermUpdate(self):
-        """The squad is not particularly used at the moment, - since we aren't doing any real coordination
-        so most of this is just pass through
+        """Mostly pass through - every member gets the squad's commands
+        Except moves with a formation set: the first member guides, the others keep station on their slots
         """
         if not self.commands:
+            if self.formationOrders: # the guide's moves ran out - nothing left to keep station for
+                self.breakFormation()
             return
 
         current = self.commands[0]
+        if type(current) == command.MoveTo and self.formation and len(self.squadMembers) > 1:
+            self.moveInFormation()
+            return
+        if self.formationOrders:
+            self.breakFormation()
+
         if type(current) == command.MoveTo:
             for squadMember in self.squadMembers:
                 squadMember.UnitAI.commands = self.commands
@@ -110,3 +135,49 @@ class SquadAI(Aspect):
 
         else:
             raise Exception('not yet implemented')
+
+    def moveInFormation(self):
+        """Guide takes the squad's moves, the rest get a MaintainingRelativeToEnt on the guide for their slot
+        Slots are reassigned when the orders change, and every kFormationReassignInterval if that saves enough travel
+        """
+        guide = self.squadMembers[0]
+        followers = self.squadMembers[1:]
+        orders = (self.commands, tuple(self.squadMembers), self.formation)
+        last = self.formationOrders
+        fresh = not last or last[0] is not self.commands or last[1:] != orders[1:]
+        if not fresh and self.engine.gameTime - self.assignTime < kFormationReassignInterval:
+            return
+        if last and last[1][0] is not guide:
+            last[1][0].UnitAI.speedLimit = None
+        self.assignTime = self.engine.gameTime
+
+        slots = fresh and self.formation.slots(len(followers)) or self.slots
+        targets = formation.toWorld(slots, guide.pos, guide.yaw)
+        positions = [(ent.pos.x, ent.pos.z) for ent in followers]
+        assignment = formation.assign(positions, targets)
+        if not fresh:
+            if formation.travel(positions, targets, assignment) > (1.0 - kFormationReassignGain) * formation.travel(positions, targets, self.assignment):
+                return
+
+        if fresh:
+            guide.UnitAI.speedLimit = self.formation.speedFraction * min([ent.maxSpeed for ent in self.squadMembers])
+            guide.UnitAI.commands = self.commands
+        speed = self.commands[0].desiredSpeed
+        for i, ent in enumerate(followers):
+            if fresh or assignment[i] != self.assignment[i]:
+                ahead, abeam = slots[assignment[i]]
+                station = MaintainingRelativeToEnt(guide, vector3(ahead, 0, abeam))
+                ent.UnitAI.commands = [command.MoveTo(self.engine, station, speed)]
+        self.formationOrders = orders
+        self.slots = slots
+        self.assignment = assignment
+
+    def breakFormation(self):
+        """Lift the guide's speed limit and stop the followers - the squad's commands, if any, go out after
+        """
+        members = self.formationOrders[1]
+        members[0].UnitAI.speedLimit = None
+        for ent in members[1:]:
+            if ent in self.squadMembers:
+                ent.UnitAI.commands = [command.Stop(self.engine, 0)]
+        self.formationOrders = None
@@ -0,0 +1,65 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Rolling hash of the simulation, one per tick - Engine.stateHasher in deterministic mode
+
+Each tick hashes the game time and the packed kinematics of every CEnt
+(cent.getKinematics - position, yaw, speed, velocity, helm / navigator
+directives, destination) with crc32, chained onto the previous tick's hash.
+That is one C call and one pass over ~52 bytes a ship. Two runs of the same
+history with the same seed produce the same sequence; the first tick where
+they differ is where they diverged. Lockstep peers can exchange the latest
+hash instead of state.
+'''
+
+import array
+import struct
+import zlib
+
+import cent
+
+gameTimeStruct = struct.Struct("=d")
+
+class StateHasher(object):
+    def __init__(self, keep=True):
+        self.tick = 0
+        self.hash = 0
+        self.hashes = array.array('I') # hash after every tick - empty unless keep
+        self.keep = keep
+
+    def update(self, gameTime):
+        h = zlib.crc32(gameTimeStruct.pack(gameTime), self.hash)
+        h = zlib.crc32(cent.getKinematics(), h) & 0xffffffff
+        self.hash = h
+        self.tick += 1
+        if self.keep:
+            self.hashes.append(h)
+        return h
+
+def firstDivergence(a, b):
+    '''Index of the first tick where two hash sequences differ, None if one is a prefix of the other
+    '''
+    for i in xrange(min(len(a), len(b))):
+        if a[i] != b[i]:
+            return i
+    return None
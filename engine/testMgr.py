@@ -31,6 +31,7 @@ from units import knots, degrees
 from mgr import Mgr
 from desiredState import StoppedAtPosition, MaintainingRelativeToEnt
 import command
+import formation
 from netAspect import NetAspect
 
 import entMgr
@@ -72,6 +73,10 @@ class TestMgr(Mgr):
             self.setupKrakenNet(2)
         elif self.test == 11:
             self.multiPlayerNetTest(5)
+        elif self.test == 12:
+            self.setupFleetScaling(self.engine.localOptions.gameOptions.fleetSize)
+        elif self.test == 13:
+            self.setupFormations(12)
 
     def setupKrakenNet(self, boatCount):
         """
@@ -89,7 +94,7 @@ class TestMgr(Mgr):
                 x += 200
                 cmd = command.Stop(self.engine, 0)
                 ent.squad.SquadAI.commands = [cmd]
-                ent.yaw = random.choice([math.pi/2, -math.pi/2, math.pi]);
+                ent.yaw = self.engine.random.choice([math.pi/2, -math.pi/2, math.pi]);
 
 
             
@@ -115,12 +120,16 @@ class TestMgr(Mgr):
         pass
 
     def setupAvoidanceTest0(self):
-        self.createSampleEntities([boat.CIGARETTE])
+        ents = self.createSampleEntities([boat.CIGARETTE])
         self.createObstactleCourseEntities(1)
+        for ent in ents:
+            self.makeMoveToOtherSideOfObstacles(ent)
 
     def setupAvoidanceTest1(self):
-        self.createSampleEntities([boat.DDG51])
+        ents = self.createSampleEntities([boat.DDG51])
         self.createObstactleCourseEntities(5)
+        for ent in ents:
+            self.makeMoveToOtherSideOfObstacles(ent)
 
     def setupAvoidanceTest2(self):
         """
@@ -167,14 +176,20 @@ class TestMgr(Mgr):
         self.createObstactleCourseEntities(5)
         for i in range(3):
             ent = self.engine.entMgr.createEntity(self.engine.entMgr.createHandle(), boat.DDG51, additionalAspects = self.additionalAspects)
-            ent.pos = mathlib.randomVectorSquare(500) + vector3(0, 0, 500)
+            ent.pos = mathlib.randomVectorSquare(500, self.engine.random) + vector3(0, 0, 500)
             #ent.yaw = random.uniform(0, mathlib.twopi)
             ent.yaw = math.radians(90)
             desiredState = StoppedAtPosition(vector3(0, 0, -2000))
             cmd = command.MoveTo(self.engine, desiredState)
             ent.squad.SquadAI.commands = [cmd]
 
+    kApproachStartCenters       = [vector3(2000,0,-1000), vector3(2000,0,1000)]
+    kApproachStartPosSize       = 600
+    kApproachRadiusSizeMinMax   = (300, 500)
     def setupCarrierApproach(self, numSpeedBoats):
+        """
+        Returns (carrier, speedBoats)
+        """
         spawnCarrier = True
 
         if spawnCarrier:
@@ -187,26 +202,95 @@ class TestMgr(Mgr):
             #carrier.squad.strategicData.commands = [cmd]
             carrier.squad.SquadAI.commands = [cmd]
 
-        startPositionCenters        = [vector3(2000,0,-1000), vector3(2000,0,1000)]
-        targetOffsets               = [vector3(50,0,150)]#, vector3(-50,0,150)]
-        kStartPosSize               = 600
-        kApproachRadiusSizeMinMax   = (300, 500)
+        #targetOffsets               = [vector3(50,0,150)]#, vector3(-50,0,150)]
+        speedBoats = []
         for i in range(numSpeedBoats):
-            startPosCenter = startPositionCenters[i % len(startPositionCenters)]
-            offset = mathlib.randomVectorSquare(kStartPosSize)
-            startPos = startPosCenter + offset
-
+            startPos = self.approachStartPos(i, self.engine.random)
             smallBoat = self.engine.entMgr.createEntity(self.engine.entMgr.createHandle(), boat.SPEEDBOAT, additionalAspects = self.additionalAspects)
-            smallBoat.pos.x = startPos.x
-            smallBoat.pos.z = startPos.z
-            smallBoat.yaw = mathlib.pi
             assert carrier
+            self.placeApproachingBoat(smallBoat, carrier, startPos, self.engine.random)
+            speedBoats.append(smallBoat)
+        return carrier, speedBoats
 
-            #offset = targetOffsets[i % len(targetOffsets)]
-            offset = mathlib.randomVectorCircular(*kApproachRadiusSizeMinMax)
-            desiredState = MaintainingRelativeToEnt(carrier, offset)
+    def scatterCarrierApproach(self, carrier, speedBoats, rng):
+        """
+        New start positions and stations for boats setupCarrierApproach made - batch runs reset the world
+        then scatter it with each run's seed instead of building it again
+        """
+        for i, smallBoat in enumerate(speedBoats):
+            self.placeApproachingBoat(smallBoat, carrier, self.approachStartPos(i, rng), rng)
+
+    def approachStartPos(self, i, rng):
+        startPosCenter = self.kApproachStartCenters[i % len(self.kApproachStartCenters)]
+        return startPosCenter + mathlib.randomVectorSquare(self.kApproachStartPosSize, rng)
+
+    def placeApproachingBoat(self, smallBoat, carrier, startPos, rng):
+        smallBoat.pos.x = startPos.x
+        smallBoat.pos.z = startPos.z
+        smallBoat.yaw = mathlib.pi
+
+        #offset = targetOffsets[i % len(targetOffsets)]
+        offset = mathlib.randomVectorCircular(*self.kApproachRadiusSizeMinMax, rng=rng)
+        desiredState = MaintainingRelativeToEnt(carrier, offset)
+        cmd = command.MoveTo(self.engine, desiredState)
+        smallBoat.squad.SquadAI.commands = [cmd]
+
+    fleetTypes = [boat.SPEEDBOAT, boat.CIGARETTE, boat.SAILBOAT, boat.ALIENBOAT, boat.DDG51, boat.SLEEK, boat.CVN68]
+    def setupFleetScaling(self, numBoats):
+        """
+        numBoats of mixed types spread over an area that grows with the fleet, so density stays about the same.
+        Half head for a random point, the others keep station on a boat spawned before them.
+        spawnTime is how long creating the fleet took, in seconds
+        """
+        import timeit
+        start = timeit.default_timer()
+        rng = self.engine.random
+        kAreaPerBoat = 300.0 * 300.0
+        halfSize = math.sqrt(kAreaPerBoat * numBoats) / 2.0
+        kStationRadiusMinMax = (100, 300)
+        fleet = []
+        for i in range(numBoats):
+            ent = self.engine.entMgr.createEntity(self.engine.entMgr.createHandle(), self.fleetTypes[i % len(self.fleetTypes)], additionalAspects = self.additionalAspects)
+            startPos = mathlib.randomVectorSquare(halfSize, rng)
+            ent.pos.x = startPos.x
+            ent.pos.z = startPos.z
+            ent.yaw = rng.uniform(-mathlib.pi, mathlib.pi)
+
+            if fleet and rng.random() < 0.5:
+                offset = mathlib.randomVectorCircular(*kStationRadiusMinMax, rng=rng)
+                desiredState = MaintainingRelativeToEnt(rng.choice(fleet), offset)
+            else:
+                desiredState = StoppedAtPosition(mathlib.randomVectorSquare(halfSize, rng))
             cmd = command.MoveTo(self.engine, desiredState)
-            smallBoat.squad.SquadAI.commands = [cmd]
+            ent.squad.SquadAI.commands = [cmd]
+            fleet.append(ent)
+        self.spawnTime = timeit.default_timer() - start
+
+    def setupFormations(self, groupSize):
+        """
+        One squad per formation, scattered, all ordered to the same far away point
+        """
+        groups = [
+            (boat.CVN68, boat.DDG51,     formation.Formation(formation.SCREEN, spacing=600, screenRadius=2000)),
+            (boat.DDG51, boat.SLEEK,     formation.Formation(formation.LINE, spacing=400)),
+            (boat.SLEEK, boat.SPEEDBOAT, formation.Formation(formation.WEDGE, spacing=100)),
+            (boat.SAILBOAT, boat.CIGARETTE, formation.Formation(formation.COLUMN, spacing=60)),
+        ]
+        rng = self.engine.random
+        goal = vector3(0, 0, -30000)
+        for i, (guideType, memberType, shape) in enumerate(groups):
+            center = vector3(-12000 + i * 8000, 0, 0)
+            ents = []
+            for j in range(groupSize):
+                ent = self.engine.entMgr.createEntity(self.engine.entMgr.createHandle(), j and memberType or guideType, additionalAspects = self.additionalAspects)
+                startPos = center + mathlib.randomVectorSquare(1500, rng)
+                ent.pos.x = startPos.x
+                ent.pos.z = startPos.z
+                ent.yaw = mathlib.halfpi
+                ents.append(ent)
+            squad = self.engine.entMgr.formSquad(ents)
+            squad.SquadAI.setFormation(shape)
+            squad.SquadAI.commands = [command.MoveTo(self.engine, StoppedAtPosition(goal + vector3(center.x, 0, 0)))]
 
     def setupBoatComparison(self):
         boatSpacing = 200
@@ -220,12 +304,14 @@ class TestMgr(Mgr):
         if types is None:
             types = self.types
         x = 0
+        ents = []
         for type in types:
             ent = self.engine.entMgr.createEntity(self.engine.entMgr.createHandle(), type, additionalAspects = self.additionalAspects)
             ent.pos.x = x
             #self.giveRandomMoveToOrderToEnt(ent)
-            #self.makeMoveToOtherSideOfObstacles(ent)
+            ents.append(ent)
             x -= type.length
+        return ents
 
 
     def createObstactleCourseEntities(self, width):
@@ -252,6 +338,7 @@ class TestMgr(Mgr):
         desiredState = StoppedAtPosition(vector3(0, 0, -2000))
         cmd = command.MoveTo(self.engine, desiredState)
         ent.squad.SquadAI.commands = [cmd]
+        self.engine.pathPlanner.route(ent, cmd)
 
 
     def multiPlayerNetTest(self, numSpeedBoats):
@@ -273,7 +360,7 @@ class TestMgr(Mgr):
         kApproachRadiusSizeMinMax   = (300, 500)
         for i in range(numSpeedBoats):
             startPosCenter = startPositionCenters[i % len(startPositionCenters)]
-            offset = mathlib.randomVectorSquare(kStartPosSize)
+            offset = mathlib.randomVectorSquare(kStartPosSize, self.engine.random)
             startPos = startPosCenter + offset
 
             smallBoat = self.engine.entMgr.createEntity(self.engine.entMgr.createHandle(), boat.SPEEDBOAT, additionalAspects = self.additionalAspects, playerInfo = entMgr.Player(entMgr.Side.RED, 1))
@@ -283,7 +370,7 @@ class TestMgr(Mgr):
             assert carrier
 
             #offset = targetOffsets[i % len(targetOffsets)]
-            offset = mathlib.randomVectorCircular(*kApproachRadiusSizeMinMax)
+            offset = mathlib.randomVectorCircular(*kApproachRadiusSizeMinMax, rng=self.engine.random)
             desiredState = MaintainingRelativeToEnt(carrier, offset)
             cmd = command.MoveTo(self.engine, desiredState)
             smallBoat.squad.SquadAI.commands = [cmd]
@@ -26,12 +26,14 @@ import random
 class Timer(object):
     """Class used to manage events that re-occur on some schedule
     """
-    def __init__(self, resetTime, randomize=True, fireFirstCheck = False):
+    def __init__(self, resetTime, randomize=True, fireFirstCheck = False, rng=random):
+        """rng - where a randomized first fire comes from, pass engine.random for sim timers
+        """
         self.resetTime = resetTime
         if fireFirstCheck:
             self.timeUntilReset = -1.0
         elif randomize:
-            self.timeUntilReset = random.uniform(0.0, self.resetTime)
+            self.timeUntilReset = rng.uniform(0.0, self.resetTime)
         else:
             self.timeUntilReset = self.resetTime
 
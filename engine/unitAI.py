@@ -59,6 +59,10 @@ class UnitAI(Aspect):
 
     updateFrequency = 1.0
     commandsDirty = False
+    routeCommands = None # the commands the cent's waypoints came from, in order
+    lastPassed = None    # the last command this ent has moved past - _commands is often its squad's, shared, so it is never trimmed
+    speedLimit = None    # cruise no faster than this - set on a formation's guide so the others keep up
+    physicsElsewhere = False # a shard region process moves this ship (NetMgr.shardTick), we only steer it
     def init(self):
         self.ent.squad = None
         self.destination = None
@@ -80,6 +84,7 @@ class UnitAI(Aspect):
                 self.ent.crampDistance,
                 self.ent.collisionClass
         )
+        self.cent.moveToReachedTolerance = self.ent.moveToReachedTolerance
 
         self.ent.desiredHeading = 0
         self.ent.desiredSpeed = 0
@@ -107,22 +112,27 @@ class UnitAI(Aspect):
             """
             self.commandsDirty = False
             self.ddContextLong.clear()
-            current = self.command
+            if self.routeCommands and self.cent.waypointIndex:
+                self.lastPassed = self.routeCommands[self.cent.waypointIndex - 1] # the navigator is past these
+            self.routeCommands = None
+            commands = self.remainingCommands()
+            current = commands and commands[0] or None
             if current is None:
                 self.ent.hasDestination = False
                 return
 
             elif type(current) == command.MoveTo:
-                currentWP = current.desiredState.calcWorldPos(self.ent)
-                if len(self.commands) > 1:
-                    #we are an interimittent move - if we have a next point see if we rae hitting this one and then mvoe on
-                    vecToGoal = self.ent.pos - currentWP
-                    distanceToGoal = vecToGoal.length()
-                    if distanceToGoal < self.ent.moveToReachedTolerance:
-                        del self.commands[0]
-                    self.stopAtDestination = False
-                else:
-                    self.stopAtDestination = True
+                #the cent navigates the whole run of moves, passing each within moveToReachedTolerance
+                #and keeping station on MaintainingRelativeToEnt leaders through their targetID every tick
+                route = []
+                for c in commands[:cent.kMaxWaypoints]:
+                    if type(c) != command.MoveTo:
+                        break
+                    route.append(c.desiredState)
+                self.cent.setWaypoints(route)
+                self.routeCommands = commands[:len(route)]
+                currentWP = vector3(self.cent.destinationX, 0, self.cent.destinationY)
+                self.stopAtDestination = len(route) == 1
 
                 self.state = self.State.AI
                 self.destination = currentWP
@@ -131,6 +141,8 @@ class UnitAI(Aspect):
                     self.navDesiredSpeed = self.ent.uiDesiredSpeed
                 else:
                     self.navDesiredSpeed = current.desiredSpeed
+                if self.speedLimit is not None:
+                    self.navDesiredSpeed = min(self.navDesiredSpeed, self.speedLimit)
 
                 if type(current.desiredState) == desiredState.MaintainingRelativeToEnt:
                     self.cent.inRamMode = current.desiredState.offset.length() < 50.0
@@ -141,7 +153,7 @@ class UnitAI(Aspect):
 
                 if self.ent.isSelected:
                     p = self.ent.pos
-                    for c in self._commands:
+                    for c in commands:
                         p2 = c.desiredState.calcWorldPos(self.ent)
                         self.engine.debugDrawSystem.drawLine(self.ddContextLong, p, p2)
                         p = p2
@@ -173,35 +185,17 @@ class UnitAI(Aspect):
             self.cent.posY = self.ent.pos.z
             self.cent.yaw  = self.ent.yaw
 
-            #pass control data down to cent land
-            if self.destination:
-                self.cent.destinationX = self.destination.x
-                self.cent.destinationY = self.destination.z
-                self.cent.stopAtDestination = self.stopAtDestination
-#####get the desired heading and speed
-                self.desiredHeading = math.atan2((self.ent.pos.z- self.destination.z), -1*(self.ent.pos.x - self.destination.x))
-                if(self.desiredHeading > math.pi):
-                    self.desiredHeading -= 2*math.pi
-                elif(self.desiredHeading < -(math.pi)):
-                    self.desiredHeading += 2*math.pi
-                self.cent.helmDesiredHeading = self.desiredHeading
-
-                #get desired speed
-                self.distance = pow((self.destination.x - self.ent.pos.x),2) + pow((self.destination.z - self.ent.pos.z),2)
-                if(self.distance > 15000):
-                    self.desiredSpeed = self.ent.maxSpeed
-                else:
-                    self.desiredSpeed = 0
-                self.cent.helmDesiredSpeed = self.desiredSpeed
-
-
-            self.cent.tick(dtime)
+            #navigator and helm run in cent land off the waypoints set above
+            if self.physicsElsewhere:
+                self.cent.navTick()
+            else:
+                self.cent.tick(dtime)
 
-            self.ent.pos.x = self.cent.posX
-            self.ent.pos.z = self.cent.posY
-            self.ent.yaw = self.cent.yaw
-            self.ent.speed = self.cent.speed
-            self.ent.velocity = vector3(self.cent.velX, 0, self.cent.velY)
+                self.ent.pos.x = self.cent.posX
+                self.ent.pos.z = self.cent.posY
+                self.ent.yaw = self.cent.yaw
+                self.ent.speed = self.cent.speed
+                self.ent.velocity = vector3(self.cent.velX, 0, self.cent.velY)
 
             #self.helmDesiredSpeed   = self.cent.helmDesiredSpeed   #To tell VShip
             #self.helmDesiredHeading = self.cent.helmDesiredHeading
@@ -229,13 +223,14 @@ class UnitAI(Aspect):
             self.cent.helmDesiredSpeed = self.controlAspect.desiredSpeed     # keyboard or joystick
             self.cent.helmDesiredHeading = self.controlAspect.desiredHeading
 
-            self.cent.helmTick(dtime);
+            if not self.physicsElsewhere:
+                self.cent.helmTick(dtime);
 
-            self.ent.pos.x = self.cent.posX
-            self.ent.pos.z = self.cent.posY
-            self.ent.yaw = self.cent.yaw
-            self.ent.speed = self.cent.speed            
-            self.ent.velocity = vector3(self.cent.velX, 0, self.cent.velY)
+                self.ent.pos.x = self.cent.posX
+                self.ent.pos.z = self.cent.posY
+                self.ent.yaw = self.cent.yaw
+                self.ent.speed = self.cent.speed            
+                self.ent.velocity = vector3(self.cent.velX, 0, self.cent.velY)
             
         elif self.state == self.State.STOP:
 
@@ -246,13 +241,14 @@ class UnitAI(Aspect):
             self.cent.helmDesiredSpeed   = 0.0
             self.cent.helmDesiredHeading = self.ent.yaw
 
-            self.cent.helmTick(dtime);
+            if not self.physicsElsewhere:
+                self.cent.helmTick(dtime);
 
-            self.ent.pos.x = self.cent.posX
-            self.ent.pos.z = self.cent.posY
-            self.ent.yaw = self.cent.yaw
-            self.ent.speed = self.cent.speed            
-            self.ent.velocity = vector3(self.cent.velX, 0, self.cent.velY)
+                self.ent.pos.x = self.cent.posX
+                self.ent.pos.z = self.cent.posY
+                self.ent.yaw = self.cent.yaw
+                self.ent.speed = self.cent.speed            
+                self.ent.velocity = vector3(self.cent.velX, 0, self.cent.velY)
 
 
         else: #state == NET_SLAVE
@@ -263,14 +259,15 @@ class UnitAI(Aspect):
             self.cent.helmDesiredSpeed = self.ent.desiredSpeed     # from network or keyboard or joystick
             self.cent.helmDesiredHeading = self.ent.desiredHeading
             #print "UnitAI: DS, DH: ", self.ent.desiredSpeed, self.ent.desiredHeading
-            self.cent.helmTick(dtime);
+            if not self.physicsElsewhere:
+                self.cent.helmTick(dtime);
 
-            self.ent.pos.x = self.cent.posX
-            self.ent.pos.z = self.cent.posY
-            self.ent.yaw = self.cent.yaw
-            self.ent.speed = self.cent.speed            
+                self.ent.pos.x = self.cent.posX
+                self.ent.pos.z = self.cent.posY
+                self.ent.yaw = self.cent.yaw
+                self.ent.speed = self.cent.speed            
 
-            self.ent.velocity = vector3(self.cent.velX, 0, self.cent.velY)
+                self.ent.velocity = vector3(self.cent.velX, 0, self.cent.velY)
 
 
     @property
@@ -331,7 +328,16 @@ class UnitAI(Aspect):
 
     @command.getter
     def command(self):
-        return self._commands and self._commands[0] or None
+        commands = self.remainingCommands()
+        return commands and commands[0] or None
+
+    def remainingCommands(self):
+        """The commands after the last one this ent has moved past
+        Found by identity, so commands inserted or appended meanwhile are still ahead
+        """
+        if self.lastPassed is not None and self.lastPassed in self._commands:
+            return self._commands[self._commands.index(self.lastPassed) + 1:]
+        return self._commands
 
     @property 
     def commands(self):
@@ -339,5 +345,8 @@ class UnitAI(Aspect):
 
     @commands.setter
     def commands(self, commands):
+        if commands is not self._commands: # the squad hands the same list out again every update
+            self.lastPassed = None
+            self.routeCommands = None
         self._commands = commands
         self.commandsDirty = True
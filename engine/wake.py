@@ -30,6 +30,8 @@ MIN_SPEED = 2
 class Wake(Aspect):
     def init(self):
         self.emitterList = [0,0,0]
+        if self.engine.headless:
+            return
 
         #set wake attributes based on boat size(1=small,2=med,3=large)
         if self.ent.wakeSize == 1:
@@ -98,6 +100,8 @@ class Wake(Aspect):
         return (self.midEmitter,)
 
     def tick(self, dtime):
+        if self.engine.headless:
+            return
 
         if self.ent.speed < MIN_SPEED :
             self.ent.pSystem.setEmitting(False)
@@ -15,6 +15,10 @@ class NetworkingOptions(Options):
         self.vShipNet                       = False
         self.ip                             = '192.168.1.2'
         self.server                         = False
+        self.capture                        = '' # file to record net traffic to, see engine/netCapture.py
+        self.replay                         = '' # capture file to play back instead of using the network
+        self.replaySpeed                    = 1.0
+        self.shardGrid                      = [0, 0] # server only - [x, z] regions, each simulated in its own process. 0 is off
 
 class EngineeringOptions(Options):
     def __init__(self):
@@ -33,11 +37,19 @@ class GfxOptions(Options):
         self.drawGrid                       = False
         self.renderWater                    = True
         self.renderSkybox                   = True
+        self.headless                       = False # no window, input or drawing - batch runs step the sim with Engine.stepFor
 
 class GameOptions(Options):
     def __init__(self):
         self.testToRun                      = 8
         self.toLoad                         = []
+        self.startTime                      = 0.0  # replays jump here via the nearest keyframe
+        self.keyframeInterval               = 0.0  # game seconds between journal keyframes, 0 for none - each one captures the world on the sim thread
+        self.deterministic                  = False # seeded rng, per tick state hash - runs of one history match
+        self.seed                           = 0
+        self.journal                        = True  # journal this session's actions to ActionHistory/
+        self.fleetSize                      = 1000  # ships spawned by the fleet scaling scenario (testToRun 12)
+        self.pathPlanning                   = False # route MoveTo orders around large, slow ships (engine/pathPlanner.py)
 
 class Player(Options):
     def __init__(self):
@@ -90,6 +102,9 @@ def parseCommandLineOptions(localOptions):
     import sys
     s = 'load='
     for arg in sys.argv:
+        if arg.startswith('start='):
+            localOptions.gameOptions.startTime = float(arg[len('start='):])
+            print 'Start:', localOptions.gameOptions.startTime
         if s in arg:
             opt = arg[arg.find(s) + len(s):].strip()
             print 'Load:', opt
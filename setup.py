@@ -54,11 +54,32 @@ print pyFiles
 from glob import glob
 data_files = [("Microsoft.VC90.CRT", glob(r'c:\dev\ms-vc-runtime\*.*'))]
 
+# same float results on every machine - no fused multiply add, no x87 excess precision, no fast math
+# keep the native tick reproducible for deterministic mode (engine/stateHash.py)
+# flags go by compiler, not os - mingw32 (EngineeringOptions.compileCEntForMingW) is gcc on windows
+import platform
+from distutils.command.build_ext import build_ext
+
+def floatArgs(compilerType):
+    if compilerType == 'msvc':
+        return ['/fp:precise']
+    args = ['-ffp-contract=off', '-fno-fast-math']
+    if platform.machine() in ('i386', 'i486', 'i586', 'i686', 'x86', 'x86_64', 'AMD64'):
+        args += ['-msse2', '-mfpmath=sse']
+    return args
+
+class FloatBuildExt(build_ext):
+    def build_extensions(self):
+        for ext in self.extensions:
+            ext.extra_compile_args = ext.extra_compile_args + floatArgs(self.compiler.compiler_type)
+        build_ext.build_extensions(self)
+
 setup(name='cent',
         version='1.0',
         ext_modules=[Extension('cent', [cEntFilename], libraries=[])],
         py_modules=pyFiles,
     data_files=data_files,
+    cmdclass={'build_ext': FloatBuildExt},
 )
 print pyFiles
 #setup(name='IA',
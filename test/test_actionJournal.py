@@ -0,0 +1,97 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Journal files - plain records round trip, anything else is refused
+'''
+
+import os
+import sys
+import marshal
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'engine'))
+
+import actionJournal
+from actionJournal import Journal, JournalStream
+
+def moveTo(t):
+    return ('MoveToAction', t, (0, 7), (1, (100.0, -50.0), (0.0, 0.0), None), True)
+
+class TestActionJournal(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.session = os.path.join(self.directory, 'journal-test')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, records):
+        journal = Journal(self.directory, name='journal-test')
+        for kind, obj, t in records:
+            journal.appendRecord(kind, obj, t)
+        journal.close()
+
+    def testRoundTrip(self):
+        self.write([(actionJournal.ACTION, moveTo(1.0), 1.0),
+                    (actionJournal.KEYFRAME, {'time': 2.0, 'ents': []}, 2.0),
+                    (actionJournal.ACTION, moveTo(3.0), 3.0)])
+        stream = JournalStream(self.session)
+        self.assertEqual(stream.readUntil(1.5), [moveTo(1.0)])
+        self.assertEqual(stream.readUntil(10.0), [moveTo(3.0)]) # the keyframe is skipped
+        self.assertEqual(actionJournal.toHistory(self.session), [moveTo(1.0), moveTo(3.0)])
+
+    def testSeekToKeyframe(self):
+        self.write([(actionJournal.ACTION, moveTo(1.0), 1.0),
+                    (actionJournal.KEYFRAME, {'time': 2.0, 'ents': []}, 2.0),
+                    (actionJournal.ACTION, moveTo(3.0), 3.0)])
+        stream = JournalStream(self.session)
+        self.assertEqual(stream.seek(2.5), (2.0, {'time': 2.0, 'ents': []}))
+        self.assertEqual(stream.readUntil(10.0), [moveTo(3.0)])
+
+    def testSessionInfo(self):
+        self.write([(actionJournal.SESSION, {'testToRun': 3, 'seed': 42}, 0.0),
+                    (actionJournal.ACTION, moveTo(1.0), 1.0)])
+        self.assertEqual(actionJournal.sessionInfo(self.session), {'testToRun': 3, 'seed': 42})
+        self.assertEqual(actionJournal.toHistory(self.session), [moveTo(1.0)])
+
+    def testNoSessionInfo(self):
+        self.write([(actionJournal.ACTION, moveTo(1.0), 1.0)])
+        self.assertEqual(actionJournal.sessionInfo(self.session), None)
+
+    def testOnlyPlainData(self):
+        code = compile('None', '<test>', 'eval')
+        self.assertRaises(ValueError, actionJournal.loads, marshal.dumps(('MoveEntity', 1.0, [code]), 2))
+        self.assertRaises(ValueError, actionJournal.dumps, (1.0, object()))
+
+    def testBadRecordIsSkipped(self):
+        self.write([(actionJournal.ACTION, moveTo(1.0), 1.0)])
+        f = open(self.session + '.0000' + actionJournal.Extension, 'ab')
+        payload = marshal.dumps(compile('None', '<test>', 'eval'), 2)
+        f.write(actionJournal.record.pack(len(payload), 2.0, actionJournal.ACTION) + payload)
+        f.close()
+        self.assertEqual(actionJournal.toHistory(self.session), [moveTo(1.0)])
+
+if __name__ == '__main__':
+    unittest.main()
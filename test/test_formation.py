@@ -0,0 +1,68 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Formation slot assignment - the exact and the greedy assigner
+'''
+
+import os
+import sys
+import random
+import itertools
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'engine'))
+
+import formation
+
+def scatter(rng, count, size=1000.0):
+    return [(rng.uniform(-size, size), rng.uniform(-size, size)) for i in range(count)]
+
+class TestFormation(unittest.TestCase):
+    def testHungarianIsOptimal(self):
+        rng = random.Random(1)
+        for n, m in [(1, 1), (3, 3), (4, 6), (6, 6)]:
+            for trial in range(5):
+                positions = scatter(rng, n)
+                targets = scatter(rng, m)
+                assignment = formation.hungarian(formation.travelCosts(positions, targets))
+                self.assertEqual(len(set(assignment)), n)
+                best = min([formation.travel(positions, targets, p) for p in itertools.permutations(range(m), n)])
+                self.assertAlmostEqual(formation.travel(positions, targets, assignment), best, 6)
+
+    def testGreedyIsAPermutation(self):
+        rng = random.Random(2)
+        for n, m in [(1, 1), (50, 50), (80, 100)]:
+            assignment = formation.greedy(scatter(rng, n), scatter(rng, m))
+            self.assertEqual(len(assignment), n)
+            self.assertEqual(len(set(assignment)), n)
+            for j in assignment:
+                self.assertTrue(0 <= j < m)
+        self.assertEqual(formation.greedy([], [(0.0, 0.0)]), [])
+
+    def testGreedyStacked(self):
+        # every member on one spot - one grid cell holds them all
+        assignment = formation.greedy([(5.0, 5.0)] * 10, formation.Formation(formation.LINE).slots(10))
+        self.assertEqual(sorted(assignment), range(10))
+
+if __name__ == '__main__':
+    unittest.main()
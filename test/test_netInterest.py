@@ -0,0 +1,72 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+InterestMgr - who gets which status records
+'''
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'engine'))
+
+import netPacket
+from netInterest import InterestMgr
+
+class Focus(object):
+    def __init__(self, playerId, x, z, radius):
+        self.playerId = playerId
+        self.x = x
+        self.z = z
+        self.radius = radius
+
+registered   = ('10.0.0.2', 54321)
+unregistered = ('10.0.0.3', 54321)
+
+class TestDestinations(unittest.TestCase):
+    def setUp(self):
+        self.interest = InterestMgr()
+        # two ships near the registered client's camera, one far away
+        self.positions = [(0, 1, 0.0, 0.0, 0), (1, 2, 100.0, 0.0, 0), (2, 3, 90000.0, 90000.0, 0)]
+        self.interest.notePeer(registered)
+        self.interest.notePeer(unregistered)
+        self.interest.updateClient(registered, [Focus(5, 0.0, 0.0, 1000.0)], 0.0)
+
+    def destinations(self):
+        return dict(self.interest.destinations(self.positions, netPacket.status.size, 1.0 / 30.0))
+
+    def testUnregisteredPeerGetsEverything(self):
+        for i in range(10):
+            self.assertEqual(self.destinations()[unregistered], None)
+
+    def testRegisteredClientGetsItsCut(self):
+        self.assertEqual(self.destinations()[registered], [0, 1])
+
+    def testExpiredClientFallsBackToEverything(self):
+        self.interest.expire(100.0)
+        destinations = self.destinations()
+        self.assertEqual(destinations[registered], None)
+        self.assertEqual(destinations[unregistered], None)
+
+if __name__ == '__main__':
+    unittest.main()
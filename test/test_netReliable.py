@@ -0,0 +1,113 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+ReliableChannel - in order delivery, and what happens when the sender gives up
+'''
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'engine'))
+
+import netPacket
+import netReliable
+from netReliable import ReliableChannel
+
+senderAddress   = ('10.0.0.1', 54321)
+receiverAddress = ('10.0.0.2', 54321)
+
+def message(i):
+    return netPacket.buildPacket(3, i, netPacket.int32, [(i,)])
+
+def value(msg):
+    return netPacket.unpackRecords(netPacket.int32, msg, 1)[0]
+
+class TestReliableChannel(unittest.TestCase):
+    def setUp(self):
+        self.sender = ReliableChannel(senderAddress)
+        self.receiver = ReliableChannel(receiverAddress)
+        self.now = 0.0
+        self.delivered = []
+
+    def send(self, i, drop=False):
+        for datagram in self.sender.wrap(message(i), self.now):
+            if not drop:
+                self.deliver(datagram)
+
+    def deliver(self, datagram):
+        for msg in self.receiver.receive(datagram, senderAddress):
+            self.delivered.append(value(msg))
+
+    def ack(self):
+        ackMsg = self.receiver.ackPacket(0)
+        if ackMsg:
+            self.sender.receiveAck(ackMsg, receiverAddress, self.now)
+
+    def testInOrder(self):
+        for i in range(5):
+            self.send(i)
+        self.assertEqual(self.delivered, range(5))
+
+    def testLostMessageIsResent(self):
+        self.send(0)
+        self.send(1, drop=True)
+        self.send(2)
+        self.assertEqual(self.delivered, [0])
+        self.ack()
+        self.now += 1.0
+        for datagram in self.sender.resend(self.now):
+            self.deliver(datagram)
+        self.assertEqual(self.delivered, [0, 1, 2])
+
+    def testMessageGivenUpOnDoesNotStallTheStream(self):
+        self.send(0)
+        self.send(1, drop=True)
+        i = 2
+        while not self.sender.nGivenUp: # traffic keeps flowing, every retransmit of 1 is lost
+            self.assertTrue(i < 100)
+            self.send(i)
+            self.ack()
+            self.now += 0.25
+            self.sender.resend(self.now)
+            i += 1
+        self.assertEqual(self.delivered, [0])
+        self.send(i)
+        self.assertEqual(self.delivered, [0] + range(2, i + 1))
+
+    def testMessageRetiredAfterPeerTimeoutDoesNotStallTheStream(self):
+        self.send(0)
+        self.send(1, drop=True)
+        self.send(2)
+        self.ack()
+        self.now += netReliable.PEER_TIMEOUT + 1.0
+        for attempt in range(netReliable.MAX_ATTEMPTS + 1): # receiver went quiet, sender forgets it and 1
+            self.sender.resend(self.now)
+            self.now += netReliable.MAX_RTO + 0.01
+        self.assertEqual(self.sender.outstanding, [])
+        self.assertEqual(self.delivered, [0])
+        self.send(3)
+        self.assertEqual(self.delivered, [0, 2, 3])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+NetStateTable - python -m unittest discover -s test -p "test_*.py"
+'''
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'engine'))
+
+import netPacket
+from netState import NetStateTable
+
+class Status(object):
+    def __init__(self, id):
+        self.time = 0
+        self.pos = (0.0, 0.0, 0.0)
+        self.vel = (0.0, 0.0, 0.0)
+        self.yaw = 0.0
+        self.rSpeed = 0.0
+        self.ds = 0.0
+        self.dh = 0.0
+
+def statusMessage(time, ids):
+    records = [(id, id * 10.0, 0.0, -id * 10.0, 1.0, 0.0, 1.0, id * 0.1, 0.0, 5.0, 0.5, 0) for id in ids]
+    msg = netPacket.buildPacket(1, time, netPacket.status, records)
+    return netPacket.unpackRecords(netPacket.status, msg, len(ids))
+
+class TestApplyStatus(unittest.TestCase):
+    def setUp(self):
+        self.table = NetStateTable()
+        for id in [7, 3, 5]:
+            self.table.addEnt(id, 'ent%i' % id, Status(id))
+
+    def testRecordsLandInTheirSlots(self):
+        unknown = self.table.applyStatus(100, statusMessage(100, [5, 7, 3]))
+        self.assertEqual(unknown, [])
+        for id in [7, 3, 5]:
+            slot = self.table.slots[id]
+            self.assertEqual(self.table.posX[slot], id * 10.0)
+            self.assertEqual(self.table.posZ[slot], -id * 10.0)
+            self.assertEqual(self.table.time[slot], 100)
+            self.assertTrue(self.table.fresh[slot])
+
+    def testSubsetLeavesTheRestAlone(self):
+        unknown = self.table.applyStatus(200, statusMessage(200, [3]))
+        self.assertEqual(unknown, [])
+        self.assertTrue(self.table.fresh[self.table.slots[3]])
+        self.assertFalse(self.table.fresh[self.table.slots[7]])
+        self.assertEqual(self.table.posX[self.table.slots[7]], 0.0)
+
+    def testUnknownIdsAreReported(self):
+        records = statusMessage(300, [3, 9, 5, 11])
+        unknown = self.table.applyStatus(300, records)
+        self.assertEqual([records[base] for base in unknown], [9, 11])
+        self.assertEqual(len(self.table), 3)
+
+if __name__ == '__main__':
+    unittest.main()
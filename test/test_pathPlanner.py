@@ -0,0 +1,64 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+Obstacle grid path planning - plan() and stringPull() on hand made grids
+'''
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'engine'))
+
+from pathPlanner import Grid, plan, stringPull
+
+# 2000 x 2000 meters, 40 x 40 cells of 50 - cell (i, j) spans x -1000 + 50i .., z -1000 + 50j ..
+def grid(blocked=()):
+    return Grid((2000.0, 2000.0), 50.0, frozenset(blocked))
+
+class TestPathPlanner(unittest.TestCase):
+    def testClearLine(self):
+        self.assertEqual(plan(grid(), (0.0, -500.0), (0.0, 500.0)), [])
+        offToTheSide = [(i, 20) for i in range(30, 36)]
+        self.assertEqual(plan(grid(offToTheSide), (0.0, -500.0), (0.0, 500.0)), [])
+
+    def testAroundABand(self):
+        g = grid([(i, 20) for i in range(4, 36)]) # z 0 .. 50, x -800 .. 800
+        start = (0.0, -500.0)
+        goal = (0.0, 500.0)
+        waypoints = plan(g, start, goal)
+        self.assertTrue(waypoints)
+        path = [start] + waypoints + [goal]
+        for a, b in zip(path, path[1:]):
+            self.assertTrue(g.lineClear(a, b), '%s - %s crosses the band' % (a, b))
+        self.assertTrue(max([abs(x) for x, z in waypoints]) > 800.0) # round an end of it
+
+    def testStringPullKeepsCorners(self):
+        g = grid([(i, j) for i in range(14, 26) for j in range(14, 26)]) # x, z -300 .. 300
+        start, corner, end = (-500.0, -500.0), (-500.0, 500.0), (500.0, 500.0)
+        self.assertEqual(stringPull(g, [start, corner, end]), [start, corner, end])
+        self.assertEqual(stringPull(g, [start, (-500.0, 0.0), corner, (0.0, 500.0), end]), [start, corner, end])
+        self.assertEqual(stringPull(grid(), [start, corner, end]), [start, end])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+#---------------------------------------------------------------------------
+# Copyright 2010, 2011 Sushil J. Louis and Christopher E. Miles, 
+# Evolutionary Computing Systems Laboratory, Department of Computer Science 
+# and Engineering, University of Nevada, Reno. 
+#
+# This file is part of OpenECSLENT 
+#
+#    OpenECSLENT is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    OpenECSLENT is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with OpenECSLENT.  If not, see <http://www.gnu.org/licenses/>.
+#---------------------------------------------------------------------------
+#-------------------------End Copyright Notice------------------------------
+
+'''
+SpatialGrid queries against a plain scan of every item
+'''
+
+import os
+import sys
+import random
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'engine'))
+
+from spatialGrid import SpatialGrid
+
+class TestSpatialGrid(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(3)
+        self.points = [(rng.uniform(-2000, 2000), rng.uniform(-2000, 2000)) for i in range(300)]
+        self.grid = SpatialGrid(100.0)
+        for i, (x, z) in enumerate(self.points):
+            self.grid.insert(i, x, z)
+
+    def scan(self, x, z, radius):
+        return sorted([i for i, (px, pz) in enumerate(self.points) if (px - x) ** 2 + (pz - z) ** 2 <= radius * radius])
+
+    def testQueryCircle(self):
+        for x, z, radius in [(0.0, 0.0, 50.0), (-1234.5, 876.0, 300.0), (1999.0, -1999.0, 10.0), (0.0, 0.0, 5000.0)]: # the last looks only at occupied cells
+            found = self.grid.queryCircle(x, z, radius)
+            self.assertEqual(sorted([i for i, d2 in found]), self.scan(x, z, radius))
+            for i, d2 in found:
+                px, pz = self.points[i]
+                self.assertAlmostEqual(d2, (px - x) ** 2 + (pz - z) ** 2)
+
+    def testClear(self):
+        self.grid.clear()
+        self.assertEqual(self.grid.queryCircle(0.0, 0.0, 5000.0), [])
+
+if __name__ == '__main__':
+    unittest.main()